@@ -31,7 +31,7 @@ const DoctorDashboard = () => {
 				throw new Error('Failed to fetch appointments');
 			}
 			const data = await response.json();
-			setAppointments(data);
+			setAppointments(data.results);
 		} catch (error) {
 			console.error('Error fetching appointments:', error);
 			setErrorMessage('There was an error fetching your appointments.');
@@ -28,6 +28,8 @@ function DoctorLogin() {
         localStorage.setItem("doctorId", doctor_id);
         localStorage.setItem("doctorName", doctorName); 
         localStorage.setItem("role", "doctor");
+        localStorage.setItem("accessToken", result.access_token);
+        localStorage.setItem("refreshToken", result.refresh_token);
   
         alert("Doctor login successful!");
         navigate("/doctor/dashboard");  
@@ -48,7 +48,7 @@ const PatientDashboard = () => {
                 }
                 return response.json();
             })
-            .then((data) => setAppointments(data))
+            .then((data) => setAppointments(data.results))
             .catch((error) => {
                 console.error('Error fetching appointments:', error);
                 setErrorMessage('Error fetching your appointments.');
@@ -59,14 +59,16 @@ const PatientDashboard = () => {
             .then((data) => setDoctors(data))
             .catch((error) => console.error('Error fetching doctors:', error));
 
-        const interval = setInterval(() => {
-            fetch(`http://127.0.0.1:8000/api/notifications/${patientId}/`)
-                .then((response) => response.json())
-                .then((data) => setNotifications(data))
-                .catch((error) => console.error('Error fetching notifications:', error));
-        }, 5000);
+        const stream = new EventSource(`http://127.0.0.1:8000/api/notifications/${patientId}/stream/`);
+        stream.addEventListener('notification', (event) => {
+            const notification = JSON.parse(event.data);
+            setNotifications((prev) =>
+                prev.some((existing) => existing.id === notification.id) ? prev : [...prev, notification]
+            );
+        });
+        stream.onerror = (error) => console.error('Notification stream error:', error);
 
-        return () => clearInterval(interval);
+        return () => stream.close();
     }, []);
 
     const validateAppointmentDetails = () => {
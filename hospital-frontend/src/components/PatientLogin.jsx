@@ -27,6 +27,8 @@ function PatientLogin() {
         localStorage.setItem("role", "patient");
         localStorage.setItem("patientName", result.patient_name || "Patient");
         localStorage.setItem("patientId", result.patient_id);
+        localStorage.setItem("accessToken", result.access_token);
+        localStorage.setItem("refreshToken", result.refresh_token);
   
         toast.success(`Welcome, ${result.patient_name || "Patient"}! Login successful!`, {
           position: "top-center",
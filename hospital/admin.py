@@ -1,24 +1,198 @@
-# admin.py
+import json
 
+from django import forms
 from django.contrib import admin
-from .models import Doctor, Patient, Appointment
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from .models import Doctor, Patient, Appointment, AppointmentArchive, Notification, WaitlistEntry
+from .search import search_appointments
+
+# Below this many rows an exact COUNT(*) is cheap enough to keep.
+EXACT_COUNT_LIMIT = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that takes the planner's row estimate instead of ``COUNT(*)`` for large results.
+
+    On PostgreSQL an unfiltered changelist reads ``pg_class.reltuples`` and a
+    filtered one the row estimate from ``EXPLAIN``; either is used only when
+    it is above ``EXACT_COUNT_LIMIT``, so small results still count exactly.
+    Other backends always count.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            estimate = self._estimate(queryset, connection)
+            if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def _estimate(queryset, connection):
+        if not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            # -1 until the table has been vacuumed or analyzed.
+            return row[0] if row and row[0] >= 0 else None
+        plan = json.loads(queryset.explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """Sidebar filter that picks one related object through the admin's autocomplete view.
+
+    The built-in related filter renders one link per row of the related
+    table; this renders a single select2 box that searches the related
+    model's ``search_fields`` as you type. Subclasses set ``field_name``.
+    """
+    template = 'admin/hospital/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.parameter_name = f'{self.field_name}__id__exact'
+        field = model._meta.get_field(self.field_name)
+        self.title = field.verbose_name
+        super().__init__(request, params, model, model_admin)
+        form_field = field.formfield(widget=AutocompleteSelect(field, model_admin.admin_site), required=False)
+        self.widget = form_field.widget.render(
+            self.parameter_name, self.value(), attrs={'id': f'id_filter_{self.field_name}'},
+        )
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        try:
+            return queryset.filter(**{self.parameter_name: self.value()})
+        except (ValueError, ValidationError) as e:
+            raise IncorrectLookupParameters(e)
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': _('All'),
+        }
+
+
+class DoctorFilter(AutocompleteFilter):
+    field_name = 'doctor'
+
+
+class PatientFilter(AutocompleteFilter):
+    field_name = 'patient'
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables too large to count or list in full."""
+    paginator = EstimatedCountPaginator
+    # Skips the second, unfiltered COUNT(*) shown next to filtered results.
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        media = super().media
+        filters = [f for f in self.list_filter if isinstance(f, type) and issubclass(f, AutocompleteFilter)]
+        if filters:
+            field = self.model._meta.get_field(filters[0].field_name)
+            media += AutocompleteSelect(field, self.admin_site).media
+            media += forms.Media(js=['admin/js/jquery.init.js', 'hospital/js/autocomplete_filter.js'])
+        return media
+
 
 # Register Doctor model
 @admin.register(Doctor)
-class DoctorAdmin(admin.ModelAdmin):
-    list_display = ('user', 'specialty')  # Display username and specialty
-    search_fields = ('user__username', 'specialty')  # Search by username and specialty
+class DoctorAdmin(ScalableAdmin):
+    list_display = ('user', 'specialty')
+    list_select_related = ('user',)
+    search_fields = ('user__username', 'specialty')
 
 # Register Patient model
 @admin.register(Patient)
-class PatientAdmin(admin.ModelAdmin):
-    list_display = ('user', 'birth_date')  # Display username, birth date, and phone number
-    search_fields = ('user__username', 'phone_number')  # Search by username or phone number
+class PatientAdmin(ScalableAdmin):
+    list_display = ('user', 'birth_date')
+    list_select_related = ('user',)
+    search_fields = ('user__username', 'phone_number')
+
+class AppointmentSearchMixin:
+    """Changelist search over an appointment table's full-text index."""
+    search_fields = ('reason', 'diagnosis', 'prescription')
+    search_help_text = _("Words from the reason, diagnosis or prescription, or an exact doctor or patient username.")
 
-# Register Appointment model with custom admin features
+    def get_search_results(self, request, queryset, search_term):
+        # The default is an ILIKE over every search field, which scans the
+        # table; an exact username goes through the unique index instead and
+        # anything else through the full-text index.
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        doctors = Doctor.objects.filter(user__username=search_term).values('id')
+        patients = Patient.objects.filter(user__username=search_term).values('id')
+        if doctors.exists() or patients.exists():
+            return queryset.filter(Q(doctor_id__in=doctors) | Q(patient_id__in=patients)), False
+        return search_appointments(queryset, search_term), False
+
+
+# Register Appointment model
 @admin.register(Appointment)
-class AppointmentAdmin(admin.ModelAdmin):
-    list_display = ('patient', 'doctor', 'date', 'reason')  # Display patient, doctor, date, and reason
-    list_filter = ('doctor', 'patient', 'date')  # Filter appointments by doctor, patient, and date
-    search_fields = ('doctor__user__username', 'patient__user__username', 'reason')  # Search by doctor, patient, or reason
-    ordering = ('-date',)  # Order appointments by date (latest first)
+class AppointmentAdmin(AppointmentSearchMixin, ScalableAdmin):
+    list_display = ('patient', 'doctor', 'date', 'reason', 'is_approved')
+    list_select_related = ('doctor__user', 'patient__user')
+    list_filter = (DoctorFilter, PatientFilter, 'is_approved', 'date')
+    autocomplete_fields = ('doctor', 'patient')
+    raw_id_fields = ('series',)
+    ordering = ('-date',)
+
+# Register AppointmentArchive model; archived appointments are read-only.
+@admin.register(AppointmentArchive)
+class AppointmentArchiveAdmin(AppointmentSearchMixin, ScalableAdmin):
+    list_display = ('patient', 'doctor', 'date', 'reason', 'is_approved')
+    list_select_related = ('doctor__user', 'patient__user')
+    list_filter = (DoctorFilter, PatientFilter, 'is_approved')
+    ordering = ('-date',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+# Register Notification model
+@admin.register(Notification)
+class NotificationAdmin(ScalableAdmin):
+    list_display = ('patient', 'message', 'is_read', 'created_at')
+    list_select_related = ('patient__user',)
+    list_filter = (PatientFilter, 'is_read', 'created_at')
+    autocomplete_fields = ('patient',)
+    ordering = ('-id',)
+
+# Register WaitlistEntry model; staff raise an entry's priority here.
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(ScalableAdmin):
+    list_display = ('patient', 'doctor', 'window_start', 'window_end', 'priority', 'status')
+    list_select_related = ('doctor__user', 'patient__user')
+    list_filter = (DoctorFilter, PatientFilter, 'status')
+    autocomplete_fields = ('doctor', 'patient')
+    ordering = ('-id',)
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class HospitalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hospital'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate, pre_migrate
+
+        from . import signals  # noqa: F401
+        from .archive import release_history_view, restore_history_view
+        from .search import restore_search_index
+
+        pre_migrate.connect(release_history_view, sender=self)
+        post_migrate.connect(restore_search_index, sender=self)
+        post_migrate.connect(restore_history_view, sender=self)
@@ -0,0 +1,87 @@
+"""Hot/cold split of appointments.
+
+Live traffic only touches recent and upcoming appointments, so ones dated
+more than ``APPOINTMENT_ARCHIVE_DAYS`` ago are moved to
+``AppointmentArchive`` in batches. The ``hospital_appointment_history``
+view (``AppointmentHistory``) is a ``UNION ALL`` of both tables; each branch
+keeps its own ``(patient, date)`` and ``(doctor, date)`` indexes, so history
+reads stay index scans on both sides.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils import timezone
+
+from .models import Appointment, AppointmentArchive
+
+VIEW = 'hospital_appointment_history'
+MIGRATION = ('hospital', '0012_appointment_archive')
+COLUMNS = [
+    'id', 'doctor_id', 'patient_id', 'date', 'reason', 'is_approved',
+    'prescription', 'diagnosis', 'created_at', 'approved_at',
+]
+
+
+def create_history_view(schema_editor):
+    columns = ', '.join(COLUMNS)
+    schema_editor.execute(f"DROP VIEW IF EXISTS {VIEW}")
+    schema_editor.execute(
+        f"CREATE VIEW {VIEW} AS "
+        f"SELECT {columns} FROM {Appointment._meta.db_table} "
+        f"UNION ALL SELECT {columns} FROM {AppointmentArchive._meta.db_table}"
+    )
+
+
+def drop_history_view(schema_editor):
+    schema_editor.execute(f"DROP VIEW IF EXISTS {VIEW}")
+
+
+def _history_migrated(conn):
+    return MIGRATION in MigrationRecorder(conn).applied_migrations()
+
+
+def release_history_view(using, **kwargs):
+    """pre_migrate hook: drop the view so migrations can alter or rebuild the tables under it."""
+    conn = connections[using]
+    if _history_migrated(conn):
+        with conn.schema_editor() as schema_editor:
+            drop_history_view(schema_editor)
+
+
+def restore_history_view(using, **kwargs):
+    """post_migrate hook: put back the view dropped by ``release_history_view``."""
+    conn = connections[using]
+    if _history_migrated(conn):
+        with conn.schema_editor() as schema_editor:
+            create_history_view(schema_editor)
+
+
+def archive_appointments(batch_size=1000, pause=0, now=None):
+    """Move appointments dated before the archive horizon; return how many were moved.
+
+    Each batch is its own transaction. Stats are not touched: the counters
+    cover archived appointments too.
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=settings.APPOINTMENT_ARCHIVE_DAYS)
+    candidates = Appointment.objects.filter(date__lt=cutoff).order_by('date', 'id')
+
+    moved = 0
+    while True:
+        with transaction.atomic():
+            # Rows locked by a writer right now are left for the next run.
+            rows = list(candidates.select_for_update(skip_locked=True).values_list(*COLUMNS)[:batch_size])
+            if not rows:
+                break
+            AppointmentArchive.objects.bulk_create([AppointmentArchive(**dict(zip(COLUMNS, row))) for row in rows])
+            # Nothing cascades from Appointment, and the post_delete signals
+            # must not run: these appointments still exist, just elsewhere.
+            Appointment.objects.filter(id__in=[row[0] for row in rows])._raw_delete(Appointment.objects.db)
+        moved += len(rows)
+        if len(rows) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return moved
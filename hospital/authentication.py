@@ -0,0 +1,43 @@
+from rest_framework import authentication, exceptions
+
+from .tokens import InvalidToken, read_access_token
+
+
+class TokenUser:
+    """Request user rebuilt from access-token claims, without loading ``User``."""
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+    is_staff = False
+    is_superuser = False
+
+    def __init__(self, claims):
+        self.id = self.pk = claims['uid']
+        self.role = claims['role']
+        self.patient_id = claims['pid'] if self.role == 'patient' else None
+        self.doctor_id = claims['pid'] if self.role == 'doctor' else None
+
+    def __str__(self):
+        return f"{self.role} {self.id}"
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """``Authorization: Bearer <access token>`` issued by the login views."""
+
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed("Invalid Authorization header")
+        try:
+            claims = read_access_token(header[1].decode())
+        except (InvalidToken, UnicodeError) as e:
+            raise exceptions.AuthenticationFailed(str(e))
+        return TokenUser(claims), claims
+
+    def authenticate_header(self, request):
+        return self.keyword
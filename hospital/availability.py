@@ -0,0 +1,111 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import APPOINTMENT_GAP, appointment_source
+
+
+def slot_length():
+    return timedelta(minutes=getattr(settings, 'APPOINTMENT_SLOT_MINUTES', 30))
+
+
+def slot_grid(start, end):
+    """Every bookable slot start in ``[start, end)`` within clinic hours.
+
+    The grid is identical for every doctor, so it is built once per request
+    and shared by the per-doctor sweeps.
+    """
+    opening = getattr(settings, 'CLINIC_OPENING_HOUR', 8)
+    closing = getattr(settings, 'CLINIC_CLOSING_HOUR', 17)
+    step = slot_length()
+    tz = timezone.get_current_timezone()
+
+    slots = []
+    day = timezone.localtime(start, tz).date()
+    last_day = timezone.localtime(end, tz).date()
+    while day <= last_day:
+        slot = timezone.make_aware(datetime(day.year, day.month, day.day, opening), tz)
+        day_end = timezone.make_aware(datetime(day.year, day.month, day.day, closing), tz)
+        while slot + step <= day_end:
+            if start <= slot < end:
+                slots.append(slot)
+            slot += step
+        day += timedelta(days=1)
+    return slots
+
+
+def _cache_key(doctor_id, day):
+    return f'hospital:booked:{doctor_id}:{day.isoformat()}'
+
+
+def invalidate_booked(doctor_id, date):
+    """Drop the cached schedule for the doctor's (local) day containing ``date``."""
+    cache.delete(_cache_key(doctor_id, timezone.localdate(date)))
+
+
+def invalidate_booked_many(bookings):
+    """Bulk form of ``invalidate_booked`` for ``(doctor_id, date)`` pairs."""
+    cache.delete_many({_cache_key(doctor_id, timezone.localdate(date)) for doctor_id, date in bookings})
+
+
+def booked_intervals(doctor_ids, start, end):
+    """Sorted appointment timestamps per doctor that can affect slots in ``[start, end)``.
+
+    Schedules are cached per doctor and local day. Doctors with any day
+    missing from the cache are reloaded together in a single range scan on
+    the ``(doctor, date)`` index.
+    """
+    tz = timezone.get_current_timezone()
+    first_day = timezone.localtime(start - APPOINTMENT_GAP, tz).date()
+    last_day = timezone.localtime(end + APPOINTMENT_GAP, tz).date()
+    days = [first_day + timedelta(days=n) for n in range((last_day - first_day).days + 1)]
+
+    keys = {_cache_key(doctor_id, day): (doctor_id, day) for doctor_id in doctor_ids for day in days}
+    cached = cache.get_many(keys)
+    missing = {doctor_id for key, (doctor_id, day) in keys.items() if key not in cached}
+
+    if missing:
+        loaded = defaultdict(list)
+        since = timezone.make_aware(datetime.combine(first_day, time.min), tz)
+        rows = appointment_source(since).objects.filter(
+            doctor_id__in=missing,
+            date__gte=since,
+            date__lt=timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min), tz),
+        ).order_by('doctor_id', 'date').values_list('doctor_id', 'date')
+        for doctor_id, date in rows:
+            loaded[_cache_key(doctor_id, timezone.localtime(date, tz).date())].append(date.timestamp())
+
+        fresh = {key: loaded.get(key, []) for key, (doctor_id, day) in keys.items() if doctor_id in missing}
+        cache.set_many(fresh, getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 300))
+        cached.update(fresh)
+
+    booked = defaultdict(list)
+    for key, (doctor_id, day) in keys.items():
+        booked[doctor_id].extend(cached[key])
+    return booked
+
+
+def free_slots(doctor_ids, start, end):
+    """Map each doctor id to the slot starts in ``[start, end)`` that can still be booked.
+
+    A slot is free when no existing appointment lies strictly within
+    ``APPOINTMENT_GAP`` of it, the same rule ``Appointment.clean()`` enforces.
+    """
+    now = timezone.now()
+    grid = [slot for slot in slot_grid(start, end) if slot > now]
+    grid_ts = [slot.timestamp() for slot in grid]
+    gap = APPOINTMENT_GAP.total_seconds()
+    booked = booked_intervals(doctor_ids, start, end)
+
+    availability = {}
+    for doctor_id in doctor_ids:
+        blocked = set()
+        for ts in booked.get(doctor_id, ()):
+            # The grid is sorted, so each appointment blocks one contiguous run.
+            blocked.update(range(bisect_right(grid_ts, ts - gap), bisect_left(grid_ts, ts + gap)))
+        availability[doctor_id] = [slot for i, slot in enumerate(grid) if i not in blocked]
+    return availability
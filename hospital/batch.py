@@ -0,0 +1,92 @@
+"""Set-based bulk mutations behind the batch endpoints.
+
+Each function takes a list of ids and returns ``{id: outcome}``. The work is
+done with one ``UPDATE`` or ``DELETE`` per table plus the bulk bookkeeping,
+so the query count does not depend on how many ids are given.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .availability import invalidate_booked_many
+from .models import Appointment, Notification, NotificationArchive
+from .outbox import enqueue_notifications
+from .stats import record_approved_many, record_deleted_many
+from .waitlist import offer_slots
+
+NOT_FOUND = 'not_found'
+
+
+def approval_message(appointment):
+    formatted_time = timezone.localtime(appointment.date).strftime('%B %d, %Y at %I:%M %p')
+    return f"Your appointment with Dr. {appointment.doctor.user.username} scheduled for {formatted_time} has been approved."
+
+
+def approval_event(appointment):
+    return f'appointment:{appointment.id}:approved'
+
+
+def approve_appointments(ids):
+    now = timezone.now()
+    with transaction.atomic():
+        appointments = Appointment.objects.select_for_update(of=('self',)).select_related('doctor__user').only(
+            'doctor__user__username', 'patient_id', 'date', 'is_approved', 'created_at',
+        ).filter(id__in=ids)
+        outcomes = {}
+        pending = []
+        for appointment in appointments:
+            outcomes[appointment.id] = 'already_approved' if appointment.is_approved else 'approved'
+            if not appointment.is_approved:
+                pending.append(appointment)
+        if pending:
+            Appointment.objects.filter(id__in=[appointment.id for appointment in pending]).update(
+                is_approved=True, approved_at=now,
+            )
+            for appointment in pending:
+                appointment.is_approved = True
+                appointment.approved_at = now
+            record_approved_many(pending)
+            enqueue_notifications([
+                (appointment.patient_id, approval_message(appointment), approval_event(appointment))
+                for appointment in pending
+            ])
+    return {id: outcomes.get(id, NOT_FOUND) for id in ids}
+
+
+def delete_appointments(ids):
+    with transaction.atomic():
+        appointments = list(Appointment.objects.select_for_update().only(
+            'doctor_id', 'date', 'is_approved', 'created_at', 'approved_at',
+        ).filter(id__in=ids))
+        if appointments:
+            # Nothing cascades from Appointment, so one DELETE does it. It
+            # skips the per-row post_delete signals; their work is done in
+            # bulk here instead.
+            Appointment.objects.filter(id__in=[appointment.id for appointment in appointments])._raw_delete(
+                Appointment.objects.db
+            )
+            record_deleted_many(appointments)
+            freed = [(appointment.doctor_id, appointment.date) for appointment in appointments]
+            invalidate_booked_many(freed)
+            transaction.on_commit(lambda: offer_slots(freed))
+    deleted = {appointment.id for appointment in appointments}
+    return {id: 'deleted' if id in deleted else NOT_FOUND for id in ids}
+
+
+def mark_notifications_read(patient_id, ids):
+    notifications = Notification.objects.filter(patient_id=patient_id, id__in=ids)
+    was_read = dict(notifications.values_list('id', 'is_read'))
+    notifications.filter(is_read=False).update(is_read=True)
+    outcomes = {id: 'already_read' if is_read else 'marked_read' for id, is_read in was_read.items()}
+    return {id: outcomes.get(id, NOT_FOUND) for id in ids}
+
+
+def delete_notifications(patient_id, ids):
+    deleted = set()
+    with transaction.atomic():
+        for model in (Notification, NotificationArchive):
+            notifications = model.objects.filter(patient_id=patient_id, id__in=ids)
+            found = set(notifications.values_list('id', flat=True))
+            if found:
+                model.objects.filter(id__in=found).delete()
+                deleted |= found
+    return {id: 'deleted' if id in deleted else NOT_FOUND for id in ids}
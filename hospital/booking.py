@@ -0,0 +1,87 @@
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager, nullcontext
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+
+from .models import APPOINTMENT_GAP, Appointment, Doctor, Patient
+
+# Name of the PostgreSQL exclusion constraint added in migration 0005.
+OVERLAP_CONSTRAINT = 'appointment_doctor_no_overlap'
+
+
+class BookingConflict(Exception):
+    """The doctor already has an appointment within ``APPOINTMENT_GAP`` of the requested time."""
+
+
+_doctor_locks = {}
+_doctor_locks_guard = threading.Lock()
+
+
+def _process_lock(doctor_id):
+    # Backends without SELECT ... FOR UPDATE (SQLite) fall back to serialising
+    # bookings per doctor inside this process; SQLite itself serialises writers.
+    if connection.features.has_select_for_update:
+        return nullcontext()
+    with _doctor_locks_guard:
+        return _doctor_locks.setdefault(doctor_id, threading.Lock())
+
+
+@contextmanager
+def locked_doctor(doctor_id):
+    """Open a transaction holding the doctor's booking lock and yield the ``Doctor``.
+
+    Bookings for the doctor made through this module queue behind it.
+    """
+    with _process_lock(doctor_id), transaction.atomic():
+        yield Doctor.objects.select_for_update().get(id=doctor_id)
+
+
+def book_appointment(doctor_id, patient_id, **fields):
+    """Create an appointment, holding the doctor's row lock across the overlap check and insert.
+
+    Concurrent bookings for the same doctor queue on ``SELECT ... FOR UPDATE``
+    so the check in ``Appointment.clean()`` always sees committed rows. On
+    PostgreSQL the exclusion constraint is a second line of defence for
+    writes that bypass this function.
+
+    Raises ``BookingConflict`` on an overlap and ``Doctor.DoesNotExist`` /
+    ``Patient.DoesNotExist`` for unknown ids.
+    """
+    try:
+        with _process_lock(doctor_id), transaction.atomic():
+            doctor = Doctor.objects.select_for_update().get(id=doctor_id)
+            patient = Patient.objects.get(id=patient_id)
+            appointment = Appointment(doctor=doctor, patient=patient, **fields)
+            appointment.save()
+    except ValidationError as e:
+        if e.code == 'overlap':
+            raise BookingConflict(e.message) from e
+        raise
+    except IntegrityError as e:
+        if OVERLAP_CONSTRAINT in str(e):
+            raise BookingConflict(Appointment.OVERLAP_MESSAGE) from e
+        raise
+    return appointment
+
+
+def find_conflicts(candidates, existing):
+    """Indexes of ``candidates`` that overlap an existing row or an earlier accepted candidate.
+
+    ``candidates`` is a list of ``(index, appointment)`` for one doctor and
+    ``existing`` that doctor's sorted stored dates. Candidates are accepted
+    greedily in date order, so within the batch the earliest booking wins.
+    """
+    conflicts = set()
+    last_accepted = None
+    for index, appointment in sorted(candidates, key=lambda candidate: candidate[1].date):
+        date = appointment.date
+        i = bisect_right(existing, date - APPOINTMENT_GAP)
+        clashes_existing = i < len(existing) and existing[i] < date + APPOINTMENT_GAP
+        clashes_batch = last_accepted is not None and date - last_accepted < APPOINTMENT_GAP
+        if clashes_existing or clashes_batch:
+            conflicts.add(index)
+        else:
+            last_accepted = date
+    return conflicts
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Doctor
+from .serializers import DoctorSerializer
+
+VERSION_KEY = 'hospital:doctor_directory:version'
+MODIFIED_KEY = 'hospital:doctor_directory:modified'
+
+
+def _new_version():
+    # Time-based so a version key lost to eviction never reuses an old number.
+    return int(time.time() * 1000)
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _new_version(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _last_modified():
+    modified = cache.get(MODIFIED_KEY)
+    if modified is None:
+        cache.add(MODIFIED_KEY, timezone.now().replace(microsecond=0), None)
+        modified = cache.get(MODIFIED_KEY)
+    return modified
+
+
+def invalidate_directory():
+    # Recorded before the version moves, so the rebuild it triggers sees it.
+    cache.set(MODIFIED_KEY, timezone.now().replace(microsecond=0), None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _new_version(), None)
+
+
+def get_doctor_directory():
+    """Return the serialized doctor list with its ETag and Last-Modified time.
+
+    Entries are keyed by a version number that ``invalidate_directory()``
+    bumps, so a rebuild racing an invalidation can never be served as current.
+    Last-Modified is the time of that invalidation, so it stays put when an
+    entry merely expires and is rebuilt.
+    """
+    version = _current_version()
+    key = f'hospital:doctor_directory:{version}'
+    directory = cache.get(key)
+    if directory is None:
+        doctors = Doctor.objects.select_related('user').order_by('id')
+        data = [dict(row) for row in DoctorSerializer(doctors, many=True).data]
+        body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+        directory = {
+            'data': data,
+            'etag': f'"{hashlib.md5(body.encode()).hexdigest()}"',
+            'last_modified': _last_modified(),
+        }
+        cache.set(key, directory, getattr(settings, 'DOCTOR_DIRECTORY_CACHE_TIMEOUT', 3600))
+    return directory
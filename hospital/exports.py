@@ -0,0 +1,69 @@
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.db.models import F
+from django.utils import timezone
+
+EXPORT_FIELDS = [
+    'id', 'doctor_id', 'doctor_name', 'patient_id', 'patient_name',
+    'date', 'reason', 'is_approved', 'diagnosis', 'prescription',
+]
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the formatted line back to ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(appointments, fmt='ndjson', chunk_size=2000):
+    """Yield an appointment export as text, ``chunk_size`` rows per chunk.
+
+    Rows are read with ``iterator()`` (a server-side cursor on PostgreSQL) and
+    never collected, so memory use does not depend on the size of the export.
+    """
+    rows = appointments.annotate(
+        doctor_name=F('doctor__user__username'),
+        patient_name=F('patient__user__username'),
+    ).order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    date_index = EXPORT_FIELDS.index('date')
+
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        format_row = writer.writerow
+    else:
+        def format_row(values):
+            return json.dumps(dict(zip(EXPORT_FIELDS, values)), ensure_ascii=False) + '\n'
+
+    batch = []
+    for row in rows:
+        row = list(row)
+        row[date_index] = timezone.localtime(row[date_index]).isoformat()
+        batch.append(format_row(row))
+        if len(batch) >= chunk_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+async def aiterate(chunks):
+    """Serve a synchronous chunk generator to an ASGI response without buffering it.
+
+    Given a plain iterator, ``StreamingHttpResponse`` under ASGI reads it to the
+    end before sending anything. Each chunk is pulled in the thread that owns
+    the database connection instead.
+    """
+    pull = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await pull(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,127 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .availability import invalidate_booked_many
+from .booking import find_conflicts
+from .models import APPOINTMENT_GAP, Appointment, Doctor, Patient, appointment_source
+from .stats import record_created
+
+REQUIRED_FIELDS = ('doctor_id', 'patient_id', 'date', 'reason')
+TRUE_VALUES = ('true', '1', 'yes')
+
+
+def _parse_row(row):
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    missing = [field for field in REQUIRED_FIELDS if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+    try:
+        doctor_id = int(row['doctor_id'])
+        patient_id = int(row['patient_id'])
+    except (TypeError, ValueError):
+        raise ValueError("doctor_id and patient_id must be integers")
+
+    try:
+        date = parse_datetime(str(row['date']))
+    except ValueError:
+        date = None
+    if date is None:
+        raise ValueError("date must be an ISO 8601 datetime")
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+
+    if not all(isinstance(row.get(field), (str, type(None))) for field in ('reason', 'prescription', 'diagnosis')):
+        raise ValueError("reason, prescription and diagnosis must be text")
+
+    is_approved = row.get('is_approved') or False
+    if isinstance(is_approved, str):
+        is_approved = is_approved.strip().lower() in TRUE_VALUES
+
+    return Appointment(
+        doctor_id=doctor_id,
+        patient_id=patient_id,
+        date=date,
+        reason=row['reason'],
+        is_approved=bool(is_approved),
+        prescription=row.get('prescription') or None,
+        diagnosis=row.get('diagnosis') or None,
+    )
+
+
+def import_appointments(rows, chunk_size=1000, dry_run=False):
+    """Validate and bulk-insert appointment rows, returning a per-row report.
+
+    Doctors and patients are resolved with one query each, overlaps are
+    checked in memory against the batch and against stored appointments,
+    and valid rows are written with ``bulk_create`` in ``chunk_size``
+    chunks. The involved doctors stay locked for the whole import so
+    concurrent bookings cannot slip between the check and the insert.
+    """
+    errors = []
+    parsed = []
+    for index, row in enumerate(rows):
+        try:
+            parsed.append((index, _parse_row(row)))
+        except ValueError as e:
+            errors.append({"row": index, "error": str(e)})
+
+    created = 0
+    with transaction.atomic():
+        doctor_ids = {appointment.doctor_id for _, appointment in parsed}
+        patient_ids = {appointment.patient_id for _, appointment in parsed}
+        known_doctors = set(
+            Doctor.objects.select_for_update().filter(id__in=doctor_ids).order_by('id').values_list('id', flat=True)
+        )
+        known_patients = set(Patient.objects.filter(id__in=patient_ids).values_list('id', flat=True))
+
+        by_doctor = defaultdict(list)
+        for index, appointment in parsed:
+            if appointment.doctor_id not in known_doctors:
+                errors.append({"row": index, "error": f"Doctor {appointment.doctor_id} does not exist"})
+            elif appointment.patient_id not in known_patients:
+                errors.append({"row": index, "error": f"Patient {appointment.patient_id} does not exist"})
+            else:
+                by_doctor[appointment.doctor_id].append((index, appointment))
+
+        existing = defaultdict(list)
+        if by_doctor:
+            dates = [appointment.date for candidates in by_doctor.values() for _, appointment in candidates]
+            stored = appointment_source(min(dates) - APPOINTMENT_GAP).objects.filter(
+                doctor_id__in=list(by_doctor),
+                date__gt=min(dates) - APPOINTMENT_GAP,
+                date__lt=max(dates) + APPOINTMENT_GAP,
+            ).order_by('date').values_list('doctor_id', 'date')
+            for doctor_id, date in stored.iterator(chunk_size=chunk_size):
+                existing[doctor_id].append(date)
+
+        accepted = []
+        for doctor_id, candidates in by_doctor.items():
+            conflicts = find_conflicts(candidates, existing[doctor_id])
+            for index, appointment in candidates:
+                if index in conflicts:
+                    errors.append({"row": index, "error": Appointment.OVERLAP_MESSAGE})
+                else:
+                    accepted.append(appointment)
+
+        if not dry_run:
+            for start in range(0, len(accepted), chunk_size):
+                Appointment.objects.bulk_create(accepted[start:start + chunk_size])
+            created = len(accepted)
+            record_created(accepted)
+            # bulk_create skips post_save, so drop the cached schedules ourselves.
+            transaction.on_commit(lambda: invalidate_booked_many(
+                (appointment.doctor_id, appointment.date) for appointment in accepted
+            ))
+
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "created": created,
+        "valid": len(accepted),
+        "failed": len(errors),
+        "errors": errors,
+    }
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from hospital.archive import archive_appointments
+
+
+class Command(BaseCommand):
+    help = (
+        "Move appointments dated more than APPOINTMENT_ARCHIVE_DAYS ago to the archive table. "
+        "They stay readable through the appointment history endpoints and exports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0,
+                            help="Seconds to sleep between batches, to spread the load.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        moved = archive_appointments(batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} appointments older than {settings.APPOINTMENT_ARCHIVE_DAYS} days "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hospital.retention import archive_notifications, purge_archive
+
+
+class Command(BaseCommand):
+    help = "Move read and stale notifications to the archive table and purge expired archived ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--read-days', type=int,
+                            help="Archive read notifications older than this. Defaults to NOTIFICATION_ARCHIVE_READ_DAYS.")
+        parser.add_argument('--unread-days', type=int,
+                            help="Archive any notification older than this. Defaults to NOTIFICATION_ARCHIVE_UNREAD_DAYS.")
+        parser.add_argument('--retention-days', type=int,
+                            help="Purge archived notifications older than this; 0 keeps them. "
+                                 "Defaults to NOTIFICATION_RETENTION_DAYS.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0,
+                            help="Seconds to sleep between batches, to spread the load.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        moved = archive_notifications(
+            options['read_days'], options['unread_days'], batch_size=options['batch_size'], pause=options['pause'],
+        )
+        purged = purge_archive(options['retention_days'], batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} notifications and purged {purged} in {time.perf_counter() - started:.1f}s"
+        ))
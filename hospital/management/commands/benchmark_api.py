@@ -0,0 +1,446 @@
+import json
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+import hospital.urls
+import mpesa_stk.urls
+from hospital.models import Appointment, AppointmentSeries, Doctor, Notification, Patient, WaitlistEntry
+from hospital.series import book_series
+from hospital.stats import rebuild_stats
+from hospital.tokens import issue_tokens
+from hospital.waitlist import offer_slots
+from mpesa_stk.client import get_client
+from mpesa_stk.models import MpesaRequest, MpesaResponse
+from mpesa_stk.stub import FakeDaraja, callback_payload
+from mpesa_stk.views import with_callback_token
+
+PASSWORD = 'bench-password'
+
+# Routes that cannot be measured as request/response pairs.
+SKIPPED = {
+    'notification_stream': "server-sent events stream never completes",
+}
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    # Nearest-rank method.
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Dataset:
+    """Benchmark fixtures, created under a unique prefix and removed afterwards."""
+
+    def __init__(self, doctors, patients, appointments, notifications):
+        self.prefix = f'bench-{uuid.uuid4().hex[:8]}'
+        self.counter = 0
+        self.lock = threading.Lock()
+        self.base = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=3650)
+
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create(
+            [User(username=f'{self.prefix}-dr{i}', password=password) for i in range(doctors)]
+            + [User(username=f'{self.prefix}-pt{i}', password=password) for i in range(patients)]
+        )
+        self.doctors = Doctor.objects.bulk_create(
+            [Doctor(user=user, specialty=('Cardiology', 'Dermatology', 'Pediatrics')[i % 3])
+             for i, user in enumerate(users[:doctors])]
+        )
+        self.patients = Patient.objects.bulk_create(
+            [Patient(user=user, birth_date='1990-01-01', phone_number='254700000000') for user in users[doctors:]]
+        )
+
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        Appointment.objects.bulk_create([
+            Appointment(
+                doctor=doctor,
+                patient=self.patients[(d * appointments + i) % patients],
+                date=now + timedelta(hours=i - appointments // 2),
+                reason='Routine checkup',
+                is_approved=i % 2 == 0,
+            )
+            for d, doctor in enumerate(self.doctors)
+            for i in range(appointments)
+        ], batch_size=1000)
+        rebuild_stats([doctor.id for doctor in self.doctors])
+        Notification.objects.bulk_create([
+            Notification(patient=patient, message='Your appointment has been approved.')
+            for patient in self.patients
+            for _ in range(notifications)
+        ], batch_size=1000)
+
+        # Session for staff-only routes, sent as a cookie header.
+        client = Client()
+        client.force_login(User.objects.create(username=f'{self.prefix}-staff', password=password, is_staff=True))
+        self.staff_session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.staff_headers = {'HTTP_COOKIE': f'{settings.SESSION_COOKIE_NAME}={self.staff_session}'}
+
+    def unique(self):
+        with self.lock:
+            self.counter += 1
+            return self.counter
+
+    def doctor(self, i):
+        return self.doctors[i % len(self.doctors)]
+
+    def patient(self, i):
+        return self.patients[i % len(self.patients)]
+
+    def free_date(self):
+        # Far-future, one hour apart, so generated bookings never collide.
+        return self.base + timedelta(hours=self.unique())
+
+    def series_start(self):
+        # Ten weeks per series, well past the free_date() hours, so up to ten
+        # weekly occurrences never collide.
+        return self.base + timedelta(weeks=520 + 10 * self.unique())
+
+    def new_appointments(self, n, **fields):
+        return Appointment.objects.bulk_create([
+            Appointment(doctor=self.doctor(i), patient=self.patient(i), date=self.free_date(), reason='Bench', **fields)
+            for i in range(n)
+        ])
+
+    def waitlist_entries(self, n):
+        # Each window covers its own free_date() hour only.
+        entries = []
+        for i in range(n):
+            date = self.free_date()
+            entries.append(WaitlistEntry(
+                doctor=self.doctor(i), patient=self.patient(i), reason='Bench',
+                window_start=date, window_end=date + timedelta(minutes=30),
+            ))
+        return WaitlistEntry.objects.bulk_create(entries)
+
+    def waitlist_offers(self, n):
+        return offer_slots([(entry.doctor_id, entry.window_start) for entry in self.waitlist_entries(n)])
+
+    def cleanup(self):
+        MpesaRequest.objects.filter(account_reference=self.prefix).delete()
+        MpesaResponse.objects.filter(request__isnull=True, merchant_request_id=self.prefix).delete()
+        User.objects.filter(username__startswith=f'{self.prefix}-').delete()
+        Session.objects.filter(session_key=self.staff_session).delete()
+
+
+def _json(data):
+    return {'data': json.dumps(data), 'content_type': 'application/json'}
+
+
+# Each builder returns ``n`` ``(method, path, kwargs)`` requests for one route.
+SCENARIOS = {
+    'patient_signup': lambda ds, n: [
+        ('post', reverse('patient_signup'), _json({
+            'username': f'{ds.prefix}-signup{ds.unique()}', 'email': f'{ds.prefix}-{ds.unique()}@example.com',
+            'password': PASSWORD, 'birth_date': '1990-01-01', 'phone_number': '254700000000',
+        })) for _ in range(n)
+    ],
+    'patient_login': lambda ds, n: [
+        ('post', reverse('patient_login'), _json({'username': ds.patient(i).user.username, 'password': PASSWORD}))
+        for i in range(n)
+    ],
+    'doctor_login': lambda ds, n: [
+        ('post', reverse('doctor_login'), _json({'username': ds.doctor(i).user.username, 'password': PASSWORD}))
+        for i in range(n)
+    ],
+    'token_refresh': lambda ds, n: [
+        ('post', reverse('token_refresh'), _json({
+            'refresh_token': issue_tokens(ds.patient(i).user_id, 'patient', ds.patient(i).id)['refresh_token'],
+        })) for i in range(n)
+    ],
+    'doctor_list': lambda ds, n: [('get', reverse('doctor_list'), {}) for _ in range(n)],
+    'doctor_availability': lambda ds, n: [
+        ('get', reverse('doctor_availability'), {'data': {'doctor': ds.doctor(i).id}}) for i in range(n)
+    ],
+    'doctor_stats_overview': lambda ds, n: [
+        ('get', reverse('doctor_stats_overview'), ds.staff_headers) for _ in range(n)
+    ],
+    'doctor_stats': lambda ds, n: [
+        ('get', reverse('doctor_stats', args=[ds.doctor(i).id]), ds.staff_headers) for i in range(n)
+    ],
+    'doctor_appointments': lambda ds, n: [
+        ('get', reverse('doctor_appointments', args=[ds.doctor(i).id]), {}) for i in range(n)
+    ],
+    'patient_appointments': lambda ds, n: [
+        ('get', reverse('patient_appointments', args=[ds.patient(i).id]), {}) for i in range(n)
+    ],
+    'appointment_create': lambda ds, n: [
+        ('post', reverse('appointment_create'), _json({
+            'doctor_id': ds.doctor(i).id, 'patient_id': ds.patient(i).id,
+            'date': ds.free_date().isoformat(), 'reason': 'Bench booking',
+        })) for i in range(n)
+    ],
+    'appointment_import': lambda ds, n: [
+        ('post', reverse('appointment_import'), {**_json([
+            {'doctor_id': ds.doctor(j).id, 'patient_id': ds.patient(j).id,
+             'date': ds.free_date().isoformat(), 'reason': 'Bench import'}
+            for j in range(20)
+        ]), **ds.staff_headers}) for _ in range(n)
+    ],
+    'appointment_export': lambda ds, n: [
+        ('get', reverse('appointment_export'), {'data': {'doctor': ds.doctor(i).id}, **ds.staff_headers})
+        for i in range(n)
+    ],
+    'appointment_search': lambda ds, n: [
+        ('get', reverse('appointment_search'), {'data': {'q': 'routine', 'doctor': ds.doctor(i).id}, **ds.staff_headers})
+        for i in range(n)
+    ],
+    'appointment_batch': lambda ds, n: [
+        ('post', reverse('appointment_batch'), _json({
+            'action': 'approve', 'ids': [appointment.id for appointment in ds.new_appointments(20)],
+        })) for _ in range(n)
+    ],
+    'appointment_series_create': lambda ds, n: [
+        ('post', reverse('appointment_series_create'), _json({
+            'doctor_id': ds.doctor(i).id, 'patient_id': ds.patient(i).id, 'reason': 'Bench physiotherapy',
+            'starts_at': ds.series_start().isoformat(), 'frequency': AppointmentSeries.WEEKLY, 'count': 8,
+        })) for i in range(n)
+    ],
+    'appointment_series': lambda ds, n: [
+        ('get', reverse('appointment_series', args=[book_series(
+            ds.doctor(i).id, ds.patient(i).id, 'Bench physiotherapy', ds.series_start(), AppointmentSeries.WEEKLY,
+            count=8,
+        ).id]), {}) for i in range(n)
+    ],
+    'waitlist_join': lambda ds, n: [
+        ('post', reverse('waitlist_join'), _json({
+            'doctor_id': ds.doctor(i).id, 'patient_id': ds.patient(i).id, 'reason': 'Bench',
+            'window_start': ds.free_date().isoformat(), 'window_end': ds.free_date().isoformat(),
+        })) for i in range(n)
+    ],
+    'waitlist_entry': lambda ds, n: [
+        ('delete', reverse('waitlist_entry', args=[entry.id]), {}) for entry in ds.waitlist_entries(n)
+    ],
+    'patient_waitlist': lambda ds, n: [
+        ('get', reverse('patient_waitlist', args=[ds.patient(i).id]), {}) for i in range(n)
+    ],
+    'waitlist_offer_accept': lambda ds, n: [
+        ('post', reverse('waitlist_offer_accept', args=[offer.id]), {}) for offer in ds.waitlist_offers(n)
+    ],
+    'approve_appointment': lambda ds, n: [
+        ('post', reverse('approve_appointment', args=[appointment.id]), {})
+        for appointment in ds.new_appointments(n)
+    ],
+    'update_appointment_details': lambda ds, n: [
+        ('put', reverse('update_appointment_details', args=[appointment.id]),
+         _json({'diagnosis': 'Seasonal flu', 'prescription': 'Rest and fluids'}))
+        for appointment in ds.new_appointments(n, is_approved=True)
+    ],
+    'appointment_delete': lambda ds, n: [
+        ('delete', reverse('appointment_delete', args=[appointment.id]), {})
+        for appointment in ds.new_appointments(n)
+    ],
+    'notifications': lambda ds, n: [
+        ('get', reverse('notifications', args=[ds.patient(i).id]), {}) for i in range(n)
+    ],
+    'notification_unread_count': lambda ds, n: [
+        ('get', reverse('notification_unread_count', args=[ds.patient(i).id]), {}) for i in range(n)
+    ],
+    'notification_poll': lambda ds, n: [
+        ('get', reverse('notification_poll', args=[ds.patient(i).id]), {'data': {'timeout': 0}}) for i in range(n)
+    ],
+    'notification_batch': lambda ds, n: [
+        ('post', reverse('notification_batch', args=[ds.patient(i).id]), _json({
+            'action': 'mark_read', 'ids': [notification.id for notification in Notification.objects.bulk_create(
+                [Notification(patient=ds.patient(i), message='Bench') for _ in range(20)]
+            )],
+        })) for i in range(n)
+    ],
+    'delete-notification': lambda ds, n: [
+        ('delete', reverse('delete-notification', args=[notification.id]), {})
+        for notification in Notification.objects.bulk_create(
+            [Notification(patient=ds.patient(i), message='Bench') for i in range(n)]
+        )
+    ],
+    'stk_push': lambda ds, n: [
+        ('post', reverse('stk_push'), _json({
+            'phone_number': '254700000000', 'amount': '100.00',
+            'account_reference': ds.prefix, 'transaction_desc': 'Consultation',
+        })) for _ in range(n)
+    ],
+    'stk_status': lambda ds, n: [
+        ('get', reverse('stk_status', args=[request.id]), {})
+        for request in MpesaRequest.objects.bulk_create([
+            MpesaRequest(phone_number='254700000000', amount=100, account_reference=ds.prefix,
+                         transaction_desc='Consultation') for _ in range(n)
+        ])
+    ],
+    'stk_callback': lambda ds, n: [
+        ('post', with_callback_token(reverse('stk_callback')), _json(callback_payload(ds.prefix, f'{ds.prefix}-{ds.unique()}')))
+        for _ in range(n)
+    ],
+}
+
+# Password hashing makes logins orders of magnitude slower than anything
+# else, so they get fewer requests by default.
+REQUEST_CAPS = {'patient_login': 10, 'doctor_login': 10, 'patient_signup': 10}
+
+
+def route_names():
+    return [pattern.name for pattern in hospital.urls.urlpatterns + mpesa_stk.urls.urlpatterns]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a benchmark dataset, drive every API route at a given concurrency "
+        "and report latency percentiles, throughput and SQL queries per request "
+        "as JSON. With --baseline, fail when a route regresses past the thresholds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help="Requests per route.")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--routes', nargs='*', help="Only these route names.")
+        parser.add_argument('--doctors', type=int, default=20)
+        parser.add_argument('--patients', type=int, default=200)
+        parser.add_argument('--appointments', type=int, default=50, help="Appointments per doctor.")
+        parser.add_argument('--notifications', type=int, default=5, help="Notifications per patient.")
+        parser.add_argument('--output', help="Write the report to this file as well as stdout.")
+        parser.add_argument('--baseline', help="Compare against a stored report.")
+        parser.add_argument('--max-latency-regression', type=float, default=0.25,
+                            help="Allowed relative p95 increase over the baseline.")
+        parser.add_argument('--max-query-increase', type=float, default=0.5,
+                            help="Allowed increase in mean SQL queries per request. Cached routes "
+                                 "vary slightly with cache misses; an N+1 adds at least one.")
+
+    def handle(self, *args, **options):
+        names = options['routes'] or route_names()
+        unknown = set(names) - set(route_names())
+        if unknown:
+            raise CommandError(f"Unknown routes: {', '.join(sorted(unknown))}")
+
+        dataset = Dataset(options['doctors'], options['patients'], options['appointments'], options['notifications'])
+        report = {
+            'config': {key: options[key] for key in ('requests', 'concurrency', 'doctors', 'patients', 'appointments', 'notifications')},
+            'routes': {},
+            'skipped': {},
+        }
+        try:
+            with FakeDaraja() as daraja, override_settings(
+                MPESA_BASE_URL=daraja.url,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            ):
+                get_client.cache_clear()
+                for name in names:
+                    if name in SKIPPED:
+                        report['skipped'][name] = SKIPPED[name]
+                    elif name not in SCENARIOS:
+                        report['skipped'][name] = "no benchmark scenario"
+                    else:
+                        count = min(options['requests'], REQUEST_CAPS.get(name, options['requests']))
+                        report['routes'][name] = self.run_route(SCENARIOS[name](dataset, count), options['concurrency'])
+            get_client.cache_clear()
+        finally:
+            dataset.cleanup()
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        if options['baseline']:
+            self.compare(report, options)
+
+    def run_route(self, requests, concurrency):
+        pending = deque(requests)
+        lock = threading.Lock()
+        latencies, queries, errors, failures = [], [], [], []
+
+        def worker():
+            # Views that raise answer 500 instead of killing the worker.
+            client = Client(raise_request_exception=False)
+            try:
+                while True:
+                    with lock:
+                        if not pending:
+                            return
+                        method, path, kwargs = pending.popleft()
+                    try:
+                        with CaptureQueriesContext(connection) as captured:
+                            started = time.perf_counter()
+                            response = getattr(client, method)(path, **kwargs)
+                            if response.streaming:
+                                b''.join(response.streaming_content)
+                            elapsed = time.perf_counter() - started
+                    except Exception as e:
+                        # A failure outside the view, e.g. while streaming the body.
+                        with lock:
+                            failures.append(type(e).__name__)
+                        continue
+                    with lock:
+                        latencies.append(elapsed * 1000)
+                        queries.append(len(captured))
+                        if response.status_code >= 400:
+                            errors.append(response.status_code)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        sent = len(latencies) + len(failures)
+        # Latency and query figures are None when no request completed.
+        return {
+            'requests': sent,
+            'errors': len(errors) + len(failures),
+            'p50_ms': _round(percentile(latencies, 50)),
+            'p95_ms': _round(percentile(latencies, 95)),
+            'p99_ms': _round(percentile(latencies, 99)),
+            'throughput_rps': round(sent / wall, 1),
+            'queries_per_request': _round(sum(queries) / len(queries)) if queries else None,
+            'max_queries': max(queries, default=None),
+        }
+
+    def compare(self, report, options):
+        with open(options['baseline']) as f:
+            baseline = json.load(f)
+
+        regressions = []
+        for name, current in report['routes'].items():
+            previous = baseline.get('routes', {}).get(name)
+            if not previous:
+                continue
+            # Figures are None for routes where no request completed.
+            p95, previous_p95 = current['p95_ms'], previous['p95_ms']
+            if p95 is not None and previous_p95 is not None and (
+                p95 > previous_p95 * (1 + options['max_latency_regression'])
+            ):
+                regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+            queries, previous_queries = current['queries_per_request'], previous['queries_per_request']
+            if queries is not None and previous_queries is not None and (
+                queries > previous_queries + options['max_query_increase']
+            ):
+                regressions.append(
+                    f"{name}: queries/request {previous['queries_per_request']} -> {current['queries_per_request']}"
+                )
+            if current['errors'] > previous['errors']:
+                regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+
+        if regressions:
+            raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+        self.stderr.write(self.style.SUCCESS("No regressions against baseline"))
@@ -0,0 +1,59 @@
+import base64
+import json
+import time
+import uuid
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from hospital.authentication import SignedTokenAuthentication
+from hospital.tokens import issue_tokens
+
+
+def _rate(func, seconds):
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        func()
+        count += 1
+    return round(count / (time.perf_counter() - started), 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure, on one core, password logins per second and authenticated "
+        "requests per second with per-request password auth versus signed tokens."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=3.0, help="Duration of each measurement.")
+
+    def handle(self, *args, **options):
+        seconds = options['seconds']
+        username, password = f'bench-{uuid.uuid4().hex[:8]}', uuid.uuid4().hex
+        user = User.objects.create_user(username=username, password=password)
+        factory = APIRequestFactory()
+
+        try:
+            basic = 'Basic ' + base64.b64encode(f'{username}:{password}'.encode()).decode()
+            basic_request = Request(factory.get('/', HTTP_AUTHORIZATION=basic))
+            token = issue_tokens(user.id, 'patient', 0)['access_token']
+            token_request = Request(factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+
+            report = {
+                'logins_per_second': _rate(lambda: authenticate(username=username, password=password), seconds),
+                'requests_per_second_password_auth': _rate(
+                    lambda: BasicAuthentication().authenticate(basic_request), seconds
+                ),
+                'requests_per_second_token_auth': _rate(
+                    lambda: SignedTokenAuthentication().authenticate(token_request), seconds
+                ),
+            }
+        finally:
+            user.delete()
+
+        self.stdout.write(json.dumps(report))
@@ -0,0 +1,90 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from hospital.archive import archive_appointments
+from hospital.management.commands.benchmark_api import SCENARIOS, Command as ApiBenchmark, Dataset
+from hospital.models import Appointment, AppointmentArchive
+
+ROUTES = ('appointment_create', 'patient_appointments', 'doctor_appointments')
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure booking and appointment-history latency, grow the history, and measure again. "
+        "Old appointments are archived before each round unless --no-archive is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help="Requests per route and round.")
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--doctors', type=int, default=20)
+        parser.add_argument('--patients', type=int, default=200)
+        parser.add_argument('--history', type=int, default=500,
+                            help="Past appointments per doctor in the first round.")
+        parser.add_argument('--growth', type=int, default=10, help="History multiplier for the second round.")
+        parser.add_argument('--no-archive', action='store_true', help="Keep all history in the live table.")
+        parser.add_argument('--output', help="Write the report to this file as well as stdout.")
+
+    def handle(self, *args, **options):
+        dataset = Dataset(options['doctors'], options['patients'], 20, 0)
+        self.history = 0
+        report = {
+            'config': {key: options[key] for key in ('requests', 'concurrency', 'doctors', 'patients', 'history',
+                                                     'growth', 'no_archive')},
+            'rounds': [],
+        }
+        api = ApiBenchmark()
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for size in (options['history'], options['history'] * options['growth']):
+                    self.add_history(dataset, size)
+                    archived = 0 if options['no_archive'] else archive_appointments()
+                    report['rounds'].append({
+                        'history_per_doctor': size,
+                        'archived': archived,
+                        'live_rows': Appointment.objects.count(),
+                        'archived_rows': AppointmentArchive.objects.count(),
+                        'routes': {
+                            name: api.run_route(SCENARIOS[name](dataset, options['requests']), options['concurrency'])
+                            for name in ROUTES
+                        },
+                    })
+        finally:
+            # Skip the per-row delete signals for the generated history.
+            doctors = [doctor.id for doctor in dataset.doctors]
+            Appointment.objects.filter(doctor_id__in=doctors)._raw_delete(Appointment.objects.db)
+            AppointmentArchive.objects.filter(doctor_id__in=doctors).delete()
+            dataset.cleanup()
+
+        first, last = report['rounds']
+        report['p50_ratio'] = {
+            name: round(last['routes'][name]['p50_ms'] / first['routes'][name]['p50_ms'], 2) for name in ROUTES
+        }
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+
+    def add_history(self, dataset, size):
+        """Top each benchmark doctor up to ``size`` appointments older than the archive horizon."""
+        horizon = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(
+            days=settings.APPOINTMENT_ARCHIVE_DAYS + 1,
+        )
+        Appointment.objects.bulk_create([
+            Appointment(
+                doctor=doctor,
+                patient=dataset.patient(d * size + i),
+                date=horizon - timedelta(hours=i),
+                reason='Routine checkup',
+                is_approved=True,
+            )
+            for d, doctor in enumerate(dataset.doctors)
+            for i in range(self.history, size)
+        ], batch_size=1000)
+        self.history = size
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db.backends.signals import connection_created
+from django.test import AsyncRequestFactory, RequestFactory
+from django.test.utils import override_settings
+
+from hospital.management.commands.benchmark_api import SCENARIOS, Dataset, percentile
+from mpesa_stk.client import get_client
+from mpesa_stk.stub import FakeDaraja
+
+ROUTES = (
+    'notifications', 'notification_unread_count', 'notification_poll', 'patient_appointments', 'doctor_list',
+    'stk_status', 'stk_push',
+)
+
+
+class ConnectionCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, **kwargs):
+        with self._lock:
+            self.count += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the same requests through Django's WSGI and ASGI handlers with many clients at once and "
+        "report throughput, latency and database connections opened for each, as JSON. WSGI serves them "
+        "on a fixed pool of threads, as a threaded worker would."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per route and handler.")
+        parser.add_argument('--concurrency', type=int, default=100, help="Clients sending requests at once.")
+        parser.add_argument('--wsgi-threads', type=int, default=16, help="Threads serving WSGI requests.")
+        parser.add_argument('--routes', nargs='*', default=list(ROUTES))
+        parser.add_argument('--daraja-latency', type=float, default=0.2,
+                            help="Seconds the fake M-Pesa API takes to answer.")
+        parser.add_argument('--push-workers', type=int, default=0,
+                            help="MPESA_PUSH_WORKERS for the run; 0 sends each push inside its request.")
+        parser.add_argument('--doctors', type=int, default=20)
+        parser.add_argument('--patients', type=int, default=200)
+        parser.add_argument('--output', help="Write the report to this file as well as stdout.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['routes']) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown routes: {', '.join(sorted(unknown))}")
+
+        dataset = Dataset(options['doctors'], options['patients'], 50, 5)
+        report = {
+            'config': {key: options[key] for key in (
+                'requests', 'concurrency', 'wsgi_threads', 'daraja_latency', 'push_workers',
+            )},
+            'routes': {},
+        }
+        counter = ConnectionCounter()
+        connection_created.connect(counter)
+        try:
+            with FakeDaraja(latency=options['daraja_latency']) as daraja, override_settings(
+                MPESA_BASE_URL=daraja.url,
+                MPESA_PUSH_WORKERS=options['push_workers'],
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            ):
+                get_client.cache_clear()
+                wsgi, asgi = get_wsgi_application(), get_asgi_application()
+                for name in options['routes']:
+                    results = {}
+                    for server, run in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+                        requests = SCENARIOS[name](dataset, options['requests'])
+                        opened = counter.count
+                        handler = wsgi if server == 'wsgi' else asgi
+                        results[server] = run(handler, requests, options)
+                        results[server]['connections_opened'] = counter.count - opened
+                    results['asgi_throughput_ratio'] = round(
+                        results['asgi']['throughput_rps'] / results['wsgi']['throughput_rps'], 2
+                    )
+                    report['routes'][name] = results
+            get_client.cache_clear()
+        finally:
+            connection_created.disconnect(counter)
+            dataset.cleanup()
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+
+    def run_wsgi(self, application, requests, options):
+        factory = RequestFactory()
+
+        def call(method, path, kwargs, sent):
+            statuses = []
+            environ = getattr(factory, method)(path, **kwargs).environ
+            response = application(environ, lambda status, headers, exc_info=None: statuses.append(int(status[:3])))
+            try:
+                for _ in response:
+                    pass
+            finally:
+                # Fires request_finished, which closes or keeps the connection.
+                response.close()
+            return time.perf_counter() - sent, statuses[0]
+
+        # Each client sends its next request as soon as the previous one is
+        # answered; requests beyond the thread count queue for a thread.
+        pending = deque(requests)
+        in_flight = set()
+        results = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['wsgi_threads']) as pool:
+            while pending or in_flight:
+                while pending and len(in_flight) < options['concurrency']:
+                    in_flight.add(pool.submit(call, *pending.popleft(), time.perf_counter()))
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+        return self.summarize(results, time.perf_counter() - started)
+
+    def run_asgi(self, application, requests, options):
+        factory = AsyncRequestFactory()
+        pending = deque(requests)
+        results = []
+
+        async def call(method, path, kwargs):
+            request = getattr(factory, method)(path, **kwargs)
+            body = request.body
+            received = False
+            statuses = []
+
+            async def receive():
+                nonlocal received
+                if not received:
+                    received = True
+                    return {'type': 'http.request', 'body': body, 'more_body': False}
+                # The client never disconnects; the handler cancels this wait.
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            sent = time.perf_counter()
+            await application(request.scope, receive, send)
+            return time.perf_counter() - sent, statuses[0]
+
+        async def client():
+            while pending:
+                results.append(await call(*pending.popleft()))
+
+        async def run():
+            await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+
+        started = time.perf_counter()
+        asyncio.run(run())
+        return self.summarize(results, time.perf_counter() - started)
+
+    def summarize(self, results, wall):
+        latencies = [elapsed * 1000 for elapsed, _ in results]
+        return {
+            'requests': len(results),
+            'errors': sum(1 for _, status in results if status >= 400),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'throughput_rps': round(len(results) / wall, 1),
+        }
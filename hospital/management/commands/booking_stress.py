@@ -0,0 +1,77 @@
+import json
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from hospital.booking import BookingConflict, book_appointment
+from hospital.models import APPOINTMENT_GAP, Appointment, Doctor, Patient
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent bookings at a throwaway doctor and report throughput "
+        "and any double-bookings that slipped through."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--attempts', type=int, default=400)
+        parser.add_argument('--slots', type=int, default=40,
+                            help="Distinct start times to contend for, 10 minutes apart.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help="Keep the generated doctor and appointments.")
+
+    def handle(self, *args, **options):
+        suffix = uuid.uuid4().hex[:8]
+        doctor = Doctor.objects.create(user=User.objects.create(username=f'stress-dr-{suffix}'), specialty='Stress')
+        patient = Patient.objects.create(
+            user=User.objects.create(username=f'stress-pt-{suffix}'),
+            birth_date='1990-01-01',
+            phone_number='0',
+        )
+
+        # 10-minute spacing means neighbouring candidates overlap, so most
+        # attempts must be rejected.
+        base = timezone.now().replace(second=0, microsecond=0) + timedelta(days=365)
+        rng = random.Random(options['seed'])
+        candidates = [base + timedelta(minutes=10 * rng.randrange(options['slots'])) for _ in range(options['attempts'])]
+
+        def attempt(date):
+            try:
+                book_appointment(doctor.id, patient.id, date=date, reason='stress')
+                return 'booked'
+            except BookingConflict:
+                return 'conflict'
+            except Exception:
+                return 'error'
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            outcomes = list(pool.map(attempt, candidates))
+        elapsed = time.perf_counter() - started
+
+        dates = list(Appointment.objects.filter(doctor=doctor).order_by('date').values_list('date', flat=True))
+        double_bookings = sum(1 for a, b in zip(dates, dates[1:]) if b - a < APPOINTMENT_GAP)
+
+        if not options['keep']:
+            User.objects.filter(id__in=[doctor.user_id, patient.user_id]).delete()
+
+        self.stdout.write(json.dumps({
+            'threads': options['threads'],
+            'attempts': len(outcomes),
+            'booked': outcomes.count('booked'),
+            'conflicts': outcomes.count('conflict'),
+            'errors': outcomes.count('error'),
+            'double_bookings': double_bookings,
+            'seconds': round(elapsed, 3),
+            'attempts_per_second': round(len(outcomes) / elapsed, 1),
+        }))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hospital.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Turn queued outbox entries into notifications, in batches, until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain what is pending, then exit.")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            drained = drain_outbox(options['batch_size'])
+            total += drained
+            if drained:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Drained {total} outbox entries"))
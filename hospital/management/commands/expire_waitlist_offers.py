@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hospital.waitlist import expire_offers, purge_lapsed_entries
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire waitlist offers nobody accepted in time, offering each slot to the next patient waiting, "
+        "and drop entries whose window has passed. Run it every minute, or with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help="Keep running, checking again after this many seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_offers(batch_size=options['batch_size'])
+            purged = purge_lapsed_entries()
+            self.stdout.write(self.style.SUCCESS(f"Expired {expired} offers and purged {purged} waitlist entries"))
+            if options['loop'] is None:
+                break
+            time.sleep(options['loop'])
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import serializers
+
+from hospital.exports import export_lines
+from hospital.views import appointment_history, filter_appointments
+
+
+class Command(BaseCommand):
+    help = "Stream appointment and treatment history as NDJSON or CSV to stdout or a file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--output', help="Write to this file instead of stdout.")
+        parser.add_argument('--doctor', type=int)
+        parser.add_argument('--patient', type=int)
+        parser.add_argument('--date-from', help="ISO 8601 date or datetime.")
+        parser.add_argument('--date-to', help="ISO 8601 date or datetime; a date includes the whole day.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        params = {'date_from': options['date_from'], 'date_to': options['date_to']}
+        try:
+            appointments = appointment_history(params)
+            if options['doctor']:
+                appointments = appointments.filter(doctor_id=options['doctor'])
+            if options['patient']:
+                appointments = appointments.filter(patient_id=options['patient'])
+            appointments = filter_appointments(appointments, params)
+        except serializers.ValidationError as e:
+            raise CommandError(e.detail)
+
+        chunks = export_lines(appointments, options['format'], options['chunk_size'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write(chunk)
@@ -0,0 +1,37 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hospital.imports import import_appointments
+
+
+class Command(BaseCommand):
+    help = "Bulk-import appointments from a CSV or JSON file and print a per-row error report."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'json'],
+                            help="Input format. Defaults to the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Validate only; do not insert.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('json' if path.endswith('.json') else 'csv')
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                if fmt == 'json':
+                    rows = json.load(f)
+                else:
+                    rows = list(csv.DictReader(f))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        report = import_appointments(rows, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['created']} created, {report['valid']} valid, {report['failed']} failed"
+        ))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hospital.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-doctor daily appointment statistics from the appointments table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctor', type=int, action='append', dest='doctors',
+                            help="Only rebuild this doctor's rows. Repeatable.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = rebuild_stats(options['doctors'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows} doctor-day rows in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,219 @@
+import csv
+import io
+import random
+import time
+from array import array
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from hospital.directory import invalidate_directory
+from hospital.models import APPOINTMENT_GAP, Appointment, Doctor, Notification, Patient
+from hospital.stats import rebuild_stats
+
+SPECIALTIES = [
+    'Cardiology', 'Dermatology', 'Endocrinology', 'Gastroenterology', 'General Practice',
+    'Neurology', 'Obstetrics', 'Oncology', 'Ophthalmology', 'Orthopedics', 'Pediatrics', 'Psychiatry',
+]
+REASONS = [
+    'Routine checkup', 'Persistent cough', 'Back pain', 'Follow-up visit', 'Skin rash',
+    'Headache and dizziness', 'Blood pressure review', 'Chest pain', 'Vaccination', 'Joint pain',
+]
+DIAGNOSES = ['Common cold', 'Hypertension', 'Migraine', 'Eczema', 'Lower back strain', 'Type 2 diabetes']
+PRESCRIPTIONS = ['Paracetamol 500mg', 'Amlodipine 5mg', 'Ibuprofen 400mg', 'Hydrocortisone cream', 'Metformin 500mg']
+MESSAGES = [
+    'Your appointment has been approved.',
+    'Your doctor has updated your appointment details.',
+    'Reminder: you have an appointment tomorrow.',
+]
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic, production-scale dataset of doctors, patients, "
+        "non-overlapping appointments and notifications."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=1000)
+        parser.add_argument('--patients', type=int, default=100000)
+        parser.add_argument('--appointments', type=int, default=1000000)
+        parser.add_argument('--notifications', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=730,
+                            help="Span of the schedule, centred on today.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed', help="Username prefix for generated accounts.")
+        parser.add_argument('--copy', action='store_true',
+                            help="Load appointments and notifications with PostgreSQL COPY.")
+
+    def handle(self, *args, **options):
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError("--copy requires PostgreSQL")
+        if options['doctors'] < 1 or options['patients'] < 1:
+            raise CommandError("At least one doctor and one patient are required")
+        if User.objects.filter(username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Users with prefix '{options['prefix']}-' already exist; pick another --prefix")
+
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.prefix = options['prefix']
+        # Hashing is deliberately slow, so every generated account shares one.
+        self.password = make_password('password')
+
+        doctor_ids = self.timed('doctors', lambda: self.create_profiles(
+            Doctor, options['doctors'], 'dr', lambda user_id: Doctor(user_id=user_id, specialty=self.rng.choice(SPECIALTIES))
+        ))
+        patient_ids = self.timed('patients', lambda: self.create_profiles(
+            Patient, options['patients'], 'pt', lambda user_id: Patient(
+                user_id=user_id,
+                birth_date=date(1940, 1, 1) + timedelta(days=self.rng.randrange(80 * 365)),
+                phone_number=f'2547{self.rng.randrange(10 ** 8):08d}',
+            )
+        ))
+
+        appointments = self.appointments(doctor_ids, patient_ids, options['appointments'], options['days'])
+        notifications = self.notifications(patient_ids, options['notifications'], options['days'])
+        load = self.copy_rows if options['copy'] else self.insert_rows
+        self.timed('appointments', lambda: load(
+            Appointment, [
+                'doctor_id', 'patient_id', 'date', 'reason', 'is_approved', 'prescription', 'diagnosis',
+                'created_at', 'approved_at',
+            ],
+            appointments,
+        ))
+        self.timed('notifications', lambda: load(
+            Notification, ['patient_id', 'message', 'is_read', 'created_at'], notifications,
+        ))
+
+        # Raw inserts skip signals and the statistics bookkeeping.
+        invalidate_directory()
+        self.timed('statistics', rebuild_stats)
+
+    def timed(self, label, func):
+        started = time.perf_counter()
+        result = func()
+        self.stdout.write(f"{label}: {time.perf_counter() - started:.1f}s")
+        return result
+
+    def create_profiles(self, model, count, kind, build):
+        """Create ``count`` users plus profiles in chunks; return the profile ids."""
+        ids = array('q')
+        for start in range(0, count, self.chunk_size):
+            size = min(self.chunk_size, count - start)
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f'{self.prefix}-{kind}{start + i}', password=self.password)
+                    for i in range(size)
+                ])
+                profiles = model.objects.bulk_create([build(user.id) for user in users])
+            ids.extend(profile.id for profile in profiles)
+        return ids
+
+    def appointments(self, doctor_ids, patient_ids, count, days):
+        """Yield appointment rows, round-robin over doctors so only one cursor per doctor is held.
+
+        Each doctor's cursor moves forward by a random whole number of
+        30-minute slots inside clinic hours, so rows never overlap.
+        """
+        rng = self.rng
+        tz = timezone.get_current_timezone()
+        opening = getattr(settings, 'CLINIC_OPENING_HOUR', 8)
+        closing = getattr(settings, 'CLINIC_CLOSING_HOUR', 17)
+        slot = int(APPOINTMENT_GAP.total_seconds())
+        now = timezone.now()
+        first_day = (now - timedelta(days=days // 2)).date()
+        cursors = array('d', (
+            datetime.combine(first_day + timedelta(days=rng.randrange(7)), datetime.min.time()).replace(
+                hour=opening, tzinfo=tz).timestamp()
+            for _ in doctor_ids
+        ))
+
+        for i in range(count):
+            d = i % len(doctor_ids)
+            moment = datetime.fromtimestamp(cursors[d] + slot * rng.randint(1, 6), tz)
+            if moment.hour >= closing or moment.hour < opening:
+                moment = (moment + timedelta(days=1)).replace(hour=opening, minute=0)
+            cursors[d] = moment.timestamp()
+
+            treated = moment < now and rng.random() < 0.8
+            approved = treated or rng.random() < 0.5
+            created_at = min(moment, now) - timedelta(minutes=rng.randrange(30, 60 * 24 * 14))
+            yield {
+                'doctor_id': doctor_ids[d],
+                'patient_id': patient_ids[rng.randrange(len(patient_ids))],
+                'date': moment,
+                'reason': rng.choice(REASONS),
+                'is_approved': approved,
+                'prescription': rng.choice(PRESCRIPTIONS) if treated else None,
+                'diagnosis': rng.choice(DIAGNOSES) if treated else None,
+                'created_at': created_at,
+                'approved_at': created_at + timedelta(minutes=rng.randrange(5, 60 * 48)) if approved else None,
+            }
+
+    def notifications(self, patient_ids, count, days):
+        rng = self.rng
+        now = timezone.now()
+        for _ in range(count):
+            age = timedelta(seconds=rng.randrange(days * 86400 // 2))
+            yield {
+                'patient_id': patient_ids[rng.randrange(len(patient_ids))],
+                'message': rng.choice(MESSAGES),
+                'is_read': rng.random() < 0.7,
+                'created_at': now - age,
+            }
+
+    def insert_rows(self, model, columns, rows):
+        """Multi-row INSERTs without building model instances, which dominate bulk_create at this volume."""
+        table = connection.ops.quote_name(model._meta.db_table)
+        placeholders = ', '.join(['%s'] * len(columns))
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        adapt = connection.ops.adapt_datetimefield_value
+        total = 0
+        for chunk in chunked(rows, self.chunk_size):
+            params = [
+                [adapt(value) if isinstance(value, datetime) else value for value in (row[column] for column in columns)]
+                for row in chunk
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+            total += len(chunk)
+        return total
+
+    def copy_rows(self, model, columns, rows):
+        table = connection.ops.quote_name(model._meta.db_table)
+        sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        total = 0
+        for chunk in chunked(rows, self.chunk_size):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in chunk:
+                writer.writerow([
+                    value.isoformat() if isinstance(value, datetime) else ('' if value is None else value)
+                    for value in (row[column] for column in columns)
+                ])
+            with connection.cursor() as cursor:
+                raw = cursor.cursor
+                if hasattr(raw, 'copy_expert'):  # psycopg2
+                    buffer.seek(0)
+                    raw.copy_expert(sql, buffer)
+                else:  # psycopg 3
+                    with raw.copy(sql) as copy:
+                        copy.write(buffer.getvalue())
+            total += len(chunk)
+        return total
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+# timestamptz + interval is only STABLE, so wrap the slot range in an
+# IMMUTABLE function that the exclusion constraint is allowed to index.
+# A fixed minutes interval does not depend on the session time zone.
+CREATE_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    """
+    CREATE OR REPLACE FUNCTION hospital_appointment_slot(timestamptz) RETURNS tstzrange
+    LANGUAGE sql IMMUTABLE AS $$ SELECT tstzrange($1, $1 + interval '30 minutes') $$
+    """,
+    """
+    ALTER TABLE hospital_appointment ADD CONSTRAINT appointment_doctor_no_overlap
+    EXCLUDE USING gist (doctor_id WITH =, hospital_appointment_slot(date) WITH &&)
+    """,
+]
+
+DROP_SQL = [
+    "ALTER TABLE hospital_appointment DROP CONSTRAINT IF EXISTS appointment_doctor_no_overlap",
+    "DROP FUNCTION IF EXISTS hospital_appointment_slot(timestamptz)",
+]
+
+
+def add_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def remove_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0004_appointment_doctor_date_patient_date_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_overlap_constraint, remove_overlap_constraint),
+    ]
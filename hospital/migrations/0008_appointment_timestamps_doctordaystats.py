@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:28
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0007_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='approved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DoctorDayStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('booked', models.IntegerField(default=0)),
+                ('approved', models.IntegerField(default=0)),
+                ('approval_time', models.DurationField(default=datetime.timedelta(0))),
+                ('approval_samples', models.IntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hospital.doctor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='doctordaystats_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('doctor', 'day'), name='doctordaystats_doctor_day_uniq')],
+            },
+        ),
+    ]
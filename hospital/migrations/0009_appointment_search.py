@@ -0,0 +1,89 @@
+from django.db import OperationalError, migrations
+
+# The SQL is frozen here as it stood when this migration was written;
+# hospital.search keeps the current copy for its post_migrate hook.
+PG_CREATE = [
+    """
+    ALTER TABLE hospital_appointment ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(diagnosis, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(prescription, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(reason, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS appointment_search_idx ON hospital_appointment USING gin (search_vector)",
+]
+PG_DROP = [
+    "DROP INDEX IF EXISTS appointment_search_idx",
+    "ALTER TABLE hospital_appointment DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS hospital_appointment_fts USING fts5("
+    "reason, diagnosis, prescription, content='hospital_appointment', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    """
+    CREATE TRIGGER IF NOT EXISTS hospital_appointment_fts_ai AFTER INSERT ON hospital_appointment BEGIN
+        INSERT INTO hospital_appointment_fts(rowid, reason, diagnosis, prescription)
+        VALUES (new.id, new.reason, new.diagnosis, new.prescription);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hospital_appointment_fts_ad AFTER DELETE ON hospital_appointment BEGIN
+        INSERT INTO hospital_appointment_fts(hospital_appointment_fts, rowid, reason, diagnosis, prescription)
+        VALUES ('delete', old.id, old.reason, old.diagnosis, old.prescription);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hospital_appointment_fts_au
+    AFTER UPDATE OF reason, diagnosis, prescription ON hospital_appointment BEGIN
+        INSERT INTO hospital_appointment_fts(hospital_appointment_fts, rowid, reason, diagnosis, prescription)
+        VALUES ('delete', old.id, old.reason, old.diagnosis, old.prescription);
+        INSERT INTO hospital_appointment_fts(rowid, reason, diagnosis, prescription)
+        VALUES (new.id, new.reason, new.diagnosis, new.prescription);
+    END
+    """,
+    "INSERT INTO hospital_appointment_fts(hospital_appointment_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS hospital_appointment_fts_ai",
+    "DROP TRIGGER IF EXISTS hospital_appointment_fts_ad",
+    "DROP TRIGGER IF EXISTS hospital_appointment_fts_au",
+    "DROP TABLE IF EXISTS hospital_appointment_fts",
+]
+
+
+def add_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in PG_CREATE:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            try:
+                cursor.execute(SQLITE_CREATE[0])
+            except OperationalError:
+                # SQLite built without FTS5: searches fall back to icontains.
+                return
+            for sql in SQLITE_CREATE[1:]:
+                cursor.execute(sql)
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in PG_DROP:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_DROP:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0008_appointment_timestamps_doctordaystats'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
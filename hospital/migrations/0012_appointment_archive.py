@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen as it stood when this migration was written; hospital.archive
+# keeps the current definition for its pre/post_migrate hooks.
+COLUMNS = (
+    'id, doctor_id, patient_id, date, reason, is_approved, prescription, diagnosis, created_at, approved_at'
+)
+CREATE_VIEW = (
+    f"CREATE VIEW hospital_appointment_history AS "
+    f"SELECT {COLUMNS} FROM hospital_appointment "
+    f"UNION ALL SELECT {COLUMNS} FROM hospital_appointmentarchive"
+)
+DROP_VIEW = "DROP VIEW IF EXISTS hospital_appointment_history"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0011_notificationarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateTimeField()),
+                ('reason', models.TextField()),
+                ('is_approved', models.BooleanField()),
+                ('prescription', models.TextField(null=True)),
+                ('diagnosis', models.TextField(null=True)),
+                ('created_at', models.DateTimeField(null=True)),
+                ('approved_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'db_table': 'hospital_appointment_history',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='AppointmentArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateTimeField()),
+                ('reason', models.TextField()),
+                ('is_approved', models.BooleanField(default=False)),
+                ('prescription', models.TextField(blank=True, null=True)),
+                ('diagnosis', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(null=True)),
+                ('approved_at', models.DateTimeField(blank=True, null=True)),
+                ('doctor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='hospital.doctor')),
+                ('patient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='hospital.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doctor', 'date'], name='appointment_cold_doctor_idx'), models.Index(fields=['patient', 'date'], name='appointment_cold_patient_idx')],
+            },
+        ),
+        migrations.RunSQL([DROP_VIEW, CREATE_VIEW], DROP_VIEW),
+    ]
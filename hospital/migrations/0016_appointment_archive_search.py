@@ -0,0 +1,90 @@
+from django.db import OperationalError, migrations
+
+# The archive gets the same full-text index as hospital_appointment in
+# 0009. The SQL is frozen here as it stood when this migration was written;
+# hospital.search keeps the current copy for its post_migrate hook.
+PG_CREATE = [
+    """
+    ALTER TABLE hospital_appointmentarchive ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(diagnosis, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(prescription, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(reason, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS appointment_archive_search_idx ON hospital_appointmentarchive USING gin (search_vector)",
+]
+PG_DROP = [
+    "DROP INDEX IF EXISTS appointment_archive_search_idx",
+    "ALTER TABLE hospital_appointmentarchive DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS hospital_appointmentarchive_fts USING fts5("
+    "reason, diagnosis, prescription, content='hospital_appointmentarchive', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    """
+    CREATE TRIGGER IF NOT EXISTS hospital_appointmentarchive_fts_ai AFTER INSERT ON hospital_appointmentarchive BEGIN
+        INSERT INTO hospital_appointmentarchive_fts(rowid, reason, diagnosis, prescription)
+        VALUES (new.id, new.reason, new.diagnosis, new.prescription);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hospital_appointmentarchive_fts_ad AFTER DELETE ON hospital_appointmentarchive BEGIN
+        INSERT INTO hospital_appointmentarchive_fts(hospital_appointmentarchive_fts, rowid, reason, diagnosis, prescription)
+        VALUES ('delete', old.id, old.reason, old.diagnosis, old.prescription);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hospital_appointmentarchive_fts_au
+    AFTER UPDATE OF reason, diagnosis, prescription ON hospital_appointmentarchive BEGIN
+        INSERT INTO hospital_appointmentarchive_fts(hospital_appointmentarchive_fts, rowid, reason, diagnosis, prescription)
+        VALUES ('delete', old.id, old.reason, old.diagnosis, old.prescription);
+        INSERT INTO hospital_appointmentarchive_fts(rowid, reason, diagnosis, prescription)
+        VALUES (new.id, new.reason, new.diagnosis, new.prescription);
+    END
+    """,
+    "INSERT INTO hospital_appointmentarchive_fts(hospital_appointmentarchive_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS hospital_appointmentarchive_fts_ai",
+    "DROP TRIGGER IF EXISTS hospital_appointmentarchive_fts_ad",
+    "DROP TRIGGER IF EXISTS hospital_appointmentarchive_fts_au",
+    "DROP TABLE IF EXISTS hospital_appointmentarchive_fts",
+]
+
+
+def add_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in PG_CREATE:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            try:
+                cursor.execute(SQLITE_CREATE[0])
+            except OperationalError:
+                # SQLite built without FTS5: searches fall back to icontains.
+                return
+            for sql in SQLITE_CREATE[1:]:
+                cursor.execute(sql)
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in PG_DROP:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_DROP:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital', '0015_outbox_event_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from datetime import timedelta
+from types import SimpleNamespace
+
+# Minimum distance between two appointments with the same doctor.
+APPOINTMENT_GAP = timedelta(minutes=30)
 
 class Doctor(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -19,6 +25,34 @@ class Patient(models.Model):
         return self.user.username
 
 
+class AppointmentSeries(models.Model):
+    """A recurring booking: ``count`` appointments ``interval`` days, weeks or months apart.
+
+    The occurrences are ordinary ``Appointment`` rows linked back through
+    ``Appointment.series``; see ``hospital.series``.
+    """
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    FREQUENCY_CHOICES = [
+        (DAILY, 'Daily'),
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+    ]
+
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    reason = models.TextField()
+    starts_at = models.DateTimeField()
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
+    interval = models.PositiveSmallIntegerField(default=1)
+    count = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.count} x {self.frequency} appointments from {self.starts_at}"
+
+
 class Appointment(models.Model):
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
@@ -27,6 +61,47 @@ class Appointment(models.Model):
     is_approved = models.BooleanField(default=False)
     prescription = models.TextField(blank=True, null=True)  
     diagnosis = models.TextField(blank=True, null=True)  
+    # Unknown (null) for appointments booked before these columns existed.
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    approved_at = models.DateTimeField(blank=True, null=True)
+    series = models.ForeignKey(
+        AppointmentSeries, on_delete=models.SET_NULL, null=True, blank=True, related_name='appointments',
+    )
+
+    # What hospital.stats counts an appointment by.
+    STATS_FIELDS = ('doctor_id', 'date', 'is_approved', 'created_at', 'approved_at')
+
+    OVERLAP_MESSAGE = (
+        'There is already an appointment scheduled within 30 minutes of this time slot. '
+        'Please choose a time slot that is at least 30 minutes apart from existing appointments.'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'date'], name='appointment_doctor_date_idx'),
+            models.Index(fields=['patient', 'date'], name='appointment_patient_date_idx'),
+            # Newest-first listings across all doctors (the admin changelist).
+            models.Index(fields=['date', 'id'], name='appointment_date_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored doctor and time, so moving the appointment can also
+        # invalidate the schedule it left. None when either was deferred.
+        instance._stored_booking = (instance.__dict__.get('doctor_id'), instance.__dict__.get('date'))
+        # The counted state, so saves can move the daily stats from it.
+        instance._stored_stats = instance.stats_state()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._stored_stats = self.stats_state()
+
+    def stats_state(self):
+        """The ``STATS_FIELDS`` values, or None when any of them is deferred."""
+        values = {name: self.__dict__[name] for name in self.STATS_FIELDS if name in self.__dict__}
+        return SimpleNamespace(**values) if len(values) == len(self.STATS_FIELDS) else None
 
     def __str__(self):
         return f"Appointment for {self.patient.user.username} with Dr. {self.doctor.user.username} on {self.date}"
@@ -35,30 +110,233 @@ class Appointment(models.Model):
         if not self.date:
             return
 
-        time_threshold = timedelta(minutes=30)
-        start_time = self.date - time_threshold
-        end_time = self.date + time_threshold
+        start_time = self.date - APPOINTMENT_GAP
+        end_time = self.date + APPOINTMENT_GAP
 
-        overlapping_appointments = Appointment.objects.filter(
+        overlapping_appointments = appointment_source(start_time).objects.filter(
             doctor=self.doctor,
-            date__range=(start_time, end_time)
+            date__gt=start_time,
+            date__lt=end_time
         ).exclude(id=self.id)
 
         if overlapping_appointments.exists():
-            raise ValidationError(
-                'There is already an appointment scheduled within 30 minutes of this time slot. '
-                'Please choose a time slot that is at least 30 minutes apart from existing appointments.'
-            )
+            raise ValidationError(self.OVERLAP_MESSAGE, code='overlap')
 
     def save(self, *args, **kwargs):
-        self.clean()
+        # Partial updates that leave the doctor and time alone (approval,
+        # treatment notes) cannot create an overlap, so skip the check.
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'date', 'doctor'} & set(update_fields):
+            self.clean()
         super().save(*args, **kwargs)
 
+class AppointmentArchive(models.Model):
+    """Appointments older than ``APPOINTMENT_ARCHIVE_DAYS``, moved out of ``Appointment`` by ``hospital.archive``.
+
+    Rows keep their original id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    # The composite indexes below lead with these, so they need no index of their own.
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, db_index=False)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, db_index=False)
+    date = models.DateTimeField()
+    reason = models.TextField()
+    is_approved = models.BooleanField(default=False)
+    prescription = models.TextField(blank=True, null=True)
+    diagnosis = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(null=True)
+    approved_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'date'], name='appointment_cold_doctor_idx'),
+            models.Index(fields=['patient', 'date'], name='appointment_cold_patient_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived appointment #{self.id}"
+
+
+class AppointmentHistory(models.Model):
+    """Read-only view over ``Appointment`` and ``AppointmentArchive`` together.
+
+    Backed by the ``hospital_appointment_history`` database view, a
+    ``UNION ALL`` of the two tables; see ``hospital.archive``.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    doctor = models.ForeignKey(Doctor, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    patient = models.ForeignKey(Patient, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    date = models.DateTimeField()
+    reason = models.TextField()
+    is_approved = models.BooleanField()
+    prescription = models.TextField(null=True)
+    diagnosis = models.TextField(null=True)
+    created_at = models.DateTimeField(null=True)
+    approved_at = models.DateTimeField(null=True)
+
+    class Meta:
+        managed = False
+        db_table = 'hospital_appointment_history'
+
+    def __str__(self):
+        return f"Appointment #{self.id}"
+
+
+def appointment_source(since):
+    """``Appointment`` when nothing from ``since`` on can have been archived, else ``AppointmentHistory``."""
+    horizon = timezone.now() - timedelta(days=settings.APPOINTMENT_ARCHIVE_DAYS)
+    return AppointmentHistory if since < horizon else Appointment
+
+
+class DoctorDayStats(models.Model):
+    """Running appointment counters for one doctor and one (local) appointment day.
+
+    Kept current by ``hospital.stats`` as appointments are booked, approved
+    and deleted; ``manage.py rebuild_appointment_stats`` recomputes them.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    day = models.DateField()
+    booked = models.IntegerField(default=0)
+    approved = models.IntegerField(default=0)
+    # Sum and number of booking-to-approval intervals, for the average.
+    approval_time = models.DurationField(default=timedelta(0))
+    approval_samples = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'day'], name='doctordaystats_doctor_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='doctordaystats_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"Stats for doctor #{self.doctor_id} on {self.day}"
+
 class Notification(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Every read is "unread notifications for one patient"; read rows
+            # never enter this index.
+            models.Index(
+                fields=['patient', 'id'],
+                condition=models.Q(is_read=False),
+                name='notification_unread_idx',
+            ),
+            # Lets the archiver find old rows without scanning the table.
+            models.Index(fields=['created_at'], name='notification_created_idx'),
+        ]
+
     def __str__(self):  
         return f"Notification for {self.patient.user.username}"
+
+
+class NotificationArchive(models.Model):
+    """Cold storage for notifications moved out of ``Notification`` by ``hospital.retention``.
+
+    Rows keep their original id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    message = models.TextField()
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='notification_archive_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived notification #{self.id}"
+
+
+class NotificationOutbox(models.Model):
+    """Notifications written in the same transaction as the change that caused them.
+
+    A background worker turns pending rows into ``Notification`` rows in
+    batches; see ``hospital.outbox``.
+    """
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    message = models.TextField()
+    # Names the event, e.g. "appointment:12:approved". Entries for one patient
+    # with the same key are coalesced when drained; blank ones never are.
+    event_key = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Pending notification #{self.id}"
+
+
+class WaitlistEntry(models.Model):
+    """A patient waiting for any slot with ``doctor`` between ``window_start`` and ``window_end``.
+
+    When a matching appointment is cancelled, ``hospital.waitlist`` offers
+    the freed slot to the waiting entry with the highest ``priority``,
+    oldest first.
+    """
+    WAITING = 'waiting'
+    OFFERED = 'offered'
+    BOOKED = 'booked'
+    STATUS_CHOICES = [
+        (WAITING, 'Waiting'),
+        (OFFERED, 'Offered'),
+        (BOOKED, 'Booked'),
+    ]
+
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    window_start = models.DateTimeField()
+    window_end = models.DateTimeField()
+    reason = models.TextField()
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=WAITING)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # The matcher's lookup: waiting entries of one doctor whose window
+            # has started by the freed slot. Offered and booked entries never
+            # enter this index.
+            models.Index(
+                fields=['doctor', 'window_start'],
+                condition=models.Q(status='waiting'),
+                name='waitlist_waiting_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Waitlist entry for patient #{self.patient_id} with doctor #{self.doctor_id}"
+
+
+class WaitlistOffer(models.Model):
+    """A freed slot held for one waitlist entry until ``expires_at``."""
+    PENDING = 'pending'
+    ACCEPTED = 'accepted'
+    EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (ACCEPTED, 'Accepted'),
+        (EXPIRED, 'Expired'),
+    ]
+
+    entry = models.ForeignKey(WaitlistEntry, on_delete=models.CASCADE, related_name='offers')
+    date = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Lets the expiry job find lapsed offers without scanning the table.
+            models.Index(fields=['expires_at'], condition=models.Q(status='pending'), name='waitlist_offer_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"Offer of {self.date} to waitlist entry #{self.entry_id}"
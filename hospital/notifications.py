@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .serializers import NotificationSerializer
+
+
+class Subscription:
+    """A patient's live feed. ``get()`` waits for the next published payload."""
+
+    def __init__(self, maxsize=100):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def offer(self, payload):
+        # Runs on the subscriber's loop. A client that falls this far behind
+        # drops events and catches up through the ``since`` cursor on reconnect.
+        if not self.queue.full():
+            self.queue.put_nowait(payload)
+
+
+class InProcessBroker:
+    """Fan out notifications to subscribers connected to this process.
+
+    ``publish()`` is called from synchronous request threads and hands the
+    payload to each subscriber's event loop. Deployments running several
+    ASGI processes should point ``NOTIFICATION_BROKER`` at a backend with
+    the same three methods that relays through a shared channel.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, patient_id):
+        subscription = Subscription()
+        with self._lock:
+            self._subscribers[patient_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, patient_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(patient_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[patient_id]
+
+    def publish(self, patient_id, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(patient_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, payload)
+            except RuntimeError:
+                # The subscriber's loop has already shut down.
+                self.unsubscribe(patient_id, subscription)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, 'NOTIFICATION_BROKER', 'hospital.notifications.InProcessBroker'))()
+
+
+def publish_notification(notification):
+    get_broker().publish(notification.patient_id, dict(NotificationSerializer(notification).data))
@@ -0,0 +1,101 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .models import Notification, NotificationOutbox
+from .notifications import publish_notification
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_notification(patient_id, message, event_key=''):
+    """Queue a notification as part of the caller's transaction.
+
+    Pending entries for the same patient and non-blank ``event_key`` are
+    delivered as one notification.
+    """
+    entry = NotificationOutbox.objects.create(patient_id=patient_id, message=message, event_key=event_key)
+    if getattr(settings, 'NOTIFICATION_OUTBOX_AUTODRAIN', True):
+        transaction.on_commit(worker.wake)
+    return entry
+
+
+def enqueue_notifications(messages):
+    """Queue ``(patient_id, message, event_key)`` tuples with one ``INSERT``; ``event_key`` may be blank."""
+    entries = NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(patient_id=patient_id, message=message, event_key=event_key)
+        for patient_id, message, event_key in messages
+    ])
+    if entries and getattr(settings, 'NOTIFICATION_OUTBOX_AUTODRAIN', True):
+        transaction.on_commit(worker.wake)
+    return entries
+
+
+def drain_outbox(batch_size=500):
+    """Move up to ``batch_size`` pending entries into ``Notification``; return how many were taken.
+
+    Entries for the same patient and event within one batch are coalesced
+    into a single notification carrying the newest message; entries without
+    an event key never are. Rows are claimed with ``SKIP LOCKED`` where
+    supported, so several workers can drain in parallel.
+    """
+    with transaction.atomic():
+        entries = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size]
+        )
+        if not entries:
+            return 0
+
+        pending = {}
+        for entry in entries:
+            key = (entry.patient_id, entry.event_key) if entry.event_key else entry.id
+            # The newest entry replaces older ones and is delivered in its own place.
+            pending.pop(key, None)
+            pending[key] = entry
+        notifications = Notification.objects.bulk_create([
+            Notification(patient_id=entry.patient_id, message=entry.message) for entry in pending.values()
+        ])
+        NotificationOutbox.objects.filter(id__in=[entry.id for entry in entries]).delete()
+
+        # bulk_create skips post_save, so push to live clients here.
+        transaction.on_commit(lambda: [publish_notification(notification) for notification in notifications])
+    return len(entries)
+
+
+class OutboxWorker:
+    """Background thread that drains the outbox whenever a write commits.
+
+    Used when ``NOTIFICATION_OUTBOX_AUTODRAIN`` is on; deployments that run
+    ``manage.py drain_notification_outbox`` instead can turn it off.
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def wake(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='notification-outbox', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            close_old_connections()
+            try:
+                while drain_outbox(self.batch_size):
+                    pass
+            except Exception:
+                logger.exception("Draining the notification outbox failed")
+            finally:
+                connection.close()
+
+
+worker = OutboxWorker()
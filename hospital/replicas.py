@@ -0,0 +1,153 @@
+"""Read replicas for the read-only API views.
+
+Views decorated with ``@read_from_replica`` run their ``GET``/``HEAD`` reads
+on one of ``settings.DATABASE_REPLICAS``; everything else, including every
+write and every read inside ``transaction.atomic()``, uses ``default``. Views
+that fill a cache (the doctor directory, availability) stay on the primary
+so a lagging replica is never cached.
+
+Replicas lag the primary, so a client that has just written reads from the
+primary for ``REPLICA_STICKY_SECONDS`` afterwards: browsers through a cookie,
+bearer-token clients through a cache entry keyed by their user id (use a
+shared cache backend when running several workers).
+
+To try it locally with two SQLite files, copy the database and point a
+replica at the copy::
+
+    cp db.sqlite3 replica.sqlite3
+    DATABASE_REPLICAS='{"replica": {"NAME": "replica.sqlite3"}}' python manage.py runserver
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework import authentication
+
+from .tokens import InvalidToken, read_access_token
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'hospital_primary_until'
+
+
+class Routing:
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+_routing = ContextVar('hospital_db_routing', default=None)
+
+
+def read_from_replica(view):
+    """Mark a view (function or ``APIView`` class) whose safe requests may read from a replica."""
+    view.read_from_replica = True
+    return view
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or routing.replica is None or routing.wrote:
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction must see its writes and locks.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            # Whatever the request reads after writing comes from the primary.
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+
+def _sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+
+def _token_user_id(request):
+    header = authentication.get_authorization_header(request).split()
+    if len(header) != 2 or header[0].lower() != b'bearer':
+        return None
+    try:
+        return read_access_token(header[1].decode())['uid']
+    except (InvalidToken, UnicodeError):
+        return None
+
+
+def _sticky_key(user_id):
+    return f'hospital:replica:sticky:{user_id}'
+
+
+class ReplicaRoutingMiddleware:
+    """Choose the database for each request's reads and remember recent writers."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        routing = Routing()
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self._finish(request, routing, response)
+
+    async def __acall__(self, request):
+        routing = Routing()
+        token = _routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self._finish(request, routing, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        view = getattr(view_func, 'view_class', view_func)
+        if (
+            replicas and request.method in SAFE_METHODS
+            and getattr(view, 'read_from_replica', False) and not self._sticky(request)
+        ):
+            _routing.get().replica = random.choice(replicas)
+
+    def _sticky(self, request):
+        try:
+            if float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time():
+                return True
+        except ValueError:
+            pass
+        user_id = _token_user_id(request)
+        return user_id is not None and cache.get(_sticky_key(user_id)) is not None
+
+    def _finish(self, request, routing, response):
+        if request.method in SAFE_METHODS and not routing.wrote:
+            return response
+        seconds = _sticky_seconds()
+        response.set_cookie(
+            STICKY_COOKIE, str(int(time.time()) + seconds), max_age=seconds, httponly=True, samesite='Lax',
+        )
+        user_id = _token_user_id(request)
+        if user_id is not None:
+            cache.set(_sticky_key(user_id), 1, seconds)
+        return response
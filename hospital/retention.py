@@ -0,0 +1,78 @@
+"""Notification retention: keep the hot ``Notification`` table small.
+
+Every read is "unread notifications for one patient", so read notifications
+and ones left unread for too long are moved to ``NotificationArchive``, and
+archived rows past the retention period are purged. Both run in batches,
+each in its own short transaction, so neither holds locks for long.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Notification, NotificationArchive
+
+FIELDS = ['id', 'patient_id', 'message', 'is_read', 'created_at']
+
+
+def archive_notifications(read_days=None, unread_days=None, batch_size=1000, pause=0, now=None):
+    """Move read notifications older than ``read_days`` and any older than ``unread_days``; return the count."""
+    now = now or timezone.now()
+    if read_days is None:
+        read_days = settings.NOTIFICATION_ARCHIVE_READ_DAYS
+    if unread_days is None:
+        unread_days = settings.NOTIFICATION_ARCHIVE_UNREAD_DAYS
+    read_cutoff = now - timedelta(days=read_days)
+    unread_cutoff = now - timedelta(days=unread_days)
+    # The plain range lets the created_at index do the work of the OR.
+    candidates = Notification.objects.filter(
+        Q(is_read=True, created_at__lt=read_cutoff) | Q(created_at__lt=unread_cutoff),
+        created_at__lt=max(read_cutoff, unread_cutoff),
+    ).order_by('id')
+
+    moved = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            # Rows a reader is updating right now are left for the next run.
+            rows = list(
+                candidates.filter(id__gt=last_id).select_for_update(skip_locked=True).values_list(*FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            NotificationArchive.objects.bulk_create([
+                NotificationArchive(archived_at=now, **dict(zip(FIELDS, row))) for row in rows
+            ])
+            Notification.objects.filter(id__in=[row[0] for row in rows]).delete()
+        moved += len(rows)
+        last_id = rows[-1][0]
+        if len(rows) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+def purge_archive(retention_days=None, batch_size=1000, pause=0, now=None):
+    """Delete archived notifications created more than ``retention_days`` ago; return the count."""
+    if retention_days is None:
+        retention_days = settings.NOTIFICATION_RETENTION_DAYS
+    if not retention_days:
+        return 0
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days)
+    expired = NotificationArchive.objects.filter(created_at__lt=cutoff)
+
+    purged = 0
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        purged += NotificationArchive.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return purged
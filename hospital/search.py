@@ -0,0 +1,191 @@
+"""Full-text search over appointment reason, diagnosis and prescription.
+
+Live and archived appointments are indexed alike. PostgreSQL keeps a
+weighted ``tsvector`` in a generated column with a GIN index. SQLite, for
+local and dev use, keeps an external-content FTS5 table up to date with
+triggers. Either way the index follows every write, including
+``bulk_create`` and raw inserts. Other backends fall back to ``icontains``.
+"""
+import re
+
+from django.db import OperationalError, connection, connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.migrations.recorder import MigrationRecorder
+
+# Each indexed table, with its GIN index and the migration that added it.
+INDEXES = {
+    'hospital_appointment': ('appointment_search_idx', ('hospital', '0009_appointment_search')),
+    'hospital_appointmentarchive': ('appointment_archive_search_idx', ('hospital', '0016_appointment_archive_search')),
+}
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def pg_create(table):
+    index, _ = INDEXES[table]
+    # Diagnosis and prescription outrank words in the patient's stated reason.
+    return [
+        f"""
+        ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(diagnosis, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(prescription, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(reason, '')), 'B')
+        ) STORED
+        """,
+        f"CREATE INDEX IF NOT EXISTS {index} ON {table} USING gin (search_vector)",
+    ]
+
+
+def pg_drop(table):
+    index, _ = INDEXES[table]
+    return [
+        f"DROP INDEX IF EXISTS {index}",
+        f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector",
+    ]
+
+
+def sqlite_table(table):
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table(table)} USING fts5("
+        f"reason, diagnosis, prescription, content='{table}', content_rowid='id', tokenize='porter unicode61')"
+    )
+
+
+def sqlite_triggers(table):
+    fts = fts_table(table)
+    return {
+        f'{fts}_ai': f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, reason, diagnosis, prescription)
+                VALUES (new.id, new.reason, new.diagnosis, new.prescription);
+            END
+        """,
+        f'{fts}_ad': f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, reason, diagnosis, prescription)
+                VALUES ('delete', old.id, old.reason, old.diagnosis, old.prescription);
+            END
+        """,
+        f'{fts}_au': f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF reason, diagnosis, prescription ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, reason, diagnosis, prescription)
+                VALUES ('delete', old.id, old.reason, old.diagnosis, old.prescription);
+                INSERT INTO {fts}(rowid, reason, diagnosis, prescription)
+                VALUES (new.id, new.reason, new.diagnosis, new.prescription);
+            END
+        """,
+    }
+
+
+def create_search_index(schema_editor, table):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in pg_create(table):
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        triggers = sqlite_triggers(table)
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+                list(triggers),
+            )
+            present = {name for name, in cursor.fetchall()}
+            if present == set(triggers):
+                return
+            try:
+                cursor.execute(sqlite_table(table))
+            except OperationalError:
+                # SQLite built without FTS5: searches fall back to icontains.
+                return
+            for sql in triggers.values():
+                cursor.execute(sql)
+            # Rows written while the triggers were missing are not indexed.
+            cursor.execute(f"INSERT INTO {fts_table(table)}({fts_table(table)}) VALUES ('rebuild')")
+
+
+def drop_search_index(schema_editor, table):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in pg_drop(table):
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for name in sqlite_triggers(table):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {fts_table(table)}")
+
+
+def restore_search_index(using, **kwargs):
+    """post_migrate hook: SQLite drops triggers whenever Django rebuilds the table for an ALTER."""
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return
+    applied = MigrationRecorder(conn).applied_migrations()
+    with conn.schema_editor() as schema_editor:
+        for table, (_, migration) in INDEXES.items():
+            if migration in applied:
+                create_search_index(schema_editor, table)
+
+
+def _fts5_query(terms):
+    # Quote every term so user input cannot use FTS5 operators; all terms
+    # must match and each also matches as a prefix ("amox" finds amoxicillin).
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _has_fts5(table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts_table(table)])
+        return cursor.fetchone() is not None
+
+
+def _matching(appointments, query, terms):
+    table = appointments.model._meta.db_table
+    if connection.vendor == 'postgresql':
+        tsquery = "websearch_to_tsquery('english', %s)"
+        return appointments.filter(
+            RawSQL(f"{table}.search_vector @@ {tsquery}", (query,), output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL(f"ts_rank_cd({table}.search_vector, {tsquery})", (query,), output_field=FloatField())
+        )
+    if connection.vendor == 'sqlite' and _has_fts5(table):
+        fts = fts_table(table)
+        # Joined rather than a correlated subquery so SQLite scores each
+        # match once; bm25() is only available in the MATCHing query.
+        return appointments.extra(
+            tables=[fts],
+            where=[f"{fts}.rowid = {table}.id", f"{fts} MATCH %s"],
+            params=[_fts5_query(terms)],
+        ).annotate(rank=RawSQL(f"-bm25({fts}, 1.0, 2.0, 2.0)", (), output_field=FloatField()))
+    for term in terms:
+        appointments = appointments.filter(
+            Q(reason__icontains=term) | Q(diagnosis__icontains=term) | Q(prescription__icontains=term)
+        )
+    return appointments.annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def search_appointments(appointments, query):
+    """Filter ``appointments`` to those matching ``query`` and order them by relevance.
+
+    ``appointments`` is a queryset of ``Appointment`` or ``AppointmentArchive``.
+    Adds a ``rank`` annotation (higher is better).
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return appointments.none().annotate(rank=Value(0.0, output_field=FloatField()))
+    return _matching(appointments, query, terms).order_by('-rank', '-date', '-id')
+
+
+def search_history(appointments, archived, query):
+    """Search live ``appointments`` and ``archived`` ones together; ``id``/``rank``/``date`` rows, best first.
+
+    Each table is matched through its own index and the results are merged
+    with ``UNION ALL``. Ranks from the two indexes are computed separately,
+    so across tables they compare only roughly.
+    """
+    fields = ('id', 'rank', 'date')
+    return search_appointments(appointments, query).order_by().values(*fields).union(
+        search_appointments(archived, query).order_by().values(*fields), all=True,
+    ).order_by('-rank', '-date', '-id')
@@ -1,11 +1,15 @@
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Doctor, Patient, Appointment, Notification
+from .models import Doctor, Patient, Appointment, AppointmentSeries, Notification, WaitlistEntry, WaitlistOffer
 from django.contrib.auth.models import User
+from .booking import book_appointment
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['username', 'email', 'password']
+        extra_kwargs = {'password': {'write_only': True}}
 
     def create(self, validated_data):
         user = User.objects.create_user(
@@ -35,12 +39,16 @@ class PatientSerializer(serializers.ModelSerializer):
 
 class NotificationSerializer(serializers.ModelSerializer):
     created_at = serializers.DateTimeField(read_only=True)
-    appointment_id = serializers.IntegerField(source='appointment.id', read_only=True, allow_null=True)
+    # Notifications are not linked to appointments; the key stays for API compatibility.
+    appointment_id = serializers.SerializerMethodField()
 
     class Meta:
         model = Notification
         fields = ['id', 'patient', 'message', 'created_at', 'is_read', 'appointment_id']
 
+    def get_appointment_id(self, notification):
+        return None
+
     def create(self, validated_data):
         notification = Notification.objects.create(**validated_data)
         return notification
@@ -66,15 +74,7 @@ class AppointmentSerializer(serializers.ModelSerializer):
         doctor_id = validated_data.pop('doctor_id')
         patient_id = validated_data.pop('patient_id')
 
-        doctor = Doctor.objects.get(id=doctor_id)
-        patient = Patient.objects.get(id=patient_id)
-
-        appointment = Appointment.objects.create(
-            doctor=doctor,
-            patient=patient,
-            **validated_data
-        )
-        return appointment
+        return book_appointment(doctor_id, patient_id, **validated_data)
 
 
 class PatientAppointmentSerializer(serializers.ModelSerializer):
@@ -88,4 +88,135 @@ class PatientAppointmentSerializer(serializers.ModelSerializer):
         model = Appointment
         fields = ['id', 'doctor_name', 'patient_name', 'date', 'reason', 
                  'is_approved', 'approved_at', 'prescription', 'diagnosis']
-        read_only_fields = ['is_approved', 'approved_at', 'prescription', 'diagnosis']
\ No newline at end of file
+        read_only_fields = ['is_approved', 'approved_at', 'prescription', 'diagnosis']
+
+
+# Most ids one batch request may name.
+BATCH_LIMIT = 500
+
+
+class AppointmentBatchSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['approve', 'delete'])
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=BATCH_LIMIT)
+
+
+class NotificationBatchSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['mark_read', 'delete'])
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=BATCH_LIMIT)
+
+
+# Most occurrences one recurring series may have.
+SERIES_LIMIT = 104
+
+
+class SeriesOccurrenceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Appointment
+        fields = ['id', 'date', 'is_approved']
+
+
+class AppointmentSeriesSerializer(serializers.ModelSerializer):
+    """Validates a new series; ``hospital.series.book_series`` books it."""
+    doctor_id = serializers.IntegerField()
+    patient_id = serializers.IntegerField()
+    interval = serializers.IntegerField(min_value=1, max_value=12, default=1)
+    count = serializers.IntegerField(min_value=1, max_value=SERIES_LIMIT)
+    occurrences = SeriesOccurrenceSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = AppointmentSeries
+        fields = ['id', 'doctor_id', 'patient_id', 'reason', 'starts_at', 'frequency', 'interval', 'count', 'occurrences']
+
+
+class AppointmentSeriesUpdateSerializer(serializers.Serializer):
+    reason = serializers.CharField(required=False)
+    time = serializers.TimeField(required=False)
+
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError("Give a new reason, time or both.")
+        return data
+
+
+class WaitlistOfferSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WaitlistOffer
+        fields = ['id', 'date', 'expires_at', 'status']
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    doctor_id = serializers.IntegerField()
+    patient_id = serializers.IntegerField()
+    offers = WaitlistOfferSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = [
+            'id', 'doctor_id', 'patient_id', 'window_start', 'window_end', 'reason', 'priority', 'status', 'offers',
+        ]
+        # Priority is set by staff in the admin, never by the patient joining.
+        read_only_fields = ['priority', 'status']
+
+    def validate(self, data):
+        if data['window_end'] <= data['window_start']:
+            raise serializers.ValidationError("window_end must be after window_start.")
+        if data['window_end'] <= timezone.now():
+            raise serializers.ValidationError("The window has already passed.")
+        return data
+
+
+# Read-only fast paths for large lists. They project the columns with
+# values() and build the same dicts the serializers above produce, without
+# instantiating models or running DRF fields.
+
+def _datetime(value):
+    # Matches serializers.DateTimeField: current time zone, ISO 8601, UTC as 'Z'.
+    value = timezone.localtime(value).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def appointment_rows(queryset):
+    """``values()`` rows for ``serialize_appointment_rows``; pageable like the queryset."""
+    return queryset.annotate(
+        doctor_name=F('doctor__user__username'),
+        patient_name=F('patient__user__username'),
+    ).values(
+        'id', 'doctor_name', 'patient_name', 'date', 'reason', 'is_approved', 'approved_at', 'prescription', 'diagnosis',
+    )
+
+
+def serialize_appointment_rows(rows):
+    """Same output as ``PatientAppointmentSerializer(many=True).data``."""
+    return [
+        {
+            'id': row['id'],
+            'doctor_name': row['doctor_name'],
+            'patient_name': row['patient_name'],
+            'date': _datetime(row['date']),
+            'reason': row['reason'],
+            'is_approved': row['is_approved'],
+            'approved_at': _datetime(row['approved_at']) if row['approved_at'] else None,
+            'prescription': row['prescription'],
+            'diagnosis': row['diagnosis'],
+        }
+        for row in rows
+    ]
+
+
+def notification_rows(queryset):
+    return queryset.values_list('id', 'patient_id', 'message', 'created_at', 'is_read')
+
+
+def serialize_notification_rows(rows):
+    """Same output as ``NotificationSerializer(many=True).data``."""
+    return [
+        {
+            'id': id,
+            'patient': patient_id,
+            'message': message,
+            'created_at': _datetime(created_at),
+            'is_read': is_read,
+            'appointment_id': None,
+        }
+        for id, patient_id, message, created_at, is_read in rows
+    ]
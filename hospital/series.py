@@ -0,0 +1,142 @@
+"""Recurring appointment series.
+
+``book_series`` expands the recurrence into its occurrences, checks all of
+them against the doctor's schedule with one range query and an in-memory
+sweep, and inserts them with one ``bulk_create``: either the whole series is
+booked or none of it. The remaining (upcoming) occurrences can then be
+edited or cancelled together.
+"""
+import calendar
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .availability import invalidate_booked_many
+from .batch import delete_appointments
+from .booking import OVERLAP_CONSTRAINT, BookingConflict, find_conflicts, locked_doctor
+from .models import APPOINTMENT_GAP, Appointment, AppointmentSeries, Patient, appointment_source
+from .stats import record_created
+
+
+class SeriesConflict(BookingConflict):
+    """Occurrences of a series clash with the doctor's schedule; ``dates`` lists every one of them."""
+
+    def __init__(self, dates):
+        super().__init__(Appointment.OVERLAP_MESSAGE)
+        self.dates = dates
+
+
+def expand(start, frequency, interval, count):
+    """The ``count`` occurrence times, all at ``start``'s local time of day.
+
+    Monthly series starting on the 29th-31st fall on the last day of
+    shorter months.
+    """
+    local = timezone.localtime(start).replace(tzinfo=None)
+    dates = []
+    for n in range(count):
+        step = n * interval
+        if frequency == AppointmentSeries.MONTHLY:
+            year, month = divmod(local.month - 1 + step, 12)
+            year += local.year
+            day = min(local.day, calendar.monthrange(year, month + 1)[1])
+            occurrence = local.replace(year=year, month=month + 1, day=day)
+        else:
+            occurrence = local + timedelta(days=step * 7 if frequency == AppointmentSeries.WEEKLY else step)
+        dates.append(timezone.make_aware(occurrence))
+    return dates
+
+
+def _check_schedule(doctor_id, appointments, moving=()):
+    """Raise ``SeriesConflict`` if any of ``appointments`` overlaps the doctor's other bookings.
+
+    ``moving`` are ids of stored appointments being replaced by ``appointments``.
+    """
+    dates = sorted(appointment.date for appointment in appointments)
+    start, end = dates[0] - APPOINTMENT_GAP, dates[-1] + APPOINTMENT_GAP
+    existing = list(appointment_source(start).objects.filter(
+        doctor_id=doctor_id, date__gt=start, date__lt=end,
+    ).exclude(id__in=moving).order_by('date').values_list('date', flat=True))
+    conflicts = find_conflicts(list(enumerate(appointments)), existing)
+    if conflicts:
+        raise SeriesConflict(sorted(appointments[index].date for index in conflicts))
+
+
+def book_series(doctor_id, patient_id, reason, starts_at, frequency, interval=1, count=1):
+    """Book every occurrence of a new series, or none of them; return the series.
+
+    The occurrences are attached as ``series.occurrences``. Raises
+    ``SeriesConflict`` and ``Doctor.DoesNotExist`` / ``Patient.DoesNotExist``
+    for unknown ids.
+    """
+    dates = expand(starts_at, frequency, interval, count)
+    try:
+        with locked_doctor(doctor_id) as doctor:
+            patient = Patient.objects.get(id=patient_id)
+            appointments = [Appointment(doctor=doctor, patient=patient, date=date, reason=reason) for date in dates]
+            _check_schedule(doctor.id, appointments)
+            series = AppointmentSeries.objects.create(
+                doctor=doctor, patient=patient, reason=reason, starts_at=dates[0],
+                frequency=frequency, interval=interval, count=count,
+            )
+            for appointment in appointments:
+                appointment.series = series
+            Appointment.objects.bulk_create(appointments)
+            record_created(appointments)
+            # bulk_create skips post_save, so drop the cached schedules ourselves.
+            transaction.on_commit(lambda: invalidate_booked_many((doctor.id, date) for date in dates))
+    except IntegrityError as e:
+        if OVERLAP_CONSTRAINT in str(e):
+            raise BookingConflict(Appointment.OVERLAP_MESSAGE) from e
+        raise
+    series.occurrences = appointments
+    return series
+
+
+def remaining_occurrences(series, now=None):
+    return series.appointments.filter(date__gte=now or timezone.now()).order_by('date')
+
+
+def update_series(series, reason=None, time=None, now=None):
+    """Give the remaining occurrences a new ``reason`` and/or local ``time`` of day; return them.
+
+    Occurrences keep their day, so the daily stats are unaffected. Raises
+    ``SeriesConflict`` if the new time clashes with any other booking.
+    """
+    try:
+        with locked_doctor(series.doctor_id):
+            appointments = list(remaining_occurrences(series, now).select_for_update())
+            if not appointments:
+                return appointments
+            fields = []
+            if reason is not None:
+                fields.append('reason')
+                for appointment in appointments:
+                    appointment.reason = reason
+                series.reason = reason
+                series.save(update_fields=['reason'])
+            if time is not None:
+                fields.append('date')
+                previous = [(appointment.doctor_id, appointment.date) for appointment in appointments]
+                for appointment in appointments:
+                    day = timezone.localtime(appointment.date).date()
+                    appointment.date = timezone.make_aware(datetime.combine(day, time))
+                _check_schedule(series.doctor_id, appointments, moving=[appointment.id for appointment in appointments])
+                transaction.on_commit(lambda: invalidate_booked_many(
+                    previous + [(appointment.doctor_id, appointment.date) for appointment in appointments]
+                ))
+            Appointment.objects.bulk_update(appointments, fields)
+    except IntegrityError as e:
+        if OVERLAP_CONSTRAINT in str(e):
+            raise BookingConflict(Appointment.OVERLAP_MESSAGE) from e
+        raise
+    return appointments
+
+
+def cancel_series(series, now=None):
+    """Delete the remaining occurrences; return how many there were."""
+    ids = list(remaining_occurrences(series, now).values_list('id', flat=True))
+    if ids:
+        delete_appointments(ids)
+    return len(ids)
@@ -0,0 +1,67 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .availability import invalidate_booked
+from .directory import invalidate_directory
+from .models import Appointment, Doctor, Notification
+from .notifications import publish_notification
+from .stats import record_deleted, record_saved
+from .waitlist import offer_slots
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_doctor_schedule(sender, instance, **kwargs):
+    invalidate_booked(instance.doctor_id, instance.date)
+    stored = getattr(instance, '_stored_booking', (None, None))
+    if None not in stored and stored != (instance.doctor_id, instance.date):
+        # Moved to another time or doctor: the old day has a free slot now.
+        invalidate_booked(*stored)
+    instance._stored_booking = (instance.doctor_id, instance.date)
+
+
+@receiver(post_save, sender=Appointment)
+def count_saved_appointment(sender, instance, created, **kwargs):
+    # Edits through the admin or a plain save() can change the doctor, day
+    # or approval; bulk writes record their own counts.
+    state = instance.stats_state()
+    stored = None if created else getattr(instance, '_stored_stats', None)
+    if state is not None and (created or stored is not None):
+        record_saved(stored, state)
+    instance._stored_stats = state
+
+
+@receiver(post_delete, sender=Appointment)
+def count_deleted_appointment(sender, instance, **kwargs):
+    # A signal rather than a call in AppointmentDeleteView so cascades and
+    # admin deletes are counted too.
+    record_deleted(instance)
+
+
+@receiver(post_delete, sender=Appointment)
+def offer_freed_slot(sender, instance, **kwargs):
+    # After commit, so a rolled-back delete offers nothing and the matcher
+    # sees the slot free.
+    transaction.on_commit(lambda: offer_slots([(instance.doctor_id, instance.date)]))
+
+
+@receiver(post_save, sender=Notification)
+def push_notification(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: publish_notification(instance))
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def invalidate_doctor_directory(sender, **kwargs):
+    transaction.on_commit(invalidate_directory)
+
+
+@receiver(post_save, sender=User)
+def invalidate_doctor_directory_for_user(sender, instance, created, **kwargs):
+    # A brand-new user cannot have a Doctor profile yet. Deleting a doctor's
+    # user cascades to the Doctor row, which invalidates on its own.
+    if not created and Doctor.objects.filter(user_id=instance.id).exists():
+        transaction.on_commit(invalidate_directory)
@@ -0,0 +1,13 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // Reload the changelist filtered on the picked object, keeping the other filters.
+    $(document).on('change', '.autocomplete-filter select', function() {
+        const params = new URLSearchParams(this.closest('.autocomplete-filter').dataset.queryString);
+        if (this.value) {
+            params.set(this.name, this.value);
+        }
+        window.location.search = params.toString();
+    });
+}
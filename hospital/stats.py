@@ -0,0 +1,178 @@
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DurationField, ExpressionWrapper, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AppointmentHistory, DoctorDayStats
+
+
+def _approval_time(appointment):
+    if appointment.approved_at and appointment.created_at and appointment.approved_at >= appointment.created_at:
+        return appointment.approved_at - appointment.created_at
+    return None
+
+
+def _bump(doctor_id, day, deltas, create=True):
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    rows = DoctorDayStats.objects.filter(doctor_id=doctor_id, day=day)
+    if rows.update(**updates) or not create:
+        return
+    try:
+        with transaction.atomic():
+            DoctorDayStats.objects.create(doctor_id=doctor_id, day=day, **deltas)
+    except IntegrityError:
+        # Another transaction created the row first.
+        rows.update(**updates)
+
+
+def _bump_many(totals, create=True):
+    """Add ``{(doctor_id, day): deltas}`` to the counters in at most two queries.
+
+    Missing rows are first inserted as zeros, skipping any that exist or
+    that a concurrent transaction inserts first, then one ``UPDATE`` adds
+    every delta.
+    """
+    totals = {key: deltas for key, deltas in totals.items() if any(deltas.values())}
+    if not totals:
+        return
+    if create:
+        DoctorDayStats.objects.bulk_create(
+            [DoctorDayStats(doctor_id=doctor_id, day=day) for doctor_id, day in totals], ignore_conflicts=True,
+        )
+    updates = {}
+    for field, output_field in (('booked', IntegerField()), ('approved', IntegerField()),
+                                ('approval_time', DurationField()), ('approval_samples', IntegerField())):
+        whens = [
+            When(doctor_id=doctor_id, day=day, then=Value(deltas[field]))
+            for (doctor_id, day), deltas in totals.items() if deltas.get(field)
+        ]
+        if whens:
+            zero = timedelta(0) if field == 'approval_time' else 0
+            updates[field] = F(field) + Case(*whens, default=Value(zero), output_field=output_field)
+    DoctorDayStats.objects.filter(
+        reduce(or_, (Q(doctor_id=doctor_id, day=day) for doctor_id, day in totals)),
+    ).update(**updates)
+
+
+def record_created(appointments):
+    """Count appointments inserted with ``bulk_create``; single saves are counted by ``record_saved``."""
+    totals = defaultdict(lambda: {'booked': 0, 'approved': 0})
+    for appointment in appointments:
+        deltas = totals[appointment.doctor_id, timezone.localdate(appointment.date)]
+        deltas['booked'] += 1
+        if appointment.is_approved:
+            deltas['approved'] += 1
+    _bump_many(totals)
+
+
+def _approval_deltas(appointments, sign):
+    totals = defaultdict(lambda: {'booked': 0, 'approved': 0, 'approval_time': timedelta(0), 'approval_samples': 0})
+    for appointment in appointments:
+        deltas = totals[appointment.doctor_id, timezone.localdate(appointment.date)]
+        approval_time = _approval_time(appointment)
+        deltas['approved'] += sign
+        if approval_time is not None:
+            deltas['approval_time'] += sign * approval_time
+            deltas['approval_samples'] += sign
+    return totals
+
+
+def record_approved_many(appointments):
+    """Count appointments approved with one ``update()``."""
+    _bump_many(_approval_deltas(appointments, 1))
+
+
+def record_deleted_many(appointments):
+    """Bulk form of ``record_deleted``; like it, never creates rows."""
+    totals = _approval_deltas([appointment for appointment in appointments if appointment.is_approved], -1)
+    for appointment in appointments:
+        totals[appointment.doctor_id, timezone.localdate(appointment.date)]['booked'] -= 1
+    _bump_many(totals, create=False)
+
+
+def record_saved(before, after):
+    """Move one appointment's counts from its stored state ``before`` to ``after``.
+
+    Both are ``Appointment.stats_state()`` snapshots; ``before`` is None for
+    a new row. A save that leaves the counted fields alone costs no queries.
+    """
+    totals = defaultdict(lambda: {'booked': 0, 'approved': 0, 'approval_time': timedelta(0), 'approval_samples': 0})
+    for state, sign in ((before, -1), (after, 1)):
+        if state is None:
+            continue
+        deltas = totals[state.doctor_id, timezone.localdate(state.date)]
+        deltas['booked'] += sign
+        if state.is_approved:
+            approval_time = _approval_time(state)
+            deltas['approved'] += sign
+            if approval_time is not None:
+                deltas['approval_time'] += sign * approval_time
+                deltas['approval_samples'] += sign
+    for (doctor_id, day), deltas in totals.items():
+        _bump(doctor_id, day, deltas)
+
+
+def record_deleted(appointment):
+    approval_time = _approval_time(appointment) if appointment.is_approved else None
+    # Never creates a row: when a doctor is deleted their stats go first and
+    # the cascaded appointment deletes must not bring them back.
+    _bump(appointment.doctor_id, timezone.localdate(appointment.date), {
+        'booked': -1,
+        'approved': -1 if appointment.is_approved else 0,
+        'approval_time': -approval_time if approval_time is not None else timedelta(0),
+        'approval_samples': -1 if approval_time is not None else 0,
+    }, create=False)
+
+
+def rebuild_stats(doctor_ids=None, batch_size=1000):
+    """Recompute the counters from live and archived appointments with one ``GROUP BY``; returns the row count."""
+    appointments = AppointmentHistory.objects.all()
+    stats = DoctorDayStats.objects.all()
+    if doctor_ids is not None:
+        appointments = appointments.filter(doctor_id__in=doctor_ids)
+        stats = stats.filter(doctor_id__in=doctor_ids)
+
+    timed = Q(is_approved=True, approved_at__gte=F('created_at'))
+    rows = appointments.annotate(
+        day=TruncDate('date', tzinfo=timezone.get_current_timezone()),
+    ).values('doctor_id', 'day').annotate(
+        booked=Count('id'),
+        approved=Count('id', filter=Q(is_approved=True)),
+        approval_time=Sum(
+            ExpressionWrapper(F('approved_at') - F('created_at'), output_field=DurationField()), filter=timed,
+        ),
+        approval_samples=Count('id', filter=timed),
+    ).order_by()
+
+    created = 0
+    with transaction.atomic():
+        stats.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            row['approval_time'] = row['approval_time'] or timedelta(0)
+            batch.append(DoctorDayStats(**row))
+            if len(batch) >= batch_size:
+                DoctorDayStats.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        DoctorDayStats.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def summarize(rows):
+    """Add the derived rates to ``values()`` rows of the counters."""
+    for row in rows:
+        row['approval_rate'] = round(row['approved'] / row['booked'], 4) if row['booked'] else None
+        approval_time = row.pop('approval_time') or timedelta(0)
+        samples = row.pop('approval_samples')
+        row['avg_approval_seconds'] = round(approval_time.total_seconds() / samples, 1) if samples else None
+    return rows
@@ -1,3 +1,1051 @@
-from django.test import TestCase
+import asyncio
+import json
+import tempfile
+from datetime import datetime, time, timedelta
+from io import StringIO
+from types import ModuleType
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, router, transaction
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .authentication import SignedTokenAuthentication
+from .directory import VERSION_KEY, invalidate_directory
+from .management.commands.benchmark_api import Command as BenchmarkCommand
+from .models import (
+    Doctor, DoctorDayStats, Patient, Appointment, AppointmentArchive, AppointmentSeries, Notification,
+    NotificationArchive, NotificationOutbox, WaitlistEntry, WaitlistOffer,
+)
+from .notifications import get_broker, publish_notification
+from .replicas import STICKY_COOKIE, read_from_replica
+from .outbox import drain_outbox, enqueue_notification
+from .serializers import NotificationSerializer, PatientAppointmentSerializer
+from .series import cancel_series, expand
+from .stats import rebuild_stats
+from .tokens import InvalidToken, issue_tokens, read_access_token, read_refresh_token
+from .waitlist import expire_offers
+from hospital_project.urls import urlpatterns
+
+
+class HospitalTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.doctor = Doctor.objects.create(
+            user=User.objects.create_user(username='drhouse', password='secret'),
+            specialty='Diagnostics',
+        )
+        self.patient = Patient.objects.create(
+            user=User.objects.create_user(username='jane', password='secret'),
+            birth_date='1990-01-01',
+            phone_number='254700000000',
+        )
+        self.start = timezone.now().replace(second=0, microsecond=0) + timedelta(days=1)
+
+    def book(self, count, doctor=None, patient=None, start=None):
+        start = start or self.start
+        return [
+            Appointment.objects.create(
+                doctor=doctor or self.doctor,
+                patient=patient or self.patient,
+                date=start + timedelta(hours=i),
+                reason='Checkup',
+            )
+            for i in range(count)
+        ]
+
+
+class AppointmentListTests(HospitalTestCase):
+    def test_pages_follow_date_order(self):
+        self.book(5)
+        url = reverse('patient_appointments', args=[self.patient.id])
+
+        first = self.client.get(url, {'page_size': 3}).json()
+        self.assertEqual(len(first['results']), 3)
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 2)
+        self.assertIsNone(second['next'])
+
+        dates = [row['date'] for row in first['results'] + second['results']]
+        self.assertEqual(dates, sorted(dates))
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.book(20)
+        url = reverse('doctor_appointments', args=[self.doctor.id])
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url, {'page_size': 2})
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url, {'page_size': 20})
+        self.assertEqual(len(small), len(large))
+
+    def test_filters(self):
+        appointments = self.book(4)
+        Appointment.objects.filter(id=appointments[0].id).update(is_approved=True)
+        url = reverse('doctor_appointments', args=[self.doctor.id])
+
+        approved = self.client.get(url, {'is_approved': 'true'}).json()['results']
+        self.assertEqual([row['id'] for row in approved], [appointments[0].id])
+
+        ranged = self.client.get(url, {'date_from': appointments[2].date.isoformat()}).json()['results']
+        self.assertEqual([row['id'] for row in ranged], [appointments[2].id, appointments[3].id])
+
+        response = self.client.get(url, {'date_to': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_fast_path_matches_serializer_output(self):
+        appointments = self.book(3)
+        Appointment.objects.filter(id=appointments[0].id).update(
+            reason='Maumivu ya kichwa \u2028 "quoted"', diagnosis='Migraine', date=self.start + timedelta(microseconds=5),
+        )
+        for patient_id, message in ((self.patient.id, 'Ndiyo \u00e9'), (self.patient.id, 'plain')):
+            Notification.objects.create(patient_id=patient_id, message=message)
+
+        response = self.client.get(reverse('patient_appointments', args=[self.patient.id]))
+        expected = PatientAppointmentSerializer(Appointment.objects.order_by('date', 'id'), many=True).data
+        self.assertEqual(response.content, JSONRenderer().render({'next': None, 'previous': None, 'results': expected}))
+
+        response = self.client.get(reverse('notifications', args=[self.patient.id]))
+        expected = NotificationSerializer(Notification.objects.order_by('id'), many=True).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+        self.assertIsNone(response.json()[0]['appointment_id'])
+
+
+class AvailabilityTests(HospitalTestCase):
+    def test_booked_slot_and_neighbours_are_excluded(self):
+        day = timezone.localtime(self.start).date() + timedelta(days=1)
+        start = timezone.make_aware(timezone.datetime(day.year, day.month, day.day, 8))
+        Appointment.objects.create(doctor=self.doctor, patient=self.patient, date=start + timedelta(hours=1), reason='x')
+
+        response = self.client.get(reverse('doctor_availability'), {
+            'doctor': self.doctor.id, 'start': day.isoformat(), 'end': day.isoformat(),
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        slots = response.data[0]['slots']
+        self.assertIn(start + timedelta(minutes=30), slots)
+        self.assertNotIn(start + timedelta(hours=1), slots)
+        self.assertIn(start + timedelta(minutes=90), slots)
+        self.assertEqual(len(slots), 17)
+
+    def test_many_doctors_in_one_query(self):
+        doctors = [
+            Doctor.objects.create(user=User.objects.create(username=f'dr{i}'), specialty='GP')
+            for i in range(20)
+        ]
+        for doctor in doctors:
+            self.book(3, doctor=doctor)
+
+        ids = ','.join(str(doctor.id) for doctor in doctors)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('doctor_availability'), {'doctor': ids})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 20)
+        self.assertEqual(len(queries), 1)
+
+    def test_cached_schedule_is_invalidated_by_booking(self):
+        day = timezone.localtime(self.start).date() + timedelta(days=1)
+        slot = timezone.make_aware(timezone.datetime(day.year, day.month, day.day, 10))
+        params = {'doctor': self.doctor.id, 'start': day.isoformat(), 'end': day.isoformat()}
+
+        self.assertIn(slot, self.client.get(reverse('doctor_availability'), params).data[0]['slots'])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('doctor_availability'), params)
+        self.assertEqual(len(queries), 0)
+
+        Appointment.objects.create(doctor=self.doctor, patient=self.patient, date=slot, reason='x')
+        self.assertNotIn(slot, self.client.get(reverse('doctor_availability'), params).data[0]['slots'])
+
+        # Moving it to another day frees the slot on the day it left.
+        appointment = Appointment.objects.get(date=slot)
+        appointment.date = slot + timedelta(days=3)
+        appointment.save()
+        self.assertIn(slot, self.client.get(reverse('doctor_availability'), params).data[0]['slots'])
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    def test_create_view_returns_409_on_overlap(self):
+        doctor = Doctor.objects.create(user=User.objects.create(username='dr'), specialty='GP')
+        patient = Patient.objects.create(user=User.objects.create(username='pt'), birth_date='1990-01-01', phone_number='1')
+        date = timezone.now() + timedelta(days=1)
+        payload = {'doctor_id': doctor.id, 'patient_id': patient.id, 'date': date.isoformat(), 'reason': 'x'}
+        client = APIClient()
+
+        self.assertEqual(client.post(reverse('appointment_create'), payload, format='json').status_code, 201)
+        payload['date'] = (date + timedelta(minutes=15)).isoformat()
+        response = client.post(reverse('appointment_create'), payload, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('within 30 minutes', response.data['error'])
+
+    def test_stress_produces_no_double_bookings(self):
+        out = StringIO()
+        call_command('booking_stress', threads=8, attempts=120, slots=30, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['double_bookings'], 0)
+        self.assertEqual(report['errors'], 0)
+        self.assertGreater(report['booked'], 0)
+        self.assertEqual(report['booked'] + report['conflicts'], report['attempts'])
+
+
+class AppointmentImportTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(User.objects.create_user(username='records', password='secret', is_staff=True))
+
+    def test_reports_overlaps_within_batch_and_with_existing_rows(self):
+        existing = self.book(1)[0]
+        rows = [
+            {'doctor_id': self.doctor.id, 'patient_id': self.patient.id, 'date': (existing.date + timedelta(minutes=10)).isoformat(), 'reason': 'a'},
+            {'doctor_id': self.doctor.id, 'patient_id': self.patient.id, 'date': (existing.date + timedelta(hours=2)).isoformat(), 'reason': 'b'},
+            {'doctor_id': self.doctor.id, 'patient_id': self.patient.id, 'date': (existing.date + timedelta(hours=2, minutes=20)).isoformat(), 'reason': 'c'},
+            {'doctor_id': 999, 'patient_id': self.patient.id, 'date': existing.date.isoformat(), 'reason': 'd'},
+            {'doctor_id': self.doctor.id, 'patient_id': self.patient.id, 'reason': 'e'},
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('appointment_import'), rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [0, 2, 3, 4])
+        self.assertEqual(Appointment.objects.filter(reason='b').count(), 1)
+        self.assertLess(len(queries), 10)
+
+    def test_csv_body(self):
+        body = (
+            'doctor_id,patient_id,date,reason,is_approved\n'
+            f'{self.doctor.id},{self.patient.id},{self.start.isoformat()},Follow-up,true\n'
+        )
+        response = self.client.post(reverse('appointment_import'), body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Appointment.objects.get(reason='Follow-up').is_approved)
+
+    def test_import_is_staff_only(self):
+        row = {'doctor_id': self.doctor.id, 'patient_id': self.patient.id, 'date': self.start.isoformat(), 'reason': 'a'}
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.post(reverse('appointment_import'), [row], format='json').status_code, 401)
+        self.client.force_authenticate(self.patient.user)
+        self.assertEqual(self.client.post(reverse('appointment_import'), [row], format='json').status_code, 403)
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_rows_that_are_not_objects_are_reported(self):
+        response = self.client.post(reverse('appointment_import'), [1, 'x', {
+            'doctor_id': self.doctor.id, 'patient_id': self.patient.id, 'date': self.start.isoformat(), 'reason': {},
+        }], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [
+            {'row': 0, 'error': 'Row must be an object'},
+            {'row': 1, 'error': 'Row must be an object'},
+            {'row': 2, 'error': 'reason, prescription and diagnosis must be text'},
+        ])
+
+
+class AppointmentArchiveTests(HospitalTestCase):
+    def test_old_appointments_move_to_the_archive_and_stay_readable(self):
+        old = self.book(3, start=self.start - timedelta(days=400))
+        recent = self.book(2)
+        rebuild_stats()
+        counters = list(DoctorDayStats.objects.order_by('day').values_list('day', 'booked'))
+
+        out = StringIO()
+        call_command('archive_appointments', '--batch-size', '2', stdout=out)
+        self.assertIn('Archived 3 appointments', out.getvalue())
+        self.assertEqual(sorted(Appointment.objects.values_list('id', flat=True)), [a.id for a in recent])
+        self.assertEqual(sorted(AppointmentArchive.objects.values_list('id', flat=True)), [a.id for a in old])
+
+        url = reverse('patient_appointments', args=[self.patient.id])
+        first = self.client.get(url, {'page_size': 2}).json()
+        rows = first['results'] + self.client.get(first['next']).json()['results']
+        rows += self.client.get(self.client.get(first['next']).json()['next']).json()['results']
+        self.assertEqual([row['id'] for row in rows], [a.id for a in old + recent])
+        self.assertEqual(rows[0]['doctor_name'], 'drhouse')
+        recent_only = self.client.get(url, {'date_from': recent[0].date.isoformat()}).json()['results']
+        self.assertEqual([row['id'] for row in recent_only], [a.id for a in recent])
+        doctor_rows = self.client.get(reverse('doctor_appointments', args=[self.doctor.id])).json()['results']
+        self.assertEqual(len(doctor_rows), 5)
+
+        rebuild_stats()
+        self.assertEqual(list(DoctorDayStats.objects.order_by('day').values_list('day', 'booked')), counters)
+
+        # Overlap checks reach into the archive for dates that old.
+        response = self.client.post(reverse('appointment_create'), {
+            'doctor_id': self.doctor.id, 'patient_id': self.patient.id,
+            'date': (old[0].date + timedelta(minutes=10)).isoformat(), 'reason': 'Checkup',
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.client.force_login(User.objects.create_user(username='records', password='secret', is_staff=True))
+        report = self.client.post(reverse('appointment_import'), [{
+            'doctor_id': self.doctor.id, 'patient_id': self.patient.id,
+            'date': (old[1].date - timedelta(minutes=10)).isoformat(), 'reason': 'Imported',
+        }], format='json').json()
+        self.assertEqual(report['created'], 0)
+
+
+class AppointmentExportTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(username='records', password='secret', is_staff=True)
+        self.appointments = self.book(3)
+        Appointment.objects.filter(id=self.appointments[0].id).update(diagnosis='Flu', prescription='Rest, fluids')
+
+    def test_streams_ndjson_and_csv_to_staff_only(self):
+        url = reverse('appointment_export')
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(url, {'patient': self.patient.id, 'date_to': self.appointments[1].date.isoformat()})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [a.id for a in self.appointments[:2]])
+        self.assertEqual((rows[0]['doctor_name'], rows[0]['diagnosis']), ('drhouse', 'Flu'))
+
+        response = self.client.get(url, {'output': 'csv', 'doctor': self.doctor.id})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'doctor_id', 'doctor_name'])
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].endswith('Flu,"Rest, fluids"'))
+
+    async def test_streams_under_asgi(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse('appointment_export'))
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(body.splitlines()), 3)
+
+    def test_command_writes_file(self):
+        with tempfile.NamedTemporaryFile('r', suffix='.csv') as f:
+            call_command('export_appointments', '--format', 'csv', '--output', f.name, '--chunk-size', '2')
+            self.assertEqual(len(f.read().splitlines()), 4)
+        with self.assertRaises(CommandError):
+            call_command('export_appointments', '--date-from', 'soon', stdout=StringIO())
+
+
+class AppointmentSearchTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user(username='records', password='secret', is_staff=True))
+
+    def search(self, **params):
+        response = self.client.get(reverse('appointment_search'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranked_search_follows_writes(self):
+        headache, rash, cough = self.book(3)
+        Appointment.objects.filter(id=headache.id).update(reason='Headache after starting amoxicillin')
+        Appointment.objects.filter(id=rash.id).update(reason='Skin rash', diagnosis='Amoxicillin allergy')
+        Appointment.objects.filter(id=cough.id).update(reason='Cough', is_approved=True)
+
+        results = self.search(q='amox')['results']
+        self.assertEqual([row['id'] for row in results], [rash.id, headache.id])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+        self.assertEqual(results[0]['doctor_name'], 'drhouse')
+
+        self.client.put(reverse('update_appointment_details', args=[cough.id]),
+                        {'diagnosis': 'Bronchitis', 'prescription': 'Amoxicillin 500mg'}, format='json')
+        self.assertEqual(len(self.search(q='amoxicillin')['results']), 3)
+        rash.delete()
+        page = self.search(q='amoxicillin', limit=1)
+        self.assertEqual(len(page['results']), 1)
+        self.assertIsNotNone(page['next'])
+        self.assertIsNone(self.client.get(page['next']).json()['next'])
+
+        self.assertEqual(self.search(q='amoxicillin', doctor=self.doctor.id + 1)['results'], [])
+        self.assertEqual(self.client.get(reverse('appointment_search')).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('appointment_search'), {'q': 'amoxicillin'}).status_code, 401)
+
+    def test_archived_appointments_are_searched_too(self):
+        old = self.book(2, start=self.start - timedelta(days=400))
+        recent, = self.book(1)
+        Appointment.objects.filter(id=old[0].id).update(diagnosis='Amoxicillin allergy')
+        Appointment.objects.filter(id=old[1].id).update(reason='Sprained ankle')
+        Appointment.objects.filter(id=recent.id).update(prescription='Amoxicillin 500mg')
+        call_command('archive_appointments', stdout=StringIO())
+        AppointmentArchive.objects.filter(id=old[1].id).update(reason='Ankle, on amoxicillin')
+
+        results = self.search(q='amoxicillin')['results']
+        self.assertEqual({row['id'] for row in results}, {old[0].id, old[1].id, recent.id})
+        self.assertEqual(next(row for row in results if row['id'] == old[0].id)['diagnosis'], 'Amoxicillin allergy')
+        page = self.search(q='amoxicillin', limit=2)
+        self.assertEqual([row['id'] for row in page['results']], [row['id'] for row in results[:2]])
+        self.assertEqual([row['id'] for row in self.client.get(page['next']).json()['results']], [results[2]['id']])
+        self.assertEqual([row['id'] for row in self.search(q='ankle')['results']], [old[1].id])
+        recent_only = self.search(q='amoxicillin', date_from=recent.date.date().isoformat())['results']
+        self.assertEqual([row['id'] for row in recent_only], [recent.id])
+
+
+class NotificationTests(HospitalTestCase):
+    def test_since_cursor_and_unread_count(self):
+        first, second = [Notification.objects.create(patient=self.patient, message=m) for m in ('a', 'b')]
+        Notification.objects.create(patient=self.patient, message='read', is_read=True)
+
+        response = self.client.get(reverse('notifications', args=[self.patient.id]), {'since': first.id})
+        self.assertEqual([row['id'] for row in response.json()], [second.id])
+        response = self.client.get(reverse('notification_unread_count', args=[self.patient.id]))
+        self.assertEqual(response.json(), {'unread': 2})
+
+    async def test_poll_returns_backlog_without_waiting(self):
+        notification = await Notification.objects.acreate(patient=self.patient, message='hello')
+        response = await self.async_client.get(
+            reverse('notification_poll', args=[self.patient.id]), {'timeout': 5}
+        )
+        self.assertEqual([row['id'] for row in json.loads(response.content)], [notification.id])
+
+    async def test_poll_timeout_must_be_finite(self):
+        url = reverse('notification_poll', args=[self.patient.id])
+        for timeout in ('nan', 'inf', '-inf', 'soon'):
+            self.assertEqual((await self.async_client.get(url, {'timeout': timeout})).status_code, 400, timeout)
+        response = await asyncio.wait_for(self.async_client.get(url, {'timeout': -5}), 1)
+        self.assertEqual(json.loads(response.content), [])
+
+    async def test_broker_delivers_published_notification(self):
+        broker = get_broker()
+        subscription = broker.subscribe(self.patient.id)
+        try:
+            notification = await Notification.objects.acreate(patient=self.patient, message='pushed')
+            publish_notification(notification)
+            payload = await asyncio.wait_for(subscription.get(), 1)
+        finally:
+            broker.unsubscribe(self.patient.id, subscription)
+        self.assertEqual(payload['message'], 'pushed')
+
+    async def test_stream_subscribes_only_once_its_body_is_read(self):
+        # A response that is never streamed has no finally to unsubscribe it.
+        response = await self.async_client.get(reverse('notification_stream', args=[self.patient.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(self.patient.id, get_broker()._subscribers)
+
+
+class NotificationOutboxTests(HospitalTestCase):
+    def test_approval_is_queued_and_drained_in_batches(self):
+        appointment = self.book(1)[0]
+        response = self.client.post(reverse('approve_appointment', args=[appointment.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+        enqueue_notification(self.patient.id, 'outdated', 'retried')
+        enqueue_notification(self.patient.id, 'latest', 'retried')
+        # Same text, different events: both are delivered.
+        enqueue_notification(self.patient.id, 'updated')
+        enqueue_notification(self.patient.id, 'updated')
+        self.assertEqual(drain_outbox(), 5)
+
+        self.assertFalse(NotificationOutbox.objects.exists())
+        self.assertEqual(
+            sorted(Notification.objects.values_list('message', flat=True)),
+            ['Your appointment with Dr. drhouse scheduled for '
+             f"{timezone.localtime(appointment.date).strftime('%B %d, %Y at %I:%M %p')} has been approved.",
+             'latest', 'updated', 'updated'],
+        )
+
+
+class NotificationRetentionTests(HospitalTestCase):
+    def notify(self, message, days_ago, is_read=False):
+        notification = Notification.objects.create(patient=self.patient, message=message, is_read=is_read)
+        Notification.objects.filter(id=notification.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return notification
+
+    def test_read_and_stale_notifications_move_to_the_archive(self):
+        self.notify('read yesterday', 2, is_read=True)
+        self.notify('read today', 0, is_read=True)
+        self.notify('forgotten', 100)
+        self.notify('ancient', 1000, is_read=True)
+        fresh = self.notify('fresh', 2)
+
+        out = StringIO()
+        call_command('archive_notifications', '--batch-size', '1', stdout=out)
+        self.assertIn('Archived 3 notifications and purged 1', out.getvalue())
+        self.assertEqual(sorted(Notification.objects.values_list('message', flat=True)), ['fresh', 'read today'])
+        self.assertEqual(sorted(NotificationArchive.objects.values_list('message', flat=True)),
+                         ['forgotten', 'read yesterday'])
+
+        unread = self.client.get(reverse('notifications', args=[self.patient.id])).json()
+        self.assertEqual([row['id'] for row in unread], [fresh.id])
+        archived = NotificationArchive.objects.get(message='forgotten')
+        response = self.client.delete(reverse('delete-notification', args=[archived.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(NotificationArchive.objects.filter(id=archived.id).exists())
+
+
+class BatchMutationTests(HospitalTestCase):
+    def batch(self, url, action, ids):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'action': action, 'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return {row['id']: row['status'] for row in response.json()['results']}, len(queries)
+
+    def test_appointments_are_approved_and_deleted_in_fixed_queries(self):
+        url = reverse('appointment_batch')
+        few = self.book(2)
+        many = self.book(20, start=self.start + timedelta(days=2))
+        rebuild_stats()
+        self.client.post(reverse('approve_appointment', args=[few[0].id]))
+
+        outcomes, queries = self.batch(url, 'approve', [few[0].id, few[1].id, 999999])
+        self.assertEqual(outcomes, {few[0].id: 'already_approved', few[1].id: 'approved', 999999: 'not_found'})
+        _, more_queries = self.batch(url, 'approve', [appointment.id for appointment in many])
+        self.assertEqual(more_queries, queries)
+        self.assertEqual(NotificationOutbox.objects.count(), 22)
+        self.assertEqual(Appointment.objects.filter(is_approved=True, approved_at__isnull=False).count(), 22)
+
+        outcomes, queries = self.batch(url, 'delete', [few[1].id, few[1].id, 999999])
+        self.assertEqual(list(outcomes.items()), [(few[1].id, 'deleted'), (999999, 'not_found')])
+        _, more_queries = self.batch(url, 'delete', [appointment.id for appointment in many[:15]])
+        self.assertEqual(more_queries, queries)
+        self.assertEqual(Appointment.objects.count(), 6)
+
+        def counters():
+            # Deleting a day's last appointment leaves a zero row; a rebuild has none.
+            return list(DoctorDayStats.objects.filter(booked__gt=0).order_by('day').values(
+                'day', 'booked', 'approved', 'approval_time', 'approval_samples',
+            ))
+        incremental = counters()
+        rebuild_stats()
+        self.assertEqual(counters(), incremental)
+
+    def test_notifications_are_marked_read_and_deleted_for_one_patient(self):
+        url = reverse('notification_batch', args=[self.patient.id])
+        mine = Notification.objects.bulk_create([Notification(patient=self.patient, message=str(i)) for i in range(3)])
+        other = Patient.objects.create(user=User.objects.create_user(username='john'), birth_date='1990-01-01')
+        theirs = Notification.objects.create(patient=other, message='Not yours')
+
+        outcomes, _ = self.batch(url, 'mark_read', [mine[0].id, theirs.id])
+        self.assertEqual(outcomes, {mine[0].id: 'marked_read', theirs.id: 'not_found'})
+        outcomes, _ = self.batch(url, 'mark_read', [mine[0].id, mine[1].id])
+        self.assertEqual(outcomes, {mine[0].id: 'already_read', mine[1].id: 'marked_read'})
+        unread = self.client.get(reverse('notifications', args=[self.patient.id])).json()
+        self.assertEqual([row['id'] for row in unread], [mine[2].id])
+
+        call_command('archive_notifications', '--read-days', '0', stdout=StringIO())
+        outcomes, _ = self.batch(url, 'delete', [mine[0].id, mine[2].id, theirs.id])
+        self.assertEqual(outcomes, {mine[0].id: 'deleted', mine[2].id: 'deleted', theirs.id: 'not_found'})
+        self.assertEqual(NotificationArchive.objects.get().id, mine[1].id)
+        self.assertTrue(Notification.objects.filter(id=theirs.id).exists())
+
+        self.assertEqual(self.client.post(url, {'action': 'archive', 'ids': [1]}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'action': 'delete', 'ids': list(range(1, 502))},
+                                          format='json').status_code, 400)
+
+
+class AppointmentSeriesTests(HospitalTestCase):
+    def book_series(self, **fields):
+        payload = {
+            'doctor_id': self.doctor.id, 'patient_id': self.patient.id, 'reason': 'Physiotherapy',
+            'starts_at': self.start.isoformat(), 'frequency': 'weekly', 'count': 4, **fields,
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('appointment_series_create'), payload, format='json')
+        return response, len(queries)
+
+    def test_series_is_booked_whole_or_not_at_all(self):
+        clash = self.book(1, start=self.start + timedelta(weeks=2, minutes=10))[0]
+        response, _ = self.book_series()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['conflicts'], [
+            (self.start + timedelta(weeks=2)).astimezone(timezone.get_current_timezone()).isoformat(),
+        ])
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertFalse(AppointmentSeries.objects.exists())
+
+        clash.delete()
+        response, queries = self.book_series()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [occurrence['id'] for occurrence in response.json()['occurrences']],
+            list(Appointment.objects.filter(series_id=response.json()['id']).order_by('date').values_list('id', flat=True)),
+        )
+        response, more_queries = self.book_series(starts_at=(self.start + timedelta(hours=1)).isoformat(), count=40)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(more_queries, queries)
+        incremental = list(DoctorDayStats.objects.order_by('day').values('day', 'booked'))
+        rebuild_stats()
+        self.assertEqual(list(DoctorDayStats.objects.order_by('day').values('day', 'booked')), incremental)
+
+    def test_monthly_occurrences_keep_the_time_and_clamp_the_day(self):
+        start = timezone.make_aware(datetime(2027, 1, 31, 9, 30))
+        self.assertEqual(
+            [timezone.localtime(date).replace(tzinfo=None) for date in expand(start, 'monthly', 1, 3)],
+            [datetime(2027, 1, 31, 9, 30), datetime(2027, 2, 28, 9, 30), datetime(2027, 3, 31, 9, 30)],
+        )
+
+    def test_remaining_occurrences_are_edited_and_cancelled_together(self):
+        response, _ = self.book_series(frequency='daily', count=3)
+        series = AppointmentSeries.objects.get(id=response.json()['id'])
+        url = reverse('appointment_series', args=[series.id])
+        second_day = timezone.localtime(self.start + timedelta(days=1)).date()
+        self.book(1, start=timezone.make_aware(datetime.combine(second_day, time(7, 50))))
+
+        response = self.client.patch(url, {'time': '08:00'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.patch(url, {'time': '09:00', 'reason': 'Follow-up'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        moved = list(series.appointments.order_by('date'))
+        self.assertEqual({(timezone.localtime(a.date).time(), a.reason) for a in moved}, {(time(9), 'Follow-up')})
+        self.assertEqual(self.client.get(url).json()['reason'], 'Follow-up')
+
+        self.assertEqual(cancel_series(series, now=moved[0].date + timedelta(minutes=1)), 2)
+        self.assertEqual(list(series.appointments.all()), moved[:1])
+        self.assertEqual(self.client.delete(url).json(), {'cancelled': 1})
+        self.assertEqual(self.client.get(url).json()['occurrences'], [])
+
+
+@override_settings(NOTIFICATION_OUTBOX_AUTODRAIN=False)
+class WaitlistTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.others = [
+            Patient.objects.create(
+                user=User.objects.create_user(username=f'waiting{i}', password='secret'),
+                birth_date='1990-01-01',
+                phone_number='254700000000',
+            )
+            for i in range(2)
+        ]
+
+    def join(self, patient, priority=0, start=None, hours=2):
+        start = start or self.start - timedelta(hours=1)
+        return WaitlistEntry.objects.create(
+            doctor=self.doctor, patient=patient, reason='Anything sooner',
+            window_start=start, window_end=start + timedelta(hours=hours), priority=priority,
+        )
+
+    def cancel(self, appointment):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('appointment_delete', args=[appointment.id]))
+        self.assertEqual(response.status_code, 200)
+
+    def accept(self, offer):
+        return self.client.post(reverse('waitlist_offer_accept', args=[offer.id]))
+
+    def test_cancelled_slot_is_offered_to_the_best_candidate(self):
+        self.join(self.patient, start=self.start + timedelta(hours=3))
+        first = self.join(self.others[0])
+        best = self.join(self.others[1], priority=1)
+        self.cancel(self.book(1)[0])
+
+        offer = WaitlistOffer.objects.get()
+        self.assertEqual((offer.entry, offer.date), (best, self.start))
+        self.assertEqual(
+            list(WaitlistEntry.objects.order_by('id').values_list('status', flat=True)),
+            ['waiting', 'waiting', 'offered'],
+        )
+        message = NotificationOutbox.objects.get()
+        self.assertEqual(message.patient, self.others[1])
+        self.assertIn(f'Accept offer #{offer.id}', message.message)
+
+        # A bulk cancellation offers each slot, to a different entry.
+        appointments = self.book(1, start=self.start + timedelta(minutes=30))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('appointment_batch'), {'action': 'delete', 'ids': [appointments[0].id]}, format='json')
+        self.assertEqual(WaitlistOffer.objects.get(date=appointments[0].date).entry, first)
+
+    def test_lapsed_offer_passes_to_the_next_candidate(self):
+        first = self.join(self.others[0], priority=1)
+        second = self.join(self.others[1])
+        self.cancel(self.book(1)[0])
+        lapsed = WaitlistOffer.objects.get()
+        self.assertEqual(lapsed.entry, first)
+
+        self.assertEqual(expire_offers(now=lapsed.expires_at), 1)
+        offer = WaitlistOffer.objects.get(status='pending')
+        self.assertEqual(offer.entry, second)
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'waiting')
+
+        self.assertEqual(self.accept(lapsed).status_code, 409)
+        response = self.accept(offer)
+        self.assertEqual(response.status_code, 201)
+        appointment = Appointment.objects.get(id=response.json()['id'])
+        self.assertEqual((appointment.patient, appointment.date), (self.others[1], self.start))
+        self.assertEqual(self.accept(offer).status_code, 409)
+        # Nobody is left who has not been offered the slot already.
+        self.assertEqual(expire_offers(now=self.start), 0)
+
+    def test_offer_for_a_slot_booked_meanwhile_cannot_be_accepted(self):
+        entry = self.join(self.others[0])
+        self.cancel(self.book(1)[0])
+        self.book(1)
+        response = self.accept(WaitlistOffer.objects.get())
+        self.assertEqual(response.status_code, 409)
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'waiting')
+
+    def test_join_list_and_leave(self):
+        payload = {
+            'doctor_id': self.doctor.id, 'patient_id': self.patient.id, 'reason': 'Anything sooner',
+            'window_start': (self.start - timedelta(days=2)).isoformat(),
+            'window_end': (self.start - timedelta(days=1, hours=12)).isoformat(),
+        }
+        self.assertEqual(self.client.post(reverse('waitlist_join'), payload, format='json').status_code, 400)
+        payload['window_end'] = (self.start + timedelta(hours=1)).isoformat()
+        response = self.client.post(reverse('waitlist_join'), {**payload, 'priority': 32767}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['priority'], 0)
+        backup = self.join(self.others[0])
+
+        self.cancel(self.book(1)[0])
+        listed = self.client.get(reverse('patient_waitlist', args=[self.patient.id])).json()
+        self.assertEqual([(entry['status'], len(entry['offers'])) for entry in listed], [('offered', 1)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('waitlist_entry', args=[listed[0]['id']]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WaitlistOffer.objects.get().entry, backup)
+
+
+class DoctorStatsTests(HospitalTestCase):
+    def counters(self):
+        return list(DoctorDayStats.objects.order_by('doctor_id', 'day').values(
+            'doctor_id', 'day', 'booked', 'approved', 'approval_time', 'approval_samples',
+        ))
+
+    def test_events_keep_counters_in_step_with_a_rebuild(self):
+        self.assertEqual(self.client.get(reverse('doctor_stats', args=[self.doctor.id])).status_code, 401)
+        self.assertEqual(self.client.get(reverse('doctor_stats_overview')).status_code, 401)
+        self.client.force_login(User.objects.create_user(username='manager', password='secret', is_staff=True))
+        ids = []
+        for hours in (0, 1, 2, 26):
+            response = self.client.post(reverse('appointment_create'), {
+                'doctor_id': self.doctor.id, 'patient_id': self.patient.id,
+                'date': (self.start + timedelta(hours=hours)).isoformat(), 'reason': 'Checkup',
+            }, format='json')
+            ids.append(response.data['id'])
+        self.client.post(reverse('appointment_import'), [{
+            'doctor_id': self.doctor.id, 'patient_id': self.patient.id, 'is_approved': True,
+            'date': (self.start + timedelta(days=5)).isoformat(), 'reason': 'Imported',
+        }], format='json')
+        for appointment_id in ids[:3]:
+            self.client.post(reverse('approve_appointment', args=[appointment_id]))
+        self.client.delete(reverse('appointment_delete', args=[ids[1]]))
+
+        incremental = self.counters()
+        self.assertEqual(sum(row['booked'] for row in incremental), 4)
+        rebuild_stats()
+        self.assertEqual(self.counters(), incremental)
+
+        response = self.client.get(reverse('doctor_stats', args=[self.doctor.id]))
+        self.assertEqual(response.data['totals']['booked'], 4)
+        self.assertEqual(response.data['totals']['approved'], 3)
+        self.assertEqual(response.data['totals']['approval_rate'], 0.75)
+        self.assertIsNotNone(response.data['totals']['avg_approval_seconds'])
+        overview = self.client.get(reverse('doctor_stats_overview')).data
+        self.assertEqual([row['doctor_name'] for row in overview['doctors']], ['drhouse'])
+        self.assertEqual(self.client.get(reverse('doctor_stats_overview'), {'date_to': '2000-01-01'}).status_code, 400)
+
+        self.doctor.user.delete()
+        self.assertFalse(DoctorDayStats.objects.exists())
+
+    def test_plain_saves_keep_counters_in_step_with_a_rebuild(self):
+        def assertInStep():
+            # A rebuild has no rows for days that were emptied.
+            incremental = [row for row in self.counters() if row['booked']]
+            rebuild_stats()
+            self.assertEqual(self.counters(), incremental)
+
+        other = Doctor.objects.create(user=User.objects.create(username='drgrey'), specialty='Surgery')
+        appointment = Appointment.objects.get(id=self.book(1)[0].id)
+        assertInStep()
+
+        appointment.is_approved = True
+        appointment.approved_at = appointment.created_at + timedelta(minutes=5)
+        appointment.save()
+        assertInStep()
+        appointment.date += timedelta(days=2)
+        appointment.save()
+        assertInStep()
+        appointment.doctor = other
+        appointment.save()
+        assertInStep()
+        appointment.refresh_from_db()
+        appointment.is_approved = False
+        appointment.approved_at = None
+        appointment.save()
+        assertInStep()
+
+        with CaptureQueriesContext(connection) as queries:
+            appointment.save(update_fields=['reason'])
+        self.assertFalse([query for query in queries if 'doctordaystats' in query['sql']])
+
+
+class DoctorDirectoryTests(HospitalTestCase):
+    def test_cached_directory_with_conditional_get(self):
+        url = reverse('doctor_list')
+        first = self.client.get(url)
+        self.assertEqual(first.json(), [{'id': self.doctor.id, 'user': {'username': 'drhouse', 'email': ''}, 'specialty': 'Diagnostics'}])
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Doctor.objects.create(user=User.objects.create(username='drgrey'), specialty='Surgery')
+        refreshed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertEqual(len(refreshed.json()), 2)
+
+        surgeons = self.client.get(url, {'specialty': 'surgery'}).json()
+        self.assertEqual([doctor['user']['username'] for doctor in surgeons], ['drgrey'])
+        page = self.client.get(url, {'limit': 1}).json()
+        self.assertEqual((page['count'], len(page['results'])), (2, 1))
+
+    def test_last_modified_moves_only_on_invalidation(self):
+        url = reverse('doctor_list')
+        first = self.client.get(url)['Last-Modified']
+        later = timezone.now() + timedelta(hours=1)
+        with mock.patch('hospital.directory.timezone.now', return_value=later):
+            # The entry expires and is rebuilt from unchanged data.
+            cache.delete(f'hospital:doctor_directory:{cache.get(VERSION_KEY)}')
+            self.assertEqual(self.client.get(url)['Last-Modified'], first)
+            invalidate_directory()
+            self.assertEqual(self.client.get(url)['Last-Modified'], http_date(later.replace(microsecond=0).timestamp()))
+
+
+class AdminChangelistTests(HospitalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser(username='admin', password='secret'))
+
+    def assertTotal(self, response, total):
+        self.assertRegex(response.content.decode(), rf'{total}\s+appointments')
+
+    def changelist(self, model, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:hospital_{model}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.book(2)
+        _, few = self.changelist('appointment')
+        for i in range(5):
+            patient = Patient.objects.create(
+                user=User.objects.create_user(username=f'patient{i}'), birth_date='1990-01-01', phone_number='1',
+            )
+            self.book(2, patient=patient, start=self.start + timedelta(days=i + 1))
+            Notification.objects.create(patient=patient, message='Hello')
+        response, many = self.changelist('appointment')
+        self.assertEqual(many, few)
+        self.assertContains(response, 'patient4')
+        # The sidebar offers one autocomplete box instead of a link per patient.
+        self.assertNotContains(response, f'patient__id__exact={self.patient.id}')
+        self.assertContains(response, 'data-field-name="patient"')
+
+        response, _ = self.changelist('appointment', patient__id__exact=self.patient.id)
+        self.assertTotal(response, 2)
+        self.assertContains(response, f'<option value="{self.patient.id}" selected>jane</option>', html=True)
+        self.assertTotal(self.changelist('appointment', q='patient3')[0], 2)
+        self.assertTotal(self.changelist('appointment', q='checkup')[0], 12)
+
+        _, notifications = self.changelist('notification')
+        Notification.objects.create(patient=self.patient, message='Another')
+        self.assertEqual(self.changelist('notification')[1], notifications)
+
+
+class TokenTests(HospitalTestCase):
+    def test_login_issues_tokens_that_authenticate_without_queries(self):
+        response = self.client.post(reverse('patient_login'), {'username': 'jane', 'password': 'secret'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        tokens = response.data
+
+        request = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {tokens['access_token']}"))
+        with CaptureQueriesContext(connection) as queries:
+            user, claims = SignedTokenAuthentication().authenticate(request)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual((user.id, user.patient_id), (self.patient.user_id, self.patient.id))
+
+        refreshed = self.client.post(reverse('token_refresh'), {'refresh_token': tokens['refresh_token']}, format='json')
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertIn('access_token', refreshed.data)
+
+    def test_expired_and_misused_tokens_are_rejected(self):
+        tokens = issue_tokens(self.patient.user_id, 'patient', self.patient.id)
+        with self.assertRaises(InvalidToken):
+            read_refresh_token(tokens['access_token'])
+        with override_settings(ACCESS_TOKEN_LIFETIME=-1), self.assertRaises(InvalidToken):
+            read_access_token(tokens['access_token'])
+
+        User.objects.filter(id=self.patient.user_id).update(is_active=False)
+        response = self.client.post(reverse('token_refresh'), {'refresh_token': tokens['refresh_token']}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_malformed_refresh_bodies_are_rejected(self):
+        url = reverse('token_refresh')
+        for body in ([], ['token'], {'refresh_token': 123}, {'refresh_token': ['token']}):
+            self.assertEqual(self.client.post(url, body, format='json').status_code, 400, body)
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, 401)
+
+
+# SQLite allows one writer at a time and fails the others outright rather
+# than making them wait (always, on the shared in-memory test database), so
+# there the benchmarks serve one request at a time.
+BENCHMARK_CONCURRENCY = '1' if connection.vendor == 'sqlite' else '2'
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    # The outbox drain thread and push workers would write alongside the
+    # benchmark's own requests.
+    @override_settings(NOTIFICATION_OUTBOX_AUTODRAIN=False, MPESA_PUSH_WORKERS=0)
+    def test_report_and_baseline_comparison(self):
+        args = [
+            '--requests', '3', '--concurrency', BENCHMARK_CONCURRENCY,
+            '--doctors', '2', '--patients', '4', '--appointments', '2',
+        ]
+        out = StringIO()
+        call_command('benchmark_api', *args, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['skipped']), {'notification_stream'})
+        self.assertTrue(all(route['errors'] == 0 for route in report['routes'].values()), report['routes'])
+        self.assertFalse(User.objects.exists())
+
+        report['routes']['notifications']['queries_per_request'] = 0
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as baseline:
+            json.dump(report, baseline)
+            baseline.flush()
+            with self.assertRaisesMessage(CommandError, 'notifications: queries/request'):
+                call_command('benchmark_api', *args, '--routes', 'notifications', '--baseline', baseline.name, stdout=StringIO())
+
+    def test_failing_requests_are_counted_as_errors(self):
+        command = BenchmarkCommand()
+        with mock.patch('hospital.views.DoctorListView.get', side_effect=RuntimeError):
+            report = command.run_route([('get', reverse('doctor_list'), {})] * 3, 2)
+        self.assertEqual((report['requests'], report['errors']), (3, 3))
+        report = command.run_route([], 2)
+        self.assertEqual((report['requests'], report['p95_ms'], report['max_queries']), (0, None, None))
+
+    @override_settings(NOTIFICATION_OUTBOX_AUTODRAIN=False)
+    def test_wsgi_and_asgi_comparison(self):
+        out = StringIO()
+        call_command('benchmark_servers', '--requests', '4', '--concurrency', '3',
+                     '--wsgi-threads', BENCHMARK_CONCURRENCY, '--daraja-latency', '0',
+                     '--doctors', '2', '--patients', '4', stdout=out)
+        report = json.loads(out.getvalue())
+        for name, route in report['routes'].items():
+            for server in ('wsgi', 'asgi'):
+                self.assertEqual((route[server]['requests'], route[server]['errors']), (4, 0), name)
+        self.assertFalse(User.objects.exists())
+
+
+class SeedCommandTests(TestCase):
+    def test_seed_is_deterministic_and_schedules_do_not_overlap(self):
+        args = ['--doctors', '3', '--patients', '5', '--appointments', '60', '--notifications', '10', '--chunk-size', '7']
+        call_command('seed_hospital', *args, stdout=StringIO())
+        call_command('seed_hospital', *args, '--prefix', 'again', stdout=StringIO())
+        self.assertEqual(Appointment.objects.count(), 120)
+        self.assertEqual(Notification.objects.count(), 20)
+        self.assertEqual(User.objects.values('password').distinct().count(), 2)
+
+        schedules = {}
+        for doctor, moment in Appointment.objects.order_by('doctor_id', 'date').values_list('doctor__user__username', 'date'):
+            schedules.setdefault(doctor.split('-', 1)[1], {}).setdefault(doctor.split('-', 1)[0], []).append(moment)
+        for runs in schedules.values():
+            first, second = runs['seed'], runs['again']
+            self.assertEqual([b - a for a, b in zip(first, first[1:])], [b - a for a, b in zip(second, second[1:])])
+            self.assertTrue(all(b - a >= timedelta(minutes=30) for a, b in zip(first, first[1:])))
+
+        with self.assertRaisesMessage(CommandError, 'already exist'):
+            call_command('seed_hospital', *args, stdout=StringIO())
+
+
+@override_settings(METRICS_N_PLUS_ONE_THRESHOLD=3)
+class MetricsTests(HospitalTestCase):
+    def scrape(self):
+        return self.client.get('/metrics').content.decode()
+
+    def test_request_timings_are_exported_per_route(self):
+        before = self.scrape()
+        self.book(2)
+        self.client.get(reverse('patient_appointments', args=[self.patient.id]))
+        body = self.scrape()
+        self.assertIn('# TYPE hospital_sql_queries histogram', body)
+        for metric in ('request_seconds', 'view_seconds', 'render_seconds', 'sql_seconds'):
+            self.assertIn(f'hospital_{metric}_count{{route="patient_appointments"}}', body)
+        count = 'hospital_request_seconds_count{route="patient_appointments"} '
+        previous = int(before.split(count)[1].split()[0]) if count in before else 0
+        self.assertEqual(int(body.split(count)[1].split()[0]), previous + 1)
+
+    def test_repeated_statements_are_flagged(self):
+        def n_plus_one(request):
+            for doctor in Doctor.objects.all():
+                doctor.user.username
+            return HttpResponse()
+
+        for i in range(3):
+            Doctor.objects.create(user=User.objects.create_user(username=f'dr{i}'), specialty='GP')
+        urlconf = ModuleType('n_plus_one_urls')
+        urlconf.urlpatterns = [*urlpatterns, path('n-plus-one/', n_plus_one, name='n_plus_one')]
+        with override_settings(ROOT_URLCONF=urlconf):
+            with self.assertLogs('hospital_project.metrics', 'WARNING') as logs:
+                self.client.get('/n-plus-one/')
+            self.assertIn('Possible N+1 in n_plus_one: 4 executions', logs.output[0])
+            self.assertIn('hospital_n_plus_one_total{route="n_plus_one"} 1', self.scrape())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    # Not a TestCase: its wrapping transaction would keep every read on the primary.
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.doctor = Doctor.objects.create(user=User.objects.create(username='dr'), specialty='GP')
+        self.patient = Patient.objects.create(
+            user=User.objects.create(username='pt'), birth_date='1990-01-01', phone_number='1',
+        )
+        self.start = timezone.now().replace(second=0, microsecond=0) + timedelta(days=1)
+
+        @read_from_replica
+        def routed(request):
+            if request.GET.get('atomic'):
+                with transaction.atomic():
+                    return HttpResponse(router.db_for_read(Appointment))
+            return HttpResponse(router.db_for_read(Appointment))
+
+        def unmarked(request):
+            return HttpResponse(router.db_for_read(Appointment))
+
+        urlconf = ModuleType('replica_urls')
+        urlconf.urlpatterns = [*urlpatterns, path('routed/', routed), path('unmarked/', unmarked)]
+        self.enterContext(override_settings(ROOT_URLCONF=urlconf))
+
+    def read_db(self, url='/routed/', **extra):
+        return self.client.get(url, **extra).content.decode()
+
+    def test_marked_views_read_from_a_replica(self):
+        self.assertEqual(self.read_db(), 'replica')
+        self.assertEqual(self.read_db('/unmarked/'), 'default')
+        self.assertEqual(self.read_db('/routed/?atomic=1'), 'default')
+        self.assertEqual(router.db_for_read(Appointment), 'default')
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        response = self.client.post(reverse('appointment_create'), {
+            'doctor_id': self.doctor.id, 'patient_id': self.patient.id,
+            'date': self.start.isoformat(), 'reason': 'Checkup',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.read_db(), 'default')
+
+        self.client.cookies.clear()
+        self.assertEqual(self.read_db(), 'replica')
+
+    def test_bearer_clients_stick_without_cookies(self):
+        tokens = issue_tokens(self.patient.user_id, 'patient', self.patient.id)
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {tokens['access_token']}"}
+        appointment = Appointment.objects.create(
+            doctor=self.doctor, patient=self.patient, date=self.start, reason='Checkup',
+        )
+        self.client.delete(reverse('appointment_delete', args=[appointment.id]), **auth)
+        self.client.cookies.clear()
+        self.assertEqual(self.read_db(**auth), 'default')
+        self.assertEqual(self.read_db(), 'replica')
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core import signing
+
+ACCESS_SALT = 'hospital.tokens.access'
+REFRESH_SALT = 'hospital.tokens.refresh'
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _access_ttl():
+    return getattr(settings, 'ACCESS_TOKEN_LIFETIME', 900)
+
+
+def _refresh_ttl():
+    return getattr(settings, 'REFRESH_TOKEN_LIFETIME', 7 * 24 * 3600)
+
+
+def issue_tokens(user_id, role, profile_id):
+    """Signed access and refresh tokens for a logged-in patient or doctor.
+
+    Both carry everything needed to authorise a request, so validating them
+    is an HMAC check against ``SECRET_KEY`` with no database lookup.
+    """
+    claims = {'uid': user_id, 'role': role, 'pid': profile_id}
+    return {
+        "access_token": signing.dumps(claims, salt=ACCESS_SALT, compress=True),
+        "refresh_token": signing.dumps(claims, salt=REFRESH_SALT, compress=True),
+        "expires_in": _access_ttl(),
+    }
+
+
+def _load(token, salt, max_age):
+    try:
+        return signing.loads(token, salt=salt, max_age=max_age)
+    except signing.SignatureExpired:
+        raise InvalidToken("Token has expired")
+    except signing.BadSignature:
+        raise InvalidToken("Invalid token")
+
+
+def read_access_token(token):
+    return _load(token, ACCESS_SALT, _access_ttl())
+
+
+def read_refresh_token(token):
+    return _load(token, REFRESH_SALT, _refresh_ttl())
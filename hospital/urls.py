@@ -1,15 +1,33 @@
 from django.urls import path
-from .views import PatientSignup, PatientLogin, DoctorLogin, DoctorListView, AppointmentCreateView, PatientAppointmentsView, DoctorAppointmentsView,ApproveAppointmentView,AppointmentDeleteView,NotificationView,NotificationDeleteView,UpdateAppointmentDetailsView
+from .views import PatientSignup, PatientLogin, DoctorLogin, DoctorListView, AppointmentCreateView, PatientAppointmentsView, DoctorAppointmentsView,ApproveAppointmentView,AppointmentDeleteView,NotificationDeleteView,UpdateAppointmentDetailsView,DoctorAvailabilityView,DoctorStatsView,DoctorStatsOverviewView,AppointmentImportView,AppointmentExportView,AppointmentSearchView,notification_stream,notification_poll,notification_list,notification_unread_count,TokenRefreshView,AppointmentBatchView,NotificationBatchView,AppointmentSeriesCreateView,AppointmentSeriesView,WaitlistJoinView,WaitlistEntryView,PatientWaitlistView,WaitlistOfferAcceptView
 
 urlpatterns = [
     path('patient/signup/', PatientSignup.as_view(), name='patient_signup'),
     path('patient/login/', PatientLogin.as_view(), name='patient_login'),
     path('doctor/login/', DoctorLogin.as_view(), name='doctor_login'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('doctors/', DoctorListView.as_view(), name='doctor_list'),
+    path('doctors/availability/', DoctorAvailabilityView.as_view(), name='doctor_availability'),
+    path('stats/doctors/', DoctorStatsOverviewView.as_view(), name='doctor_stats_overview'),
+    path('stats/doctors/<int:doctor_id>/', DoctorStatsView.as_view(), name='doctor_stats'),
     path('doctor-appointments/<int:doctor_id>/', DoctorAppointmentsView.as_view(), name='doctor_appointments'),
     path('appointments/create/', AppointmentCreateView.as_view(), name='appointment_create'),
+    path('appointments/import/', AppointmentImportView.as_view(), name='appointment_import'),
+    path('appointments/export/', AppointmentExportView.as_view(), name='appointment_export'),
+    path('appointments/search/', AppointmentSearchView.as_view(), name='appointment_search'),
+    path('appointments/batch/', AppointmentBatchView.as_view(), name='appointment_batch'),
+    path('appointments/series/', AppointmentSeriesCreateView.as_view(), name='appointment_series_create'),
+    path('appointments/series/<int:series_id>/', AppointmentSeriesView.as_view(), name='appointment_series'),
+    path('waitlist/', WaitlistJoinView.as_view(), name='waitlist_join'),
+    path('waitlist/<int:entry_id>/', WaitlistEntryView.as_view(), name='waitlist_entry'),
+    path('waitlist/patients/<int:patient_id>/', PatientWaitlistView.as_view(), name='patient_waitlist'),
+    path('waitlist/offers/<int:offer_id>/accept/', WaitlistOfferAcceptView.as_view(), name='waitlist_offer_accept'),
     path('patient-appointments/<int:patient_id>/', PatientAppointmentsView.as_view(), name='patient_appointments'),
-    path('notifications/<int:patient_id>/', NotificationView.as_view(), name='notifications'),
+    path('notifications/<int:patient_id>/', notification_list, name='notifications'),
+    path('notifications/<int:patient_id>/unread-count/', notification_unread_count, name='notification_unread_count'),
+    path('notifications/<int:patient_id>/stream/', notification_stream, name='notification_stream'),
+    path('notifications/<int:patient_id>/poll/', notification_poll, name='notification_poll'),
+    path('notifications/<int:patient_id>/batch/', NotificationBatchView.as_view(), name='notification_batch'),
     path('appointments/update/<int:appointment_id>/', UpdateAppointmentDetailsView.as_view(), name='update_appointment_details'),
     path('notifications/delete/<int:notification_id>/', NotificationDeleteView.as_view(), name='delete-notification'),
     path('appointments/delete/<int:appointment_id>/', AppointmentDeleteView.as_view(), name='appointment_delete'), 
@@ -1,14 +1,58 @@
+import asyncio
+import csv
+import io
+import json
+import math
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import generics, status
+from rest_framework import generics, serializers, status
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import JSONRenderer
 from django.contrib.auth import authenticate
 from django.utils import timezone
-from django.utils.timezone import localtime
-from django.db import transaction
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db import router, transaction
+from django.db.models import F, Sum
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
 from django.core.exceptions import ValidationError
-from .models import Doctor, Patient, Appointment, Notification
-from .serializers import DoctorSerializer, PatientSerializer, AppointmentSerializer, PatientAppointmentSerializer, NotificationSerializer
+from django.core.handlers.asgi import ASGIRequest
+from datetime import datetime, time, timedelta
+from .models import (
+    Doctor, DoctorDayStats, Patient, Appointment, AppointmentArchive, AppointmentHistory, AppointmentSeries,
+    Notification, NotificationArchive, WaitlistEntry, WaitlistOffer,
+    appointment_source,
+)
+from .serializers import (
+    DoctorSerializer, PatientSerializer, AppointmentSerializer, PatientAppointmentSerializer,
+    AppointmentBatchSerializer, NotificationBatchSerializer, AppointmentSeriesSerializer,
+    AppointmentSeriesUpdateSerializer, WaitlistEntrySerializer,
+    appointment_rows, notification_rows, serialize_appointment_rows, serialize_notification_rows,
+)
+from .pagination import AppointmentCursorPagination, UncountedLimitOffsetPagination
+from .replicas import read_from_replica
+from .availability import free_slots
+from .batch import (
+    approval_event, approval_message, approve_appointments, delete_appointments, delete_notifications,
+    mark_notifications_read,
+)
+from .directory import get_doctor_directory
+from .booking import BookingConflict
+from .imports import import_appointments
+from .exports import CONTENT_TYPES, aiterate, export_lines
+from .notifications import get_broker
+from .outbox import enqueue_notification
+from .search import search_appointments, search_history
+from .series import SeriesConflict, book_series, cancel_series, remaining_occurrences, update_series
+from .stats import summarize
+from .tokens import InvalidToken, issue_tokens, read_refresh_token
+from .waitlist import OfferUnavailable, accept_offer, leave_waitlist
 
 class PatientSignup(APIView):
     def post(self, request):
@@ -56,7 +100,8 @@ class PatientLogin(APIView):
                 return Response({
                     "message": "Patient login successful",
                     "patient_id": patient.id,
-                    "patient_name": user.first_name or user.username  
+                    "patient_name": user.first_name or user.username,
+                    **issue_tokens(user.id, 'patient', patient.id),
                 })
             return Response({"error": "No associated patient found"}, status=status.HTTP_404_NOT_FOUND)
         return Response({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
@@ -69,14 +114,60 @@ class DoctorLogin(APIView):
         if user is not None:
             doctor = Doctor.objects.filter(user=user).first()
             if doctor:
-                return Response({"message": "Doctor login successful", "doctor_id": doctor.id})
+                return Response({
+                    "message": "Doctor login successful",
+                    "doctor_id": doctor.id,
+                    **issue_tokens(user.id, 'doctor', doctor.id),
+                })
             return Response({"error": "No associated doctor found"}, status=status.HTTP_404_NOT_FOUND)
         return Response({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
 
+class TokenRefreshView(APIView):
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({"error": "Expected a JSON object"}, status=status.HTTP_400_BAD_REQUEST)
+        token = request.data.get("refresh_token") or ""
+        if not isinstance(token, str):
+            return Response({"error": "refresh_token must be a string"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            claims = read_refresh_token(token)
+        except InvalidToken as e:
+            return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+        # The one database hit in the token flow: stop refreshing for users
+        # who have been deactivated or deleted since they logged in.
+        if not User.objects.filter(id=claims['uid'], is_active=True).exists():
+            return Response({"error": "User is no longer active"}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(issue_tokens(claims['uid'], claims['role'], claims['pid']))
+
 class DoctorListView(generics.ListCreateAPIView):
-    queryset = Doctor.objects.all()
+    queryset = Doctor.objects.select_related('user')
     serializer_class = DoctorSerializer
+    pagination_class = LimitOffsetPagination
+
+    def list(self, request, *args, **kwargs):
+        # Served from the cached directory; ?specialty= filters it in memory
+        # and ?limit=/&offset= pages it (the full list is returned otherwise).
+        directory = get_doctor_directory()
+        not_modified = get_conditional_response(
+            request, etag=directory['etag'], last_modified=http_date(directory['last_modified'].timestamp())
+        )
+        if not_modified is not None:
+            return not_modified
+
+        doctors = directory['data']
+        specialty = request.query_params.get('specialty')
+        if specialty:
+            doctors = [doctor for doctor in doctors if doctor['specialty'].lower() == specialty.lower()]
+
+        page = self.paginate_queryset(doctors)
+        response = self.get_paginated_response(page) if page is not None else Response(doctors)
+        response['ETag'] = directory['etag']
+        response['Last-Modified'] = http_date(directory['last_modified'].timestamp())
+        patch_cache_control(response, no_cache=True)
+        return response
 
+@read_from_replica
 class DoctorDetailView(generics.RetrieveAPIView):
     queryset = Doctor.objects.all()
     serializer_class = DoctorSerializer
@@ -89,15 +180,165 @@ class AppointmentCreateView(APIView):
             try:
                 appointment = serializer.save()
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
+            except BookingConflict as e:
+                return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+            except (Doctor.DoesNotExist, Patient.DoesNotExist):
+                return Response({"error": "Doctor or patient not found"}, status=status.HTTP_400_BAD_REQUEST)
             except ValidationError as e:
                 return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class AppointmentSeriesCreateView(APIView):
+    """Book ``count`` appointments ``interval`` days, weeks or months apart, starting at ``starts_at``.
+
+    Either every occurrence is booked or none is; on a clash the response
+    lists all the conflicting dates.
+    """
+    def post(self, request):
+        serializer = AppointmentSeriesSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            series = book_series(**serializer.validated_data)
+        except SeriesConflict as e:
+            return Response({"error": str(e), "conflicts": e.dates}, status=status.HTTP_409_CONFLICT)
+        except BookingConflict as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        except (Doctor.DoesNotExist, Patient.DoesNotExist):
+            return Response({"error": "Doctor or patient not found"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(AppointmentSeriesSerializer(series).data, status=status.HTTP_201_CREATED)
+
+class AppointmentSeriesView(APIView):
+    """A series with its remaining occurrences; PATCH ``reason`` and/or ``time`` edits them, DELETE cancels them."""
+
+    def get_series(self, series_id):
+        try:
+            return AppointmentSeries.objects.get(id=series_id)
+        except AppointmentSeries.DoesNotExist:
+            return None
+
+    def get(self, request, series_id):
+        series = self.get_series(series_id)
+        if series is None:
+            return Response({"error": "Series not found"}, status=status.HTTP_404_NOT_FOUND)
+        series.occurrences = remaining_occurrences(series)
+        return Response(AppointmentSeriesSerializer(series).data, status=status.HTTP_200_OK)
+
+    def patch(self, request, series_id):
+        series = self.get_series(series_id)
+        if series is None:
+            return Response({"error": "Series not found"}, status=status.HTTP_404_NOT_FOUND)
+        serializer = AppointmentSeriesUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            series.occurrences = update_series(series, **serializer.validated_data)
+        except SeriesConflict as e:
+            return Response({"error": str(e), "conflicts": e.dates}, status=status.HTTP_409_CONFLICT)
+        except BookingConflict as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(AppointmentSeriesSerializer(series).data, status=status.HTTP_200_OK)
+
+    def delete(self, request, series_id):
+        series = self.get_series(series_id)
+        if series is None:
+            return Response({"error": "Series not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"cancelled": cancel_series(series)}, status=status.HTTP_200_OK)
+
+class WaitlistJoinView(APIView):
+    """Put a patient on a doctor's waitlist for any slot between ``window_start`` and ``window_end``.
+
+    When a matching appointment is cancelled the patient is offered the slot
+    through a notification; see ``hospital.waitlist``.
+    """
+    def post(self, request):
+        serializer = WaitlistEntrySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        if not (Doctor.objects.filter(id=data['doctor_id']).exists()
+                and Patient.objects.filter(id=data['patient_id']).exists()):
+            return Response({"error": "Doctor or patient not found"}, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+class WaitlistEntryView(APIView):
+    def delete(self, request, entry_id):
+        try:
+            entry = WaitlistEntry.objects.get(id=entry_id)
+        except WaitlistEntry.DoesNotExist:
+            return Response({"error": "Waitlist entry not found"}, status=status.HTTP_404_NOT_FOUND)
+        leave_waitlist(entry)
+        return Response({"message": "Left the waitlist"}, status=status.HTTP_200_OK)
+
+class PatientWaitlistView(APIView):
+    def get(self, request, patient_id):
+        entries = WaitlistEntry.objects.filter(patient_id=patient_id).prefetch_related('offers').order_by('-id')
+        return Response(WaitlistEntrySerializer(entries, many=True).data, status=status.HTTP_200_OK)
+
+class WaitlistOfferAcceptView(APIView):
+    def post(self, request, offer_id):
+        try:
+            appointment = accept_offer(offer_id)
+        except WaitlistOffer.DoesNotExist:
+            return Response({"error": "Offer not found"}, status=status.HTTP_404_NOT_FOUND)
+        except OfferUnavailable as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(AppointmentSerializer(appointment).data, status=status.HTTP_201_CREATED)
+
+class AppointmentImportView(APIView):
+    """Bulk-load appointments from a JSON list or a CSV body (``Content-Type: text/csv``).
+
+    Books for any doctor and patient, so it is staff-only; operators can also
+    use ``manage.py import_appointments``.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        if request.content_type.startswith('text/csv'):
+            rows = csv.DictReader(io.StringIO(request.body.decode('utf-8-sig')))
+        else:
+            rows = request.data.get('appointments') if isinstance(request.data, dict) else request.data
+            if not isinstance(rows, list):
+                return Response({"error": "Expected a list of appointments"}, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = request.query_params.get('dry_run', '').lower() in ('true', '1')
+        report = import_appointments(rows, dry_run=dry_run)
+        if report["valid"] == 0:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+
+@read_from_replica
+class AppointmentExportView(APIView):
+    """Stream appointment and treatment history as NDJSON (default) or CSV (``?output=csv``).
+
+    Filters: ``doctor``, ``patient``, ``date_from``, ``date_to`` and ``is_approved``.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        fmt = params.get('output', 'ndjson')
+        if fmt not in CONTENT_TYPES:
+            return Response({"error": "output must be ndjson or csv"}, status=status.HTTP_400_BAD_REQUEST)
+
+        appointments = filter_appointments(appointment_history(params), params)
+        # The rows are fetched while the response streams, after the routing
+        # middleware has returned, so pick the database now.
+        appointments = appointments.using(router.db_for_read(appointments.model))
+
+        chunks = export_lines(appointments, fmt)
+        if isinstance(request._request, ASGIRequest):
+            chunks = aiterate(chunks)
+        response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="appointments.{fmt}"'
+        return response
+
 class ApproveAppointmentView(APIView):
     def post(self, request, appointment_id):
         try:
             with transaction.atomic():
-                appointment = Appointment.objects.select_related('doctor', 'patient').get(id=appointment_id)
+                appointment = Appointment.objects.select_related('doctor__user', 'patient__user').get(id=appointment_id)
                 if appointment.is_approved:
                     return Response(
                         {"message": "Appointment is already approved"},
@@ -105,14 +346,11 @@ class ApproveAppointmentView(APIView):
                     )
 
                 appointment.is_approved = True
-                appointment.save()
+                appointment.approved_at = timezone.now()
+                appointment.save(update_fields=['is_approved', 'approved_at'])
 
-                local_appointment_time = localtime(appointment.date)
-                formatted_time = local_appointment_time.strftime('%B %d, %Y at %I:%M %p')
-
-                notification = Notification.objects.create(
-                    patient=appointment.patient,
-                    message=f"Your appointment with Dr. {appointment.doctor.user.username} scheduled for {formatted_time} has been approved."
+                notification = enqueue_notification(
+                    appointment.patient_id, approval_message(appointment), approval_event(appointment),
                 )
 
                 return Response({
@@ -123,10 +361,10 @@ class ApproveAppointmentView(APIView):
                         "patient_name": appointment.patient.user.username,
                         "date": appointment.date,
                         "reason": appointment.reason,
-                        "is_approved": appointment.is_approved
+                        "is_approved": appointment.is_approved,
+                        "approved_at": appointment.approved_at
                     },
                     "notification": {
-                        "id": notification.id,
                         "message": notification.message,
                         "created_at": notification.created_at
                     }
@@ -142,23 +380,305 @@ class ApproveAppointmentView(APIView):
                 {"error": f"An error occurred: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-class NotificationView(APIView):
-    def get(self, request, patient_id):
-        notifications = Notification.objects.filter(patient_id=patient_id, is_read=False)
-        notifications_data = NotificationSerializer(notifications, many=True).data  
-        return Response(notifications_data, status=status.HTTP_200_OK)
+NOTIFICATION_KEEPALIVE_SECONDS = 15
+NOTIFICATION_POLL_MAX_SECONDS = 60
 
-class PatientAppointmentsView(APIView):
-    def get(self, request, patient_id):
-        appointments = Appointment.objects.filter(patient_id=patient_id)
-        serializer = PatientAppointmentSerializer(appointments, many=True)
-        return Response(serializer.data)
 
-class DoctorAppointmentsView(APIView):
+async def _unread_notifications(patient_id, since):
+    notifications = Notification.objects.filter(patient_id=patient_id, is_read=False, id__gt=since).order_by('id')
+    return serialize_notification_rows([row async for row in notification_rows(notifications)])
+
+
+def _cursor(value):
+    return int(value) if value and value.isdigit() else 0
+
+
+async def notification_stream(request, patient_id):
+    """Server-sent events feed of a patient's notifications; requires serving via ASGI.
+
+    Unread notifications after ``?since=`` (or the ``Last-Event-ID`` header
+    sent by reconnecting ``EventSource`` clients) are replayed first, then
+    new ones are pushed as they are committed.
+    """
+    since = _cursor(request.GET.get('since') or request.headers.get('Last-Event-ID'))
+    broker = get_broker()
+
+    async def events():
+        last_id = since
+        # Subscribe before reading the backlog so nothing committed in
+        # between is lost, and only once the body is being streamed so the
+        # finally below always runs for it.
+        subscription = broker.subscribe(patient_id)
+        try:
+            for notification in await _unread_notifications(patient_id, since):
+                last_id = notification['id']
+                yield _sse_event(notification)
+            while True:
+                try:
+                    notification = await asyncio.wait_for(subscription.get(), NOTIFICATION_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if notification['id'] > last_id:
+                    last_id = notification['id']
+                    yield _sse_event(notification)
+        finally:
+            broker.unsubscribe(patient_id, subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def notification_poll(request, patient_id):
+    """Long-polling fallback: wait up to ``?timeout=`` seconds for notifications after ``?since=``."""
+    since = _cursor(request.GET.get('since'))
+    try:
+        timeout = float(request.GET.get('timeout', 25))
+    except ValueError:
+        timeout = math.nan
+    # float() also accepts "nan" and "inf", which asyncio.wait_for would wait on forever.
+    if not math.isfinite(timeout):
+        return JsonResponse({"error": "timeout must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+    timeout = min(max(timeout, 0), NOTIFICATION_POLL_MAX_SECONDS)
+
+    broker = get_broker()
+    subscription = broker.subscribe(patient_id)
+    try:
+        notifications = await _unread_notifications(patient_id, since)
+        if not notifications:
+            try:
+                notification = await asyncio.wait_for(subscription.get(), timeout)
+                notifications = [notification] if notification['id'] > since else []
+            except asyncio.TimeoutError:
+                pass
+        return JsonResponse(notifications, safe=False)
+    finally:
+        broker.unsubscribe(patient_id, subscription)
+
+
+@read_from_replica
+@require_safe
+async def notification_list(request, patient_id):
+    """A patient's unread notifications, oldest first; ``?since=`` returns only newer ones."""
+    since = request.GET.get('since')
+    if since and not since.isdigit():
+        return JsonResponse({"error": "since must be a notification id"}, status=status.HTTP_400_BAD_REQUEST)
+    notifications = await _unread_notifications(patient_id, _cursor(since))
+    return HttpResponse(JSONRenderer().render(notifications), content_type='application/json')
+
+
+@read_from_replica
+@require_safe
+async def notification_unread_count(request, patient_id):
+    unread = await Notification.objects.filter(patient_id=patient_id, is_read=False).acount()
+    return JsonResponse({"unread": unread})
+
+
+def _sse_event(notification):
+    return f"id: {notification['id']}\nevent: notification\ndata: {json.dumps(notification, cls=DjangoJSONEncoder)}\n\n"
+
+def filter_appointments(appointments, params):
+    """Apply the optional ``doctor``/``patient``/``date_from``/``date_to``/``is_approved`` query filters."""
+    for name in ('doctor', 'patient'):
+        value = params.get(name)
+        if value:
+            if not value.isdigit():
+                raise serializers.ValidationError({name: "Must be an id."})
+            appointments = appointments.filter(**{f'{name}_id': value})
+
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
+    is_approved = params.get('is_approved')
+
+    if date_from:
+        appointments = appointments.filter(date__gte=_parse_date_param('date_from', date_from))
+    if date_to:
+        appointments = appointments.filter(date__lte=_parse_date_param('date_to', date_to, end_of_day=True))
+    if is_approved is not None and is_approved != '':
+        if is_approved.lower() not in ('true', 'false', '1', '0'):
+            raise serializers.ValidationError({"is_approved": "Must be true or false."})
+        appointments = appointments.filter(is_approved=is_approved.lower() in ('true', '1'))
+    return appointments
+
+
+def _parse_date_param(name, value, end_of_day=False):
+    try:
+        day = parse_date(value)
+        parsed = datetime.combine(day, time.max if end_of_day else time.min) if day else parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise serializers.ValidationError({name: "Must be an ISO 8601 date or datetime."})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def appointment_history(params):
+    """Archived and live appointments, or just live ones when ``date_from`` is past the archive horizon."""
+    date_from = params.get('date_from')
+    if date_from:
+        return appointment_source(_parse_date_param('date_from', date_from)).objects.all()
+    return AppointmentHistory.objects.all()
+
+
+@read_from_replica
+class AppointmentListView(generics.ListAPIView):
+    """Lists appointments through the ``values()`` fast path instead of the serializer."""
+    serializer_class = PatientAppointmentSerializer
+    pagination_class = AppointmentCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        rows = appointment_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(serialize_appointment_rows(rows))
+        return self.get_paginated_response(serialize_appointment_rows(page))
+
+@read_from_replica
+class AppointmentSearchView(generics.ListAPIView):
+    """Full-text search over reason, diagnosis and prescription, best matches first.
+
+    ``q`` is required; ``doctor``, ``patient``, ``date_from``, ``date_to`` and
+    ``is_approved`` narrow the results, ``limit``/``offset`` page through them.
+    Archived appointments are searched too unless ``date_from`` is past the
+    archive horizon. Results include treatment notes, so like the export this
+    is staff-only.
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = PatientAppointmentSerializer
+    pagination_class = UncountedLimitOffsetPagination
+
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+        appointments = filter_appointments(Appointment.objects.all(), request.query_params)
+        if appointment_history(request.query_params).model is Appointment:
+            matches = search_appointments(appointments, query).values('id', 'rank')
+            source = Appointment
+        else:
+            archived = filter_appointments(AppointmentArchive.objects.all(), request.query_params)
+            matches = search_history(appointments, archived, query)
+            source = AppointmentHistory
+        # Rank and page first, then load usernames for the page only rather
+        # than joining them onto every match.
+        page = self.paginate_queryset(matches)
+        rows = {row['id']: row for row in appointment_rows(source.objects.filter(id__in=[m['id'] for m in page]))}
+        results = serialize_appointment_rows(rows[match['id']] for match in page)
+        for result, match in zip(results, page):
+            result['rank'] = match['rank']
+        return self.get_paginated_response(results)
+
+class PatientAppointmentsView(AppointmentListView):
+
+    def get_queryset(self):
+        appointments = appointment_history(self.request.query_params).filter(
+            patient_id=self.kwargs['patient_id']
+        )
+        return filter_appointments(appointments, self.request.query_params)
+
+class DoctorAppointmentsView(AppointmentListView):
+
+    def get_queryset(self):
+        appointments = appointment_history(self.request.query_params).filter(
+            doctor_id=self.kwargs['doctor_id']
+        )
+        return filter_appointments(appointments, self.request.query_params)
+
+STATS_COUNTERS = ('booked', 'approved', 'approval_time', 'approval_samples')
+
+
+def _stats_window(params, max_days=366):
+    """``date_from``/``date_to`` days, defaulting to 30 days either side of today."""
+    today = timezone.localdate()
+    window = []
+    for name, default in (('date_from', today - timedelta(days=30)), ('date_to', today + timedelta(days=30))):
+        try:
+            day = parse_date(params[name]) if params.get(name) else default
+        except ValueError:
+            day = None
+        if day is None:
+            raise serializers.ValidationError({name: "Must be an ISO 8601 date."})
+        window.append(day)
+    date_from, date_to = window
+    if date_to < date_from:
+        raise serializers.ValidationError({"date_to": "Must not be before date_from."})
+    if (date_to - date_from).days >= max_days:
+        raise serializers.ValidationError({"date_to": f"The window may not exceed {max_days} days."})
+    return date_from, date_to
+
+
+def _stats_totals(rows):
+    return {name: sum((row[name] for row in rows), timedelta(0) if name == 'approval_time' else 0)
+            for name in STATS_COUNTERS}
+
+
+@read_from_replica
+class DoctorStatsView(APIView):
+    """Daily booking, approval and time-to-approval figures for one doctor, read from ``DoctorDayStats``."""
+    permission_classes = [IsAdminUser]
+
     def get(self, request, doctor_id):
-        appointments = Appointment.objects.filter(doctor_id=doctor_id)
-        serializer = PatientAppointmentSerializer(appointments, many=True)
-        return Response(serializer.data)
+        date_from, date_to = _stats_window(request.query_params)
+        days = list(DoctorDayStats.objects.filter(
+            doctor_id=doctor_id, day__range=(date_from, date_to),
+        ).order_by('day').values('day', *STATS_COUNTERS))
+        totals = _stats_totals(days)
+        return Response({
+            "doctor_id": doctor_id,
+            "date_from": date_from,
+            "date_to": date_to,
+            "days": summarize(days),
+            "totals": summarize([totals])[0],
+        }, status=status.HTTP_200_OK)
+
+@read_from_replica
+class DoctorStatsOverviewView(APIView):
+    """Per-doctor totals over a window of days, for administrators."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        date_from, date_to = _stats_window(request.query_params)
+        doctors = list(DoctorDayStats.objects.filter(
+            day__range=(date_from, date_to),
+        ).values('doctor_id', doctor_name=F('doctor__user__username')).annotate(
+            **{name: Sum(name) for name in STATS_COUNTERS}
+        ).order_by('doctor_id'))
+        totals = _stats_totals(doctors)
+        return Response({
+            "date_from": date_from,
+            "date_to": date_to,
+            "doctors": summarize(doctors),
+            "totals": summarize([totals])[0],
+        }, status=status.HTTP_200_OK)
+
+class DoctorAvailabilityView(APIView):
+    max_window = timedelta(days=31)
+
+    def get(self, request):
+        params = request.query_params
+        start = _parse_date_param('start', params['start']) if params.get('start') else timezone.now()
+        end = _parse_date_param('end', params['end'], end_of_day=True) if params.get('end') else start + timedelta(days=7)
+        if end <= start:
+            return Response({"error": "end must be after start"}, status=status.HTTP_400_BAD_REQUEST)
+        if end - start > self.max_window:
+            return Response({"error": "The requested window may not exceed 31 days"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            doctor_ids = [int(value) for raw in params.getlist('doctor') for value in raw.split(',') if value]
+        except ValueError:
+            return Response({"error": "doctor must be a list of ids"}, status=status.HTTP_400_BAD_REQUEST)
+        if not doctor_ids:
+            doctor_ids = list(Doctor.objects.order_by('id').values_list('id', flat=True))
+
+        availability = free_slots(doctor_ids, start, end)
+        return Response([
+            {"doctor_id": doctor_id, "slots": slots}
+            for doctor_id, slots in availability.items()
+        ])
 
 class AppointmentDeleteView(APIView):
     def delete(self, request, appointment_id):
@@ -176,12 +696,41 @@ class NotificationDeleteView(APIView):
             notification.delete()
             return Response({"message": "Notification deleted successfully"}, status=status.HTTP_200_OK)
         except Notification.DoesNotExist:
+            if NotificationArchive.objects.filter(id=notification_id).delete()[0]:
+                return Response({"message": "Notification deleted successfully"}, status=status.HTTP_200_OK)
             return Response({"error": "Notification not found"}, status=status.HTTP_404_NOT_FOUND)
         
+def _batch_response(serializer, actions, *args):
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    ids = list(dict.fromkeys(serializer.validated_data['ids']))
+    outcomes = actions[serializer.validated_data['action']](*args, ids)
+    return Response({"results": [{"id": id, "status": outcome} for id, outcome in outcomes.items()]},
+                    status=status.HTTP_200_OK)
+
+class AppointmentBatchView(APIView):
+    """Approve or delete many appointments: ``{"action": "approve" | "delete", "ids": [...]}``.
+
+    Responds with each id's outcome, in request order.
+    """
+    def post(self, request):
+        return _batch_response(AppointmentBatchSerializer(data=request.data), {
+            'approve': approve_appointments,
+            'delete': delete_appointments,
+        })
+
+class NotificationBatchView(APIView):
+    """Mark read or delete many of a patient's notifications: ``{"action": "mark_read" | "delete", "ids": [...]}``."""
+    def post(self, request, patient_id):
+        return _batch_response(NotificationBatchSerializer(data=request.data), {
+            'mark_read': mark_notifications_read,
+            'delete': delete_notifications,
+        }, patient_id)
+
 class UpdateAppointmentDetailsView(APIView):
     def put(self, request, appointment_id):
         try:
-            appointment = Appointment.objects.get(id=appointment_id)
+            appointment = Appointment.objects.select_related('doctor__user').get(id=appointment_id)
             
             if not appointment.is_approved:
                 return Response({"error": "Appointment is not approved yet"}, status=status.HTTP_400_BAD_REQUEST)
@@ -189,13 +738,13 @@ class UpdateAppointmentDetailsView(APIView):
            
             appointment.prescription = request.data.get('prescription', appointment.prescription)
             appointment.diagnosis = request.data.get('diagnosis', appointment.diagnosis)
-            appointment.save()
-            
-            
-            Notification.objects.create(
-                patient=appointment.patient,
-                message=f"Dr. {appointment.doctor.user.username} has updated your appointment details."
-            )
+            with transaction.atomic():
+                appointment.save(update_fields=['prescription', 'diagnosis'])
+                enqueue_notification(
+                    appointment.patient_id,
+                    f"Dr. {appointment.doctor.user.username} has updated your appointment details.",
+                    f'appointment:{appointment.id}:updated',
+                )
             
             return Response({
                 "message": "Appointment details updated successfully",
@@ -0,0 +1,165 @@
+"""Waitlist back-fill for cancelled appointments.
+
+Patients join a doctor's waitlist with the window they could come in. When
+an upcoming appointment is deleted, ``offer_slots`` finds the waiting
+entries for that doctor through the partial ``(doctor, window_start)``
+index, offers the slot to the one with the highest priority (oldest first)
+and queues a notification for that patient alone. An offer stands for
+``WAITLIST_OFFER_MINUTES``; ``expire_offers`` (``manage.py
+expire_waitlist_offers``) returns lapsed ones to the waitlist and passes the
+slot on to the next candidate. No entry is offered the same slot twice.
+
+Offers do not hold the slot: anyone may still book it, in which case
+accepting fails and the entry goes back to waiting.
+"""
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .booking import BookingConflict, book_appointment
+from .models import APPOINTMENT_GAP, Appointment, WaitlistEntry, WaitlistOffer
+from .outbox import enqueue_notifications
+
+
+class OfferUnavailable(Exception):
+    """The offer has lapsed, was already accepted, or its slot was booked by someone else."""
+
+
+def offer_message(offer):
+    date = timezone.localtime(offer.date).strftime('%B %d, %Y at %I:%M %p')
+    expires = timezone.localtime(offer.expires_at).strftime('%I:%M %p')
+    return (
+        f"A slot with Dr. {offer.entry.doctor.user.username} on {date} has opened up. "
+        f"Accept offer #{offer.id} by {expires} to book it."
+    )
+
+
+def _booked_dates(slots):
+    """``{doctor_id: sorted dates}`` of appointments near any of ``slots``, with one range query."""
+    dates = [date for _, date in slots]
+    booked = {}
+    for doctor_id, date in Appointment.objects.filter(
+        doctor_id__in={doctor_id for doctor_id, _ in slots},
+        date__gt=min(dates) - APPOINTMENT_GAP, date__lt=max(dates) + APPOINTMENT_GAP,
+    ).order_by('date').values_list('doctor_id', 'date'):
+        booked.setdefault(doctor_id, []).append(date)
+    return booked
+
+
+def _is_free(booked, date):
+    i = bisect_right(booked, date - APPOINTMENT_GAP)
+    return i == len(booked) or booked[i] >= date + APPOINTMENT_GAP
+
+
+def offer_slots(slots, now=None):
+    """Offer each freed ``(doctor_id, date)`` slot to the best waiting entry; return the offers made.
+
+    Past slots are skipped, as are slots that have been booked again since.
+    With nobody waiting this is a single indexed query.
+    """
+    now = now or timezone.now()
+    slots = sorted({(doctor_id, date) for doctor_id, date in slots if date > now}, key=lambda slot: slot[1])
+    if not slots:
+        return []
+    dates = [date for _, date in slots]
+    with transaction.atomic():
+        candidates = list(WaitlistEntry.objects.select_for_update(of=('self',), skip_locked=True).select_related(
+            'doctor__user',
+        ).filter(
+            doctor_id__in={doctor_id for doctor_id, _ in slots},
+            status=WaitlistEntry.WAITING,
+            window_start__lte=dates[-1],
+            window_end__gte=dates[0],
+        ).order_by('-priority', 'created_at', 'id'))
+        if not candidates:
+            return []
+        offered_before = set(WaitlistOffer.objects.filter(
+            entry__in=candidates, date__in=dates,
+        ).values_list('entry_id', 'date'))
+        booked = _booked_dates(slots)
+        expires_at = now + timedelta(minutes=settings.WAITLIST_OFFER_MINUTES)
+
+        offers = []
+        for doctor_id, date in slots:
+            if not _is_free(booked.get(doctor_id, []), date):
+                continue
+            for entry in candidates:
+                if (
+                    entry.doctor_id == doctor_id and entry.status == WaitlistEntry.WAITING
+                    and entry.window_start <= date <= entry.window_end
+                    and (entry.id, date) not in offered_before
+                ):
+                    entry.status = WaitlistEntry.OFFERED
+                    offers.append(WaitlistOffer(entry=entry, date=date, expires_at=min(expires_at, date)))
+                    break
+        if offers:
+            WaitlistOffer.objects.bulk_create(offers)
+            WaitlistEntry.objects.filter(id__in=[offer.entry_id for offer in offers]).update(
+                status=WaitlistEntry.OFFERED,
+            )
+            enqueue_notifications([(offer.entry.patient_id, offer_message(offer), '') for offer in offers])
+    return offers
+
+
+def accept_offer(offer_id, now=None):
+    """Book the offered slot for the entry's patient; return the appointment.
+
+    Raises ``WaitlistOffer.DoesNotExist`` and ``OfferUnavailable``.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        offer = WaitlistOffer.objects.select_for_update(of=('self', 'entry')).select_related('entry').get(id=offer_id)
+        if offer.status != WaitlistOffer.PENDING or offer.expires_at <= now:
+            raise OfferUnavailable("This offer has expired or was already accepted.")
+        entry = offer.entry
+        try:
+            appointment = book_appointment(entry.doctor_id, entry.patient_id, date=offer.date, reason=entry.reason)
+        except BookingConflict:
+            # Someone booked the slot directly; keep the patient on the waitlist.
+            appointment = None
+            offer.status, entry.status = WaitlistOffer.EXPIRED, WaitlistEntry.WAITING
+        else:
+            offer.status, entry.status = WaitlistOffer.ACCEPTED, WaitlistEntry.BOOKED
+        offer.save(update_fields=['status'])
+        entry.save(update_fields=['status'])
+    if appointment is None:
+        raise OfferUnavailable("This slot has already been booked.")
+    return appointment
+
+
+def expire_offers(now=None, batch_size=500):
+    """Expire lapsed offers and pass each slot to the next candidate; return how many expired."""
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            offers = list(WaitlistOffer.objects.select_for_update(of=('self',), skip_locked=True).select_related(
+                'entry',
+            ).filter(status=WaitlistOffer.PENDING, expires_at__lte=now).order_by('expires_at')[:batch_size])
+            if not offers:
+                break
+            WaitlistOffer.objects.filter(id__in=[offer.id for offer in offers]).update(status=WaitlistOffer.EXPIRED)
+            WaitlistEntry.objects.filter(
+                id__in=[offer.entry_id for offer in offers], status=WaitlistEntry.OFFERED,
+            ).update(status=WaitlistEntry.WAITING)
+        expired += len(offers)
+        offer_slots([(offer.entry.doctor_id, offer.date) for offer in offers], now)
+    return expired
+
+
+def purge_lapsed_entries(now=None):
+    """Delete waiting entries whose window has passed; return how many there were."""
+    lapsed = WaitlistEntry.objects.filter(status=WaitlistEntry.WAITING, window_end__lt=now or timezone.now())
+    return lapsed.delete()[1].get(WaitlistEntry._meta.label, 0)
+
+
+def leave_waitlist(entry):
+    """Delete ``entry``, passing any slot it was being offered to the next candidate."""
+    with transaction.atomic():
+        pending = list(entry.offers.filter(status=WaitlistOffer.PENDING).values_list('date', flat=True))
+        entry.delete()
+    if pending:
+        offer_slots([(entry.doctor_id, date) for date in pending])
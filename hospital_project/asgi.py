@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+The notification stream (``api/notifications/<id>/stream/``) holds its
+connection open, so serve the project through this module (e.g. with
+uvicorn or daphne) rather than WSGI. Set ``DB_POOL`` when doing so: without
+a pool every request opens its own database connection.
 """
 
 import os
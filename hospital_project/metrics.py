@@ -0,0 +1,269 @@
+"""Per-request timing and SQL instrumentation, exposed in the Prometheus text format.
+
+``MetricsMiddleware`` times each sampled request by URL name: total, view,
+response rendering, SQL (count and time) and outbound HTTP made through
+``outbound_http()``. ``metrics_view`` serves the histograms. Figures are kept
+per process, so scrape every worker.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=DURATION_BUCKETS, label='route'):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.label = label
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, label, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                # One slot per bucket, one for +Inf, then the running sum.
+                series = self._series[label] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            snapshot = {label: list(series) for label, series in self._series.items()}
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for label, series in sorted(snapshot.items()):
+            prefix = f'{self.label}="{_escape(label)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix},le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{prefix},le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{prefix}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{prefix}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation, label='route'):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, label, amount=1):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + amount
+
+    def render(self):
+        with self._lock:
+            snapshot = dict(self._values)
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for label, value in sorted(snapshot.items()):
+            lines.append(f'{self.name}{{{self.label}="{_escape(label)}"}} {value}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram('hospital_request_seconds', 'Time spent handling the request.')
+VIEW_SECONDS = Histogram('hospital_view_seconds', 'Time spent in the view, including its SQL.')
+RENDER_SECONDS = Histogram('hospital_render_seconds', 'Time spent rendering the response.')
+SQL_SECONDS = Histogram('hospital_sql_seconds', 'Time spent executing SQL per request.')
+SQL_QUERIES = Histogram('hospital_sql_queries', 'SQL statements executed per request.', COUNT_BUCKETS)
+HTTP_SECONDS = Histogram('hospital_outbound_http_seconds', 'Time spent in outbound HTTP calls per request.')
+OUTBOUND_SECONDS = Histogram('hospital_outbound_call_seconds', 'Duration of each outbound HTTP call.',
+                             label='service')
+N_PLUS_ONE = Counter('hospital_n_plus_one_total', 'Requests repeating one SQL statement past the threshold.')
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'view_started', 'render_started', 'sql_count', 'sql_time', 'http_time', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.render_started = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.http_time = 0.0
+        self.statements = {}
+
+
+_current = ContextVar('hospital_request_metrics', default=None)
+
+# IN lists vary in length with the data; fold them so the shape still repeats.
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def _record_sql(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_time += time.perf_counter() - started
+        metrics.sql_count += 1
+        shape = _IN_LIST.sub('IN (...)', sql)
+        metrics.statements[shape] = metrics.statements.get(shape, 0) + 1
+
+
+def _install(connection, **kwargs):
+    if _record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_sql)
+
+
+connection_created.connect(_install)
+
+
+@contextmanager
+def outbound_http(service):
+    """Time an outbound HTTP call and charge it to the current request, if any."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        OUTBOUND_SECONDS.observe(service, elapsed)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.http_time += elapsed
+
+
+class MetricsMiddleware:
+    """Record timings for a ``METRICS_SAMPLE_RATE`` fraction of requests.
+
+    Put it first in ``MIDDLEWARE`` so the view and render phases it measures
+    are as close to the view as possible. With a sample rate of 0 Django
+    drops it from the chain entirely.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+        self.slow_request_ms = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 0)
+        self.n_plus_one_threshold = getattr(settings, 'METRICS_N_PLUS_ONE_THRESHOLD', 10)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def _start(self, request):
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        metrics = request._metrics = RequestMetrics()
+        return metrics, _current.set(metrics)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        metrics, token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, metrics)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        metrics, token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(request, '_metrics', None)
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Runs after the view returns and just before the response is rendered.
+        metrics = getattr(request, '_metrics', None)
+        if metrics is not None:
+            metrics.render_started = time.perf_counter()
+        return response
+
+    def _finish(self, request, metrics):
+        finished = time.perf_counter()
+        match = request.resolver_match
+        route = match.view_name if match else '<unmatched>'
+        total = finished - metrics.started
+        view = render = 0.0
+        if metrics.view_started is not None:
+            view = (metrics.render_started or finished) - metrics.view_started
+        if metrics.render_started is not None:
+            render = finished - metrics.render_started
+
+        REQUEST_SECONDS.observe(route, total)
+        VIEW_SECONDS.observe(route, view)
+        RENDER_SECONDS.observe(route, render)
+        SQL_SECONDS.observe(route, metrics.sql_time)
+        SQL_QUERIES.observe(route, metrics.sql_count)
+        HTTP_SECONDS.observe(route, metrics.http_time)
+
+        if metrics.statements:
+            shape, repeats = max(metrics.statements.items(), key=lambda item: item[1])
+            if repeats >= self.n_plus_one_threshold:
+                N_PLUS_ONE.inc(route)
+                logger.warning("Possible N+1 in %s: %d executions of %s", route, repeats, shape[:300])
+
+        if self.slow_request_ms and total * 1000 >= self.slow_request_ms:
+            logger.warning(
+                "Slow request %s %s (%s): %.0fms total, %d queries in %.0fms, view %.0fms, "
+                "render %.0fms, outbound HTTP %.0fms",
+                request.method, request.path, route, total * 1000, metrics.sql_count, metrics.sql_time * 1000,
+                view * 1000, render * 1000, metrics.http_time * 1000,
+            )
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import json
 from pathlib import Path
 
+from decouple import config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'hospital_project.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,6 +58,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'hospital.replicas.ReplicaRoutingMiddleware',
 ]
 
 # Allow all origins for development (you can restrict later for production)
@@ -64,6 +69,27 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'hospital.authentication.SignedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+}
+
+# Request instrumentation served at /metrics. METRICS_SAMPLE_RATE is the
+# fraction of requests timed (0 removes the middleware); requests slower than
+# METRICS_SLOW_REQUEST_MS are logged (0 disables the log); a request running
+# one SQL statement METRICS_N_PLUS_ONE_THRESHOLD times is flagged as an N+1.
+METRICS_SAMPLE_RATE = config('METRICS_SAMPLE_RATE', default=1.0, cast=float)
+METRICS_SLOW_REQUEST_MS = config('METRICS_SLOW_REQUEST_MS', default=0, cast=int)
+METRICS_N_PLUS_ONE_THRESHOLD = 10
+
+# Lifetimes, in seconds, of the signed tokens issued at login.
+ACCESS_TOKEN_LIFETIME = 15 * 60
+REFRESH_TOKEN_LIFETIME = 7 * 24 * 60 * 60
+
+
 ROOT_URLCONF = 'hospital_project.urls'
 
 TEMPLATES = [
@@ -96,9 +122,51 @@ DATABASES = {
         'PASSWORD': 'maina05',                     
         'HOST': 'localhost',                       
         'PORT': '5432',                            
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Connection reuse. Under WSGI, DB_CONN_MAX_AGE keeps each worker thread's
+# connection open for that many seconds (0 reconnects on every request).
+# Under ASGI every request gets a fresh connection whatever DB_CONN_MAX_AGE
+# says, so set DB_POOL to a JSON object of psycopg_pool options instead, e.g.
+# '{"min_size": 4, "max_size": 20}'. It needs psycopg[pool] and replaces
+# DB_CONN_MAX_AGE. `manage.py benchmark_servers` shows the difference.
+DB_POOL = config('DB_POOL', default='', cast=lambda value: json.loads(value) if value else None)
+if DB_POOL is not None:
+    DATABASES['default'].update(CONN_MAX_AGE=0, OPTIONS={'pool': DB_POOL or True})
+
+# Read replicas of `default`: a JSON object mapping each alias to the settings
+# that differ from the primary, e.g. '{"replica1": {"HOST": "10.0.0.12"}}'.
+# GET requests to views marked @read_from_replica read from one of them; see
+# hospital/replicas.py. Under test they mirror `default`.
+DATABASE_REPLICAS = []
+for alias, overrides in config('DATABASE_REPLICAS', default='{}', cast=json.loads).items():
+    DATABASES[alias] = {**DATABASES['default'], **overrides, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['hospital.replicas.ReplicaRouter']
+
+# After a write, a client's reads stay on the primary for this many seconds so
+# replica lag never hides their own changes. Keep it above the usual lag.
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
+
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# Any Django cache backend works, e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# with CACHE_LOCATION=redis://127.0.0.1:6379/1. Use a shared backend when
+# running more than one process so invalidations reach every worker.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+        'OPTIONS': config('CACHE_OPTIONS', default='{"MAX_ENTRIES": 100000}', cast=json.loads),
+    }
+}
 
 
 # Password validation
@@ -143,9 +211,56 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-from decouple import config
+# Appointment scheduling: bookable slots are generated within clinic hours
+# (local time) at this granularity.
+APPOINTMENT_SLOT_MINUTES = 30
+CLINIC_OPENING_HOUR = 8
+CLINIC_CLOSING_HOUR = 17
+# Seconds a doctor's cached daily schedule may be served before reloading.
+AVAILABILITY_CACHE_TIMEOUT = 300
+# Upper bound on how long the serialized doctor directory is cached; saves
+# and deletes of doctors invalidate it immediately.
+DOCTOR_DIRECTORY_CACHE_TIMEOUT = 3600
+
+# Pub/sub backend that pushes new notifications to streaming clients. The
+# in-process broker only reaches clients connected to the same ASGI process.
+NOTIFICATION_BROKER = 'hospital.notifications.InProcessBroker'
+
+# Drain the notification outbox from a background thread after each commit.
+# Turn off when running `manage.py drain_notification_outbox` as a daemon.
+NOTIFICATION_OUTBOX_AUTODRAIN = True
+
+# `manage.py archive_appointments` (run it daily) moves appointments dated
+# more than this many days ago to the archive table. History endpoints,
+# exports, stats rebuilds and overlap checks reaching that far back read both.
+APPOINTMENT_ARCHIVE_DAYS = config('APPOINTMENT_ARCHIVE_DAYS', default=90, cast=int)
+
+# `manage.py archive_notifications` (run it daily) moves read notifications
+# older than NOTIFICATION_ARCHIVE_READ_DAYS, and any older than
+# NOTIFICATION_ARCHIVE_UNREAD_DAYS, to the archive table, then purges archived
+# ones older than NOTIFICATION_RETENTION_DAYS (0 keeps them forever).
+NOTIFICATION_ARCHIVE_READ_DAYS = config('NOTIFICATION_ARCHIVE_READ_DAYS', default=1, cast=int)
+NOTIFICATION_ARCHIVE_UNREAD_DAYS = config('NOTIFICATION_ARCHIVE_UNREAD_DAYS', default=90, cast=int)
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=730, cast=int)
+
+# Minutes a patient has to accept a slot offered from the waitlist. Run
+# `manage.py expire_waitlist_offers` every minute to pass lapsed offers on.
+WAITLIST_OFFER_MINUTES = config('WAITLIST_OFFER_MINUTES', default=30, cast=int)
+
 
 MPESA_CONSUMER_KEY = config('MPESA_CONSUMER_KEY')
 MPESA_CONSUMER_SECRET = config('MPESA_CONSUMER_SECRET')
 MPESA_SHORTCODE = config('MPESA_SHORTCODE')
-MPESA_PASSKEY = config('MPESA_PASSKEY')
\ No newline at end of file
+MPESA_PASSKEY = config('MPESA_PASSKEY')
+MPESA_BASE_URL = config('MPESA_BASE_URL', default='https://sandbox.safaricom.co.ke')
+MPESA_CONNECT_TIMEOUT = config('MPESA_CONNECT_TIMEOUT', default=3.05, cast=float)
+MPESA_READ_TIMEOUT = config('MPESA_READ_TIMEOUT', default=15, cast=float)
+# Public URL Daraja posts results to; defaults to this server's callback route.
+MPESA_CALLBACK_URL = config('MPESA_CALLBACK_URL', default='')
+# Secret appended to the callback URL as ?token=...; callbacks without it are
+# rejected. Derived from SECRET_KEY when empty.
+MPESA_CALLBACK_TOKEN = config('MPESA_CALLBACK_TOKEN', default='')
+# Threads sending STK pushes in the background; 0 sends them inline. Run
+# `manage.py retry_stk_pushes` every minute to recover pushes a restarted
+# process dropped from the queue.
+MPESA_PUSH_WORKERS = config('MPESA_PUSH_WORKERS', default=16, cast=int)
\ No newline at end of file
@@ -17,9 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include  
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('hospital.urls')),  
-    path('mpesa/',include('mpesa_stk.urls'))
+    path('mpesa/',include('mpesa_stk.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
@@ -0,0 +1,94 @@
+import threading
+import time
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from hospital_project.metrics import outbound_http
+
+
+class DarajaClient:
+    """Safaricom Daraja API client sharing one OAuth token and connection pool per process.
+
+    The access token is reused until ``refresh_margin`` seconds before the
+    ``expires_in`` Safaricom reports, and only one thread fetches a new one
+    while the others wait for it. Requests go through a pooled
+    ``requests.Session`` with timeouts. Failed connections are retried, but
+    a POST that reached the server is never re-sent, so a customer is not
+    prompted twice.
+    """
+
+    def __init__(self, base_url, consumer_key, consumer_secret, timeout=(3.05, 15), retries=3,
+                 refresh_margin=60, pool_size=20):
+        self.base_url = base_url.rstrip('/')
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.3,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+
+    def get_access_token(self):
+        if time.monotonic() < self._token_expires_at:
+            return self._token
+        with self._token_lock:
+            # Another thread may have refreshed it while we waited.
+            if time.monotonic() < self._token_expires_at:
+                return self._token
+            with outbound_http('daraja'):
+                response = self.session.get(
+                    f"{self.base_url}/oauth/v1/generate",
+                    params={'grant_type': 'client_credentials'},
+                    auth=(self.consumer_key, self.consumer_secret),
+                    timeout=self.timeout,
+                )
+            response.raise_for_status()
+            data = response.json()
+            expires_in = int(data.get('expires_in', 3599))
+            self._token = data['access_token']
+            self._token_expires_at = time.monotonic() + max(expires_in - self.refresh_margin, 0)
+            return self._token
+
+    def invalidate_token(self):
+        with self._token_lock:
+            self._token_expires_at = 0.0
+
+    def stk_push(self, payload):
+        headers = {"Authorization": f"Bearer {self.get_access_token()}"}
+        with outbound_http('daraja'):
+            response = self.session.post(
+                f"{self.base_url}/mpesa/stkpush/v1/processrequest",
+                json=payload,
+                headers=headers,
+                timeout=self.timeout,
+            )
+        if response.status_code == 401:
+            # Token revoked before its advertised expiry; nothing was charged.
+            self.invalidate_token()
+        return response.json()
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    return DarajaClient(
+        settings.MPESA_BASE_URL,
+        settings.MPESA_CONSUMER_KEY,
+        settings.MPESA_CONSUMER_SECRET,
+        timeout=(settings.MPESA_CONNECT_TIMEOUT, settings.MPESA_READ_TIMEOUT),
+    )
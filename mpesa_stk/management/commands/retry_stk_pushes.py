@@ -0,0 +1,65 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from django.utils import timezone
+
+from mpesa_stk.models import MpesaRequest
+from mpesa_stk.tasks import send_stk_push, store_response
+from mpesa_stk.views import with_callback_token
+
+
+class Command(BaseCommand):
+    help = (
+        "Recover STK pushes left behind by a restarted or failing worker: send queued pushes no worker "
+        "took, fail those whose outcome is unknown, and store Daraja replies kept on failed requests. "
+        "Run it every minute, or with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=float, default=300, metavar='SECONDS',
+                            help="Leave requests queued or sent more recently than this alone.")
+        parser.add_argument('--callback-url', default=settings.MPESA_CALLBACK_URL,
+                            help="Public URL of the callback route; defaults to MPESA_CALLBACK_URL.")
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help="Keep running, checking again after this many seconds.")
+
+    def handle(self, *args, **options):
+        if not options['callback_url']:
+            raise CommandError("Set MPESA_CALLBACK_URL or pass --callback-url.")
+        callback_url = with_callback_token(options['callback_url'])
+        while True:
+            sent, failed, stored = self.sweep(callback_url, timedelta(seconds=options['older_than']))
+            self.stdout.write(self.style.SUCCESS(
+                f"Sent {sent} queued pushes, failed {failed} with an unknown outcome and stored {stored} replies"
+            ))
+            if options['loop'] is None:
+                break
+            time.sleep(options['loop'])
+
+    def sweep(self, callback_url, older_than):
+        cutoff = timezone.now() - older_than
+        stuck = MpesaRequest.objects.filter(status=MpesaRequest.QUEUED, timestamp__lt=cutoff)
+
+        sent = 0
+        for request_id in stuck.filter(sent_at__isnull=True).values_list('id', flat=True).iterator():
+            sent += send_stk_push(request_id, callback_url) is not None
+        # Daraja may or may not have the push; sending it again could prompt
+        # the customer twice.
+        failed = stuck.filter(sent_at__lt=cutoff).update(
+            status=MpesaRequest.FAILED, error="The push was sent but its outcome was never recorded.",
+        )
+
+        stored = 0
+        for request_id, response_data in MpesaRequest.objects.filter(
+            status=MpesaRequest.FAILED, raw_response__isnull=False,
+        ).values_list('id', 'raw_response').iterator():
+            try:
+                store_response(request_id, response_data)
+            except DatabaseError as e:
+                self.stderr.write(f"Could not store the reply to request {request_id}: {e}")
+            else:
+                stored += 1
+        return sent, failed, stored
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mpesa_stk.stub import FakeDaraja
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a local fake Daraja API for end-to-end and load runs. "
+        "Point MPESA_BASE_URL at the printed URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8100)
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response.")
+        parser.add_argument('--no-callback', action='store_true', help="Do not post results to CallBackURL.")
+        parser.add_argument('--callback-delay', type=float, default=0.5)
+
+    def handle(self, *args, **options):
+        server = FakeDaraja(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            auto_callback=not options['no_callback'],
+            callback_delay=options['callback_delay'],
+        ).start()
+        self.stdout.write(f"Fake Daraja listening on {server.url}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+            self.stdout.write(f"Served {server.calls}")
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_existing_submitted(apps, schema_editor):
+    # Requests made before the push went asynchronous were sent inline.
+    MpesaRequest = apps.get_model('mpesa_stk', 'MpesaRequest')
+    MpesaRequest.objects.filter(responses__isnull=False).update(status='submitted')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mpesa_stk', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mpesarequest',
+            name='error',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='mpesarequest',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('submitted', 'Submitted'), ('failed', 'Failed')], default='queued', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='mpesaresponse',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mpesaresponse',
+            name='mpesa_receipt_number',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='mpesaresponse',
+            name='result_code',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='mpesaresponse',
+            name='result_description',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='mpesaresponse',
+            name='checkout_request_id',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='mpesaresponse',
+            name='request',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='responses', to='mpesa_stk.mpesarequest'),
+        ),
+        migrations.RunPython(mark_existing_submitted, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def null_missing_and_duplicate_ids(apps, schema_editor):
+    MpesaResponse = apps.get_model('mpesa_stk', 'MpesaResponse')
+    MpesaResponse.objects.filter(checkout_request_id='').update(checkout_request_id=None)
+    duplicated = (
+        MpesaResponse.objects.exclude(checkout_request_id=None).values('checkout_request_id')
+        .annotate(rows=Count('id')).filter(rows__gt=1).values_list('checkout_request_id', flat=True)
+    )
+    for checkout_request_id in duplicated:
+        # Keep the newest row linked to a request; the rest were duplicates of it.
+        rows = MpesaResponse.objects.filter(checkout_request_id=checkout_request_id)
+        keep = rows.order_by(models.F('request_id').desc(nulls_last=True), '-id').first()
+        rows.exclude(id=keep.id).update(checkout_request_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mpesa_stk', '0002_async_push_and_callback_result'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mpesaresponse',
+            name='checkout_request_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.RunPython(null_missing_and_duplicate_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='mpesaresponse',
+            name='checkout_request_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:54
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_sent(apps, schema_editor):
+    # Whether older queued pushes reached Daraja is unknown; never send them again.
+    MpesaRequest = apps.get_model('mpesa_stk', 'MpesaRequest')
+    MpesaRequest.objects.update(sent_at=F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mpesa_stk', '0003_unique_checkout_request_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mpesarequest',
+            name='raw_response',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mpesarequest',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_sent, migrations.RunPython.noop),
+    ]
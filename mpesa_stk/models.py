@@ -2,21 +2,45 @@ from django.db import models
 
 # Create your models here.
 class MpesaRequest(models.Model):
+    QUEUED = 'queued'
+    SUBMITTED = 'submitted'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (SUBMITTED, 'Submitted'),
+        (FAILED, 'Failed'),
+    ]
+
     phone_number = models.CharField(max_length=15)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     account_reference = models.CharField(max_length=50)
     transaction_desc = models.CharField(max_length=255)
     timestamp = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    error = models.CharField(max_length=255, blank=True, default='')
+    # When a worker took the push to send it. Set once, so a push is never sent twice.
+    sent_at = models.DateTimeField(blank=True, null=True)
+    # Daraja's reply to an accepted push, kept only while it could not be stored.
+    raw_response = models.JSONField(blank=True, null=True)
 
 class MpesaResponse(models.Model):
+    # Null only while a callback has arrived before the push result was stored.
     request = models.ForeignKey(
         MpesaRequest, 
         on_delete=models.CASCADE, 
-        related_name='responses'
+        related_name='responses',
+        null=True,
     )
     merchant_request_id = models.CharField(max_length=255)
-    checkout_request_id = models.CharField(max_length=255)
+    # Null when Daraja returned no id. Unique so the push worker and the
+    # callback, racing to store the same checkout, upsert a single row.
+    checkout_request_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
     response_code = models.CharField(max_length=10)
     response_description = models.CharField(max_length=255)
     customer_message = models.CharField(max_length=255)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Final outcome, filled in by the Daraja callback.
+    result_code = models.CharField(max_length=10, blank=True, null=True)
+    result_description = models.CharField(max_length=255, blank=True, default='')
+    mpesa_receipt_number = models.CharField(max_length=50, blank=True, default='')
+    completed_at = models.DateTimeField(blank=True, null=True)
@@ -0,0 +1,144 @@
+"""A local stand-in for the Safaricom Daraja API, for tests and load runs.
+
+Start it and point ``MPESA_BASE_URL`` at ``server.url``::
+
+    with FakeDaraja() as server:
+        client = DarajaClient(server.url, 'key', 'secret')
+"""
+import json
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def callback_payload(merchant_request_id, checkout_request_id, result_code=0,
+                     result_desc='The service request is processed successfully.', receipt='QKT0000000'):
+    """Body of the STK callback Daraja posts to ``CallBackURL``."""
+    callback = {
+        "MerchantRequestID": merchant_request_id,
+        "CheckoutRequestID": checkout_request_id,
+        "ResultCode": result_code,
+        "ResultDesc": result_desc,
+    }
+    if result_code == 0:
+        callback["CallbackMetadata"] = {"Item": [
+            {"Name": "MpesaReceiptNumber", "Value": receipt},
+        ]}
+    return {"Body": {"stkCallback": callback}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server.daraja
+        if not self.path.startswith('/oauth/v1/generate'):
+            return self._send(404, {"errorMessage": "Not found"})
+        server.record('token')
+        time.sleep(server.latency)
+        self._send(200, {"access_token": server.issue_token(), "expires_in": str(server.expires_in)})
+
+    def do_POST(self):
+        server = self.server.daraja
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.startswith('/mpesa/stkpush/v1/processrequest'):
+            return self._send(404, {"errorMessage": "Not found"})
+        server.record('stk_push')
+        time.sleep(server.latency)
+        if self.headers.get('Authorization') != f"Bearer {server.token}":
+            return self._send(401, {"errorCode": "404.001.03", "errorMessage": "Invalid Access Token"})
+
+        checkout_request_id = f"ws_CO_{uuid.uuid4().hex}"
+        merchant_request_id = uuid.uuid4().hex[:16]
+        server.pushes.append((checkout_request_id, payload))
+        if server.auto_callback and payload.get('CallBackURL'):
+            server.schedule_callback(payload['CallBackURL'], merchant_request_id, checkout_request_id)
+        self._send(200, {
+            "MerchantRequestID": merchant_request_id,
+            "CheckoutRequestID": checkout_request_id,
+            "ResponseCode": "0",
+            "ResponseDescription": "Success. Request accepted for processing",
+            "CustomerMessage": "Success. Request accepted for processing",
+        })
+
+
+class FakeDaraja:
+    """Threaded HTTP server speaking the OAuth and STK push endpoints.
+
+    ``calls`` counts requests per endpoint and ``pushes`` keeps
+    ``(checkout_request_id, payload)`` for every accepted STK push. With
+    ``auto_callback`` the server also posts a successful result to each
+    push's ``CallBackURL`` after ``callback_delay`` seconds, like Daraja does
+    once the customer enters their PIN.
+    """
+
+    def __init__(self, expires_in=3599, latency=0.0, host='127.0.0.1', port=0,
+                 auto_callback=False, callback_delay=0.5):
+        self.expires_in = expires_in
+        self.latency = latency
+        self.auto_callback = auto_callback
+        self.callback_delay = callback_delay
+        self.token = None
+        self.calls = {'token': 0, 'stk_push': 0}
+        self.pushes = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.daraja = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] += 1
+
+    def issue_token(self):
+        with self._lock:
+            self.token = uuid.uuid4().hex
+            return self.token
+
+    def schedule_callback(self, url, merchant_request_id, checkout_request_id):
+        def deliver():
+            body = json.dumps(callback_payload(merchant_request_id, checkout_request_id)).encode()
+            request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+            try:
+                urllib.request.urlopen(request, timeout=10).close()
+            except OSError:
+                pass
+
+        timer = threading.Timer(self.callback_delay, deliver)
+        timer.daemon = True
+        timer.start()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,131 @@
+import base64
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .client import get_client
+from .models import MpesaRequest, MpesaResponse
+
+logger = logging.getLogger(__name__)
+
+# Tries at saving Daraja's reply, and the pause before the first retry
+# (doubled each time, with jitter), before the request is failed with the reply attached.
+STORE_ATTEMPTS = 5
+STORE_RETRY_DELAY = 0.05
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(max_workers=settings.MPESA_PUSH_WORKERS, thread_name_prefix='mpesa-push')
+
+
+def enqueue_stk_push(request_id, callback_url):
+    """Send the STK push for ``request_id`` on the worker pool (inline when ``MPESA_PUSH_WORKERS`` is 0)."""
+    if settings.MPESA_PUSH_WORKERS:
+        return get_executor().submit(_run_in_worker, request_id, callback_url)
+    send_stk_push(request_id, callback_url)
+
+
+def _run_in_worker(request_id, callback_url):
+    close_old_connections()
+    try:
+        send_stk_push(request_id, callback_url)
+    except Exception:
+        logger.exception("STK push for request %s failed", request_id)
+    finally:
+        connection.close()
+
+
+def send_stk_push(request_id, callback_url):
+    # Claim the push, so a worker and retry_stk_pushes never both send it.
+    if not MpesaRequest.objects.filter(
+        id=request_id, status=MpesaRequest.QUEUED, sent_at__isnull=True,
+    ).update(sent_at=timezone.now()):
+        return None
+    mpesa_request = MpesaRequest.objects.get(id=request_id)
+    try:
+        response_data = initiate_stk_push(mpesa_request, callback_url)
+    except (requests.RequestException, ValueError) as e:
+        MpesaRequest.objects.filter(id=request_id).update(status=MpesaRequest.FAILED, error=str(e)[:255])
+        return None
+
+    # Daraja has the push now, so its reply must not be lost: retry the
+    # writes, then fall back to keeping the raw reply on the request.
+    for attempt in range(STORE_ATTEMPTS):
+        if attempt:
+            time.sleep(STORE_RETRY_DELAY * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        try:
+            return store_response(request_id, response_data)
+        except DatabaseError as e:
+            error = e
+    logger.error("Could not store the reply to STK push %s: %s (%r)", request_id, error, response_data)
+    MpesaRequest.objects.filter(id=request_id).update(
+        status=MpesaRequest.FAILED, error=f"Could not store the reply: {error}"[:255], raw_response=response_data,
+    )
+    return None
+
+
+def store_response(request_id, response_data):
+    """Save Daraja's reply to the push for ``request_id`` and update the request's status."""
+    checkout_request_id = response_data.get('CheckoutRequestID') or None
+    fields = {
+        'request_id': request_id,
+        'merchant_request_id': response_data.get('MerchantRequestID', ''),
+        'response_code': response_data.get('ResponseCode', ''),
+        'response_description': response_data.get('ResponseDescription', ''),
+        'customer_message': response_data.get('CustomerMessage', ''),
+    }
+    accepted = fields['response_code'] == '0'
+    with transaction.atomic():
+        # Writing first takes the write lock up front, which spares SQLite a
+        # lock upgrade that fails outright when another writer is waiting.
+        MpesaRequest.objects.filter(id=request_id).update(
+            status=MpesaRequest.SUBMITTED if accepted else MpesaRequest.FAILED,
+            error='' if accepted else (response_data.get('errorMessage') or fields['response_description'])[:255],
+            raw_response=None,
+        )
+        if checkout_request_id:
+            # The callback may have beaten us here and created the row already.
+            # On a concurrent insert the unique constraint fails ours and
+            # update_or_create updates the row that won.
+            mpesa_response, _ = MpesaResponse.objects.update_or_create(
+                checkout_request_id=checkout_request_id, defaults=fields
+            )
+        else:
+            mpesa_response = MpesaResponse.objects.create(**fields)
+    return mpesa_response
+
+
+def initiate_stk_push(mpesa_request, callback_url):
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    payload = {
+        "BusinessShortCode": settings.MPESA_SHORTCODE,
+        "Password": generate_password(timestamp),
+        "Timestamp": timestamp,
+        "TransactionType": "CustomerPayBillOnline",
+        "Amount": float(mpesa_request.amount),
+        "PartyA": mpesa_request.phone_number,
+        "PartyB": settings.MPESA_SHORTCODE,
+        "PhoneNumber": mpesa_request.phone_number,
+        "CallBackURL": callback_url,
+        "AccountReference": mpesa_request.account_reference,
+        "TransactionDesc": mpesa_request.transaction_desc
+    }
+    return get_client().stk_push(payload)
+
+
+def generate_password(timestamp=None):
+    shortcode = settings.MPESA_SHORTCODE
+    passkey = settings.MPESA_PASSKEY
+    timestamp = timestamp or datetime.now().strftime('%Y%m%d%H%M%S')
+    data_to_encode = shortcode + passkey + timestamp
+    encoded_string = base64.b64encode(data_to_encode.encode())
+    return encoded_string.decode('utf-8')
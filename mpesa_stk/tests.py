@@ -1,3 +1,179 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .client import DarajaClient, get_client
+from .models import MpesaRequest, MpesaResponse
+from .stub import FakeDaraja, callback_payload
+from .tasks import STORE_ATTEMPTS, get_executor
+from .views import with_callback_token
+
+
+class DarajaClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeDaraja().start()
+        self.addCleanup(self.server.stop)
+
+    def test_token_is_reused_until_close_to_expiry(self):
+        client = DarajaClient(self.server.url, 'key', 'secret', refresh_margin=60)
+        for _ in range(3):
+            client.stk_push({"Amount": 1})
+        self.assertEqual(self.server.calls, {'token': 1, 'stk_push': 3})
+
+        with mock.patch('mpesa_stk.client.time.monotonic', return_value=client._token_expires_at + 1):
+            client.get_access_token()
+        self.assertEqual(self.server.calls['token'], 2)
+
+    def test_concurrent_callers_share_one_token_fetch(self):
+        self.server.latency = 0.05
+        client = DarajaClient(self.server.url, 'key', 'secret')
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            tokens = set(pool.map(lambda _: client.get_access_token(), range(32)))
+        self.assertEqual(len(tokens), 1)
+        self.assertEqual(self.server.calls['token'], 1)
+
+    def test_rejected_token_is_dropped(self):
+        client = DarajaClient(self.server.url, 'key', 'secret')
+        client.get_access_token()
+        self.server.issue_token()
+        self.assertEqual(client.stk_push({})['errorMessage'], 'Invalid Access Token')
+        self.assertEqual(client.stk_push({})['ResponseCode'], '0')
+
+
+PAYMENT = {
+    'phone_number': '254700000000',
+    'amount': '100.00',
+    'account_reference': 'INV-1',
+    'transaction_desc': 'Consultation',
+}
+
+
+@override_settings(MPESA_PUSH_WORKERS=0)
+class StkPushViewTests(TestCase):
+    def setUp(self):
+        self.server = FakeDaraja().start()
+        self.addCleanup(self.server.stop)
+        get_client.cache_clear()
+        self.addCleanup(get_client.cache_clear)
+        self.client = APIClient()
+
+    def push(self):
+        with override_settings(MPESA_BASE_URL=self.server.url), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('stk_push'), PAYMENT, format='json')
+        self.assertEqual(response.status_code, 202)
+        return response
+
+    def test_push_is_accepted_then_completed_by_callback(self):
+        response = self.push()
+        checkout_request_id, payload = self.server.pushes[0]
+        self.assertEqual(payload['CallBackURL'], 'http://testserver' + with_callback_token(reverse('stk_callback')))
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], MpesaRequest.SUBMITTED)
+        self.assertEqual(status['response']['checkout_request_id'], checkout_request_id)
+
+        merchant_request_id = status['response']['merchant_request_id']
+        callback = self.client.post(with_callback_token(reverse('stk_callback')), callback_payload(merchant_request_id, checkout_request_id), format='json')
+        self.assertEqual(callback.data['ResultCode'], 0)
+        mpesa_response = MpesaResponse.objects.get()
+        self.assertEqual((mpesa_response.result_code, mpesa_response.mpesa_receipt_number), ('0', 'QKT0000000'))
+
+    def test_callback_arriving_first_is_linked_to_the_request(self):
+        self.client.post(with_callback_token(reverse('stk_callback')), callback_payload('m-1', 'ws_CO_early', result_code=1032, result_desc='Cancelled'), format='json')
+        with mock.patch('mpesa_stk.stub.uuid.uuid4') as uuid4:
+            uuid4.return_value.hex = 'early'
+            self.push()
+
+        mpesa_response = MpesaResponse.objects.get()
+        self.assertEqual(mpesa_response.request, MpesaRequest.objects.get())
+        self.assertEqual(mpesa_response.result_code, '1032')
+
+    def test_invalid_payment_is_rejected(self):
+        response = self.client.post(reverse('stk_push'), {**PAYMENT, 'amount': 'ten'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount', response.json())
+        self.assertEqual(self.client.post(reverse('stk_push'), '{', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.get(reverse('stk_status', args=[1])).status_code, 404)
+        self.assertFalse(MpesaRequest.objects.exists())
+
+    def test_callback_without_token_or_with_wrong_types_is_rejected(self):
+        url = with_callback_token(reverse('stk_callback'))
+        payload = callback_payload('m-1', 'ws_CO_forged')
+        self.assertEqual(self.client.post(reverse('stk_callback'), payload, format='json').status_code, 403)
+        self.assertEqual(self.client.post(reverse('stk_callback') + '?token=guess', payload, format='json').status_code, 403)
+        for callback in (
+            {"CheckoutRequestID": "abc", "ResultDesc": 5},
+            {"CheckoutRequestID": "abc", "CallbackMetadata": []},
+            {"CheckoutRequestID": "abc", "CallbackMetadata": {"Item": {"Name": "MpesaReceiptNumber"}}},
+            {"CheckoutRequestID": ["abc"]},
+        ):
+            response = self.client.post(url, {"Body": {"stkCallback": callback}}, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(MpesaResponse.objects.exists())
+
+    def test_provider_failure_marks_request_failed(self):
+        self.server.stop()
+        self.push()
+        self.assertEqual(MpesaRequest.objects.get().status, MpesaRequest.FAILED)
+
+    def retry_stuck_pushes(self):
+        with override_settings(MPESA_BASE_URL=self.server.url):
+            call_command('retry_stk_pushes', callback_url='http://testserver/callback/', stdout=StringIO())
+
+    def test_reply_that_cannot_be_stored_is_kept_for_recovery(self):
+        with mock.patch('mpesa_stk.tasks.store_response', side_effect=OperationalError("database is locked")) as store, \
+                mock.patch('mpesa_stk.tasks.time.sleep'):
+            self.push()
+        self.assertEqual(store.call_count, STORE_ATTEMPTS)
+        checkout_request_id, _ = self.server.pushes[0]
+        mpesa_request = MpesaRequest.objects.get()
+        self.assertEqual(mpesa_request.status, MpesaRequest.FAILED)
+        self.assertIn("database is locked", mpesa_request.error)
+        self.assertEqual(mpesa_request.raw_response['CheckoutRequestID'], checkout_request_id)
+
+        self.retry_stuck_pushes()
+        mpesa_request.refresh_from_db()
+        self.assertEqual((mpesa_request.status, mpesa_request.raw_response), (MpesaRequest.SUBMITTED, None))
+        self.assertEqual(MpesaResponse.objects.get(checkout_request_id=checkout_request_id).request, mpesa_request)
+        self.assertEqual(len(self.server.pushes), 1)
+
+    def test_stuck_pushes_are_sent_once_or_failed(self):
+        never_sent, lost, recent = (MpesaRequest.objects.create(**PAYMENT) for _ in range(3))
+        long_ago = timezone.now() - timedelta(hours=1)
+        MpesaRequest.objects.filter(id__in=[never_sent.id, lost.id]).update(timestamp=long_ago)
+        MpesaRequest.objects.filter(id=lost.id).update(sent_at=long_ago)
+
+        self.retry_stuck_pushes()
+        self.retry_stuck_pushes()
+        statuses = dict(MpesaRequest.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {
+            never_sent.id: MpesaRequest.SUBMITTED, lost.id: MpesaRequest.FAILED, recent.id: MpesaRequest.QUEUED,
+        })
+        self.assertEqual(len(self.server.pushes), 1)
+        self.assertEqual(self.server.pushes[0][1]['CallBackURL'], with_callback_token('http://testserver/callback/'))
+
+
+@override_settings(MPESA_PUSH_WORKERS=8)
+class StkPushPipelineTests(TransactionTestCase):
+    def test_concurrent_pushes_end_to_end(self):
+        with FakeDaraja(latency=0.01) as server, override_settings(MPESA_BASE_URL=server.url):
+            get_client.cache_clear()
+            get_executor.cache_clear()
+            self.addCleanup(get_client.cache_clear)
+            self.addCleanup(get_executor.cache_clear)
+
+            client = APIClient()
+            for _ in range(50):
+                self.assertEqual(client.post(reverse('stk_push'), PAYMENT, format='json').status_code, 202)
+            get_executor().shutdown(wait=True)
+
+        self.assertEqual(server.calls, {'token': 1, 'stk_push': 50})
+        self.assertEqual(MpesaRequest.objects.filter(status=MpesaRequest.SUBMITTED).count(), 50)
@@ -3,4 +3,6 @@ from . import views
 
 urlpatterns = [
     path('api/stk/', views.stk_push, name='stk_push'),  # Only POST method will be allowed
+    path('api/stk/<int:request_id>/', views.stk_status, name='stk_status'),
+    path('api/callback/', views.stk_callback, name='stk_callback'),
 ]
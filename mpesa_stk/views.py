@@ -1,66 +1,105 @@
+import json
+
+from asgiref.sync import sync_to_async
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from .models import MpesaRequest, MpesaResponse
 from .serializers import MpesaRequestSerializer, MpesaResponseSerializer
-import requests
-import base64
-from datetime import datetime
+from .tasks import enqueue_stk_push
 from django.conf import settings
+from django.db import transaction
 from django.http import JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.http import urlencode
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_safe
 
-@api_view(['POST'])
-def stk_push(request):
-    serializer = MpesaRequestSerializer(data=request.data)
-    if serializer.is_valid():
-        mpesa_request = serializer.save()
-        response_data = initiate_stk_push(mpesa_request)
-        mpesa_response = MpesaResponse.objects.create(
-            request=mpesa_request,
-            merchant_request_id=response_data.get('MerchantRequestID', ''),
-            checkout_request_id=response_data.get('CheckoutRequestID', ''),
-            response_code=response_data.get('ResponseCode', ''),
-            response_description=response_data.get('ResponseDescription', ''),
-            customer_message=response_data.get('CustomerMessage', '')
-        )
-        response_serializer = MpesaResponseSerializer(mpesa_response)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+def callback_token():
+    """The secret Daraja sends back in the callback URL; derived from ``SECRET_KEY`` unless configured."""
+    return settings.MPESA_CALLBACK_TOKEN or salted_hmac('mpesa_stk.callback', 'token').hexdigest()
+
+
+def with_callback_token(url):
+    return f"{url}{'&' if '?' in url else '?'}{urlencode({'token': callback_token()})}"
 
-def initiate_stk_push(mpesa_request):
-    access_token = get_access_token()
-    api_url = "https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest"
-    headers = {
-        "Authorization": f"Bearer {access_token}"
-    }
-    payload = {
-        "BusinessShortCode": settings.MPESA_SHORTCODE,
-        "Password": generate_password(),
-        "Timestamp": datetime.now().strftime('%Y%m%d%H%M%S'),
-        "TransactionType": "CustomerPayBillOnline",
-        "Amount": float(mpesa_request.amount),  
-        "PartyA": mpesa_request.phone_number,
-        "PartyB": settings.MPESA_SHORTCODE,
-        "PhoneNumber": mpesa_request.phone_number,
-        "CallBackURL": "https://your-callback-url.com/callback",  
-        "AccountReference": mpesa_request.account_reference,
-        "TransactionDesc": mpesa_request.transaction_desc
-    }
-    response = requests.post(api_url, json=payload, headers=headers)
-    return response.json()
 
-def get_access_token():
-    consumer_key = settings.MPESA_CONSUMER_KEY
-    consumer_secret = settings.MPESA_CONSUMER_SECRET
-    api_url = "https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials"
-    response = requests.get(api_url, auth=(consumer_key, consumer_secret))
-    access_token = response.json().get('access_token')
-    return access_token
+@csrf_exempt
+@require_POST
+async def stk_push(request):
+    """Queue an STK push and return at once; its progress is read from ``status_url``."""
+    try:
+        data = json.loads(request.body) if request.content_type == 'application/json' else request.POST
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = MpesaRequestSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    mpesa_request = await MpesaRequest.objects.acreate(**serializer.validated_data)
+    callback_url = with_callback_token(
+        settings.MPESA_CALLBACK_URL or request.build_absolute_uri(reverse('stk_callback'))
+    )
+    # Outside a transaction this hands the push to a worker straight away.
+    await sync_to_async(transaction.on_commit)(lambda: enqueue_stk_push(mpesa_request.id, callback_url))
+    return JsonResponse({
+        "id": mpesa_request.id,
+        "status": mpesa_request.status,
+        "status_url": reverse('stk_status', args=[mpesa_request.id]),
+    }, status=status.HTTP_202_ACCEPTED)
 
-def generate_password():
-    shortcode = settings.MPESA_SHORTCODE
-    passkey = settings.MPESA_PASSKEY
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    data_to_encode = shortcode + passkey + timestamp
-    encoded_string = base64.b64encode(data_to_encode.encode())
-    return encoded_string.decode('utf-8')
+@require_safe
+async def stk_status(request, request_id):
+    try:
+        mpesa_request = await MpesaRequest.objects.aget(id=request_id)
+    except MpesaRequest.DoesNotExist:
+        return JsonResponse({"error": "Payment request not found"}, status=status.HTTP_404_NOT_FOUND)
+    response = await mpesa_request.responses.order_by('-id').afirst()
+    return JsonResponse({
+        "id": mpesa_request.id,
+        "status": mpesa_request.status,
+        "error": mpesa_request.error,
+        "response": MpesaResponseSerializer(response).data if response else None,
+    })
+
+@api_view(['POST'])
+def stk_callback(request):
+    """Record the final result Daraja posts once the customer completes or cancels the prompt.
+
+    Only requests carrying the ``token`` put in the push's ``CallBackURL`` are accepted.
+    """
+    if not constant_time_compare(request.query_params.get('token', ''), callback_token()):
+        return Response({"ResultCode": 1, "ResultDesc": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    malformed = Response({"ResultCode": 1, "ResultDesc": "Malformed callback"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        callback = request.data['Body']['stkCallback']
+        checkout_request_id = callback['CheckoutRequestID']
+    except (KeyError, TypeError):
+        return malformed
+    callback_metadata = callback.get('CallbackMetadata', {})
+    items = callback_metadata.get('Item', []) if isinstance(callback_metadata, dict) else None
+    result_description = callback.get('ResultDesc', '')
+    merchant_request_id = callback.get('MerchantRequestID', '')
+    if (
+        not isinstance(items, list) or not all(isinstance(item, dict) for item in items)
+        or not all(isinstance(value, str) for value in (checkout_request_id, result_description, merchant_request_id))
+        or not 0 < len(checkout_request_id) <= 255
+    ):
+        return malformed
+    metadata = {item.get('Name'): item.get('Value') for item in items}
+
+    fields = {
+        'result_code': str(callback.get('ResultCode', ''))[:10],
+        'result_description': result_description[:255],
+        'mpesa_receipt_number': str(metadata.get('MpesaReceiptNumber') or '')[:50],
+        'completed_at': timezone.now(),
+    }
+    updated = MpesaResponse.objects.filter(checkout_request_id=checkout_request_id).update(**fields)
+    if not updated:
+        # The push result has not been stored yet; the worker links this row when it is.
+        MpesaResponse.objects.update_or_create(
+            checkout_request_id=checkout_request_id,
+            defaults={'merchant_request_id': merchant_request_id[:255], **fields},
+        )
+    return Response({"ResultCode": 0, "ResultDesc": "Accepted"})